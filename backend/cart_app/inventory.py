@@ -0,0 +1,220 @@
+"""
+Stock accounting for carts and checkout.
+
+Stock lives in `Stall.quantity`. Adding a meal to a cart also places a
+`StockHold` for it, valid for `STOCK_HOLD_TTL` seconds, so what other buyers
+can still take is
+
+    available = quantity - SUM(quantity of unexpired holds of other carts)
+
+(the sum is answered from the `stockhold_stall_live` covering index). An
+expired hold stops counting immediately; `release_expired_holds` only
+deletes the rows, in small batches.
+
+Stock is only ever changed by relative UPDATEs, never by read-modify-`save()`:
+
+    UPDATE stall SET quantity = quantity - n WHERE id = ... AND <available> >= n
+
+Placing a hold and taking stock first lock the stall's row (`SELECT ... FOR
+UPDATE`), so holds and checkouts on one stall happen one at a time and each
+sees the others' committed holds. Nothing but the touched stall rows is
+locked, until the surrounding transaction ends. Stalls are always locked in
+ascending id order so two carts holding the same stalls cannot deadlock.
+"""
+from datetime import timedelta
+from typing import Dict, Iterable, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.transaction import TransactionManagementError
+from django.db.models import F, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Now
+from django.utils import timezone
+
+from store_app.cache import bump_stall_versions
+from store_app.models import Stall
+
+from .models import StockHold
+
+DEFAULT_HOLD_TTL = 15 * 60
+
+
+class OutOfStock(Exception):
+    """Some lines could not be filled; `shortages` maps stall id -> units missing."""
+
+    def __init__(self, shortages):
+        super().__init__(f"Not enough stock for stalls {sorted(shortages)}.")
+        self.shortages = shortages
+
+
+def hold_ttl():
+    return timedelta(seconds=getattr(settings, "STOCK_HOLD_TTL", DEFAULT_HOLD_TTL))
+
+
+def live_holds(exclude_cart=None):
+    holds = StockHold.objects.filter(expires_at__gt=timezone.now())
+    if exclude_cart is not None:
+        holds = holds.exclude(cart=exclude_cart)
+    return holds
+
+
+def held_quantity(stall_id, exclude_cart=None):
+    """Units of the stall held by live holds of carts other than `exclude_cart`."""
+    return live_holds(exclude_cart).filter(stall_id=stall_id).aggregate(
+        total=Coalesce(Sum("quantity"), 0)
+    )["total"]
+
+
+def available_quantities(stall_ids, exclude_cart=None) -> Dict[int, int]:
+    """`{stall_id: units still available to exclude_cart}` in two queries."""
+    stall_ids = list(stall_ids)
+    held = dict(
+        live_holds(exclude_cart)
+        .filter(stall_id__in=stall_ids)
+        .values("stall_id")
+        .annotate(total=Sum("quantity"))
+        .values_list("stall_id", "total")
+    )
+    return {
+        stall_id: max(quantity - held.get(stall_id, 0), 0)
+        for stall_id, quantity in Stall.objects.filter(pk__in=stall_ids).values_list("pk", "quantity")
+    }
+
+
+def _lock_stalls(stall_ids):
+    # Row locks only, always in id order (see module docstring)
+    return dict(
+        Stall.objects.select_for_update()
+        .filter(pk__in=stall_ids)
+        .order_by("pk")
+        .values_list("pk", "quantity")
+    )
+
+
+def place_hold(cart, stall_id, quantity=1):
+    """
+    Hold `quantity` units of the stall for `cart` (replacing its previous hold
+    on the stall) and return when the hold expires; raises `OutOfStock`.
+    """
+    with transaction.atomic():
+        stock = _lock_stalls([stall_id]).get(stall_id, 0)
+        available = stock - held_quantity(stall_id, exclude_cart=cart)
+        if available < quantity:
+            raise OutOfStock({stall_id: quantity - max(available, 0)})
+        expires_at = timezone.now() + hold_ttl()
+        # An upsert, so a hold deleted by the sweeper meanwhile is simply recreated
+        StockHold.objects.bulk_create(
+            [StockHold(cart=cart, stall_id=stall_id, quantity=quantity, expires_at=expires_at)],
+            update_conflicts=True,
+            unique_fields=["cart", "stall"],
+            update_fields=["quantity", "expires_at"],
+        )
+    return expires_at
+
+
+def release_holds(cart, stall_ids=None):
+    holds = StockHold.objects.filter(cart=cart)
+    if stall_ids is not None:
+        holds = holds.filter(stall_id__in=stall_ids)
+    holds.delete()
+
+
+def release_expired_holds(batch_size=1000) -> int:
+    """
+    Delete up to `batch_size` expired holds in one short transaction; returns how many.
+
+    Holds being refreshed right now are skipped (`SKIP LOCKED`) rather than
+    waited for; call repeatedly until it returns less than `batch_size`.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            StockHold.objects.select_for_update(skip_locked=True)
+            .filter(expires_at__lte=now)
+            .order_by("expires_at")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        deleted, _ = StockHold.objects.filter(pk__in=ids, expires_at__lte=now).delete()
+    return deleted
+
+
+def take_stock(stall_id, quantity, partial=False, cart=None) -> int:
+    """
+    Remove up to `quantity` units from the stall; returns how many were taken.
+
+    Units held for other carts are off limits; `cart`'s own hold is not. All
+    or nothing unless `partial`, which takes whatever is left instead.
+    """
+    if quantity <= 0:
+        return 0
+    holds = live_holds(cart).filter(stall_id=stall_id).values("stall_id").annotate(total=Sum("quantity"))
+    held = Coalesce(Subquery(holds.values("total")), Value(0))
+    stall = Stall.objects.filter(pk=stall_id)
+
+    def take(units):
+        # The availability check is in the UPDATE itself
+        return stall.filter(quantity__gte=held + units).update(quantity=F("quantity") - units, updated_at=Now())
+
+    with transaction.atomic():
+        _lock_stalls([stall_id])
+        if take(quantity):
+            bump_stall_versions([stall_id])
+            return quantity
+        while partial:
+            available = available_quantities([stall_id], exclude_cart=cart).get(stall_id, 0)
+            if available <= 0:
+                break
+            units = min(available, quantity)
+            if take(units):
+                bump_stall_versions([stall_id])
+                return units
+    return 0
+
+
+def return_stock(stall_id, quantity):
+    """Put `quantity` units back, e.g. for a declined order line."""
+    if quantity > 0 and Stall.objects.filter(pk=stall_id).update(
+        quantity=F("quantity") + quantity, updated_at=Now()
+    ):
+        bump_stall_versions([stall_id])
+
+
+def set_stock(stall_id, quantity=None, delta=None) -> bool:
+    """Set the stall's stock to `quantity`, or move it by `delta` (floored at 0), in one UPDATE."""
+    if quantity is not None:
+        value = max(0, quantity)
+    else:
+        value = Greatest(F("quantity") + delta, 0)
+    updated = Stall.objects.filter(pk=stall_id).update(quantity=value, updated_at=Now())
+    if updated:
+        bump_stall_versions([stall_id])
+    return bool(updated)
+
+
+def allocate(lines: Iterable[Tuple[int, int]], partial=False, cart=None) -> Dict[int, int]:
+    """
+    Take stock for `(stall_id, quantity)` lines; returns `{stall_id: units taken}`.
+
+    Must run inside the checkout transaction. `cart`'s own holds count as
+    available to it and are released. Without `partial`, any short line
+    raises `OutOfStock`, and the rollback returns what was already taken.
+    """
+    if not transaction.get_connection().in_atomic_block:
+        raise TransactionManagementError("allocate() must run inside a transaction.")
+    wanted: Dict[int, int] = {}
+    for stall_id, quantity in lines:
+        wanted[stall_id] = wanted.get(stall_id, 0) + quantity
+
+    _lock_stalls(wanted)
+    taken, shortages = {}, {}
+    for stall_id in sorted(wanted):
+        taken[stall_id] = take_stock(stall_id, wanted[stall_id], partial=partial, cart=cart)
+        if taken[stall_id] < wanted[stall_id]:
+            shortages[stall_id] = wanted[stall_id] - taken[stall_id]
+    if shortages and not partial:
+        raise OutOfStock(shortages)
+    if cart is not None:
+        release_holds(cart, wanted)
+    return taken
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cart_app.inventory import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired cart stock holds in small batches. Expired holds already stop "
+        "counting against availability; this keeps the table small. Run every few minutes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Holds deleted per transaction.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between batches, to spread load on a busy database.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options["batch_size"], 1)
+        pause = max(options["pause"], 0)
+        released, batches = 0, 0
+        while True:
+            deleted = release_expired_holds(batch_size)
+            released += deleted
+            batches += 1
+            if deleted < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Released {released} expired stock holds in {batches} batches.")
+        )
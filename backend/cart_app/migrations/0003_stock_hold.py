@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart_app', '0002_noop'),
+        ('store_app', '0017_image_upload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('expires_at', models.DateTimeField()),
+                ('cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_holds', to='cart_app.cart')),
+                ('stall', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_holds', to='store_app.stall')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['stall', 'expires_at'], include=('quantity',), name='stockhold_stall_live'), models.Index(fields=['expires_at'], name='stockhold_expires')],
+                'constraints': [models.UniqueConstraint(fields=('cart', 'stall'), name='stockhold_one_per_line')],
+            },
+        ),
+    ]
@@ -39,6 +39,28 @@ class CartItem(models.Model):
         return f"CartItem(cart={self.cart_id}, stall={self.stall_id}, qty={self.quantity})"
 
 
+class StockHold(models.Model):
+    """Units of a stall set aside for a cart until `expires_at` (see cart_app.inventory)."""
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="stock_holds")
+    stall = models.ForeignKey("store_app.Stall", on_delete=models.CASCADE, related_name="stock_holds")
+    quantity = models.PositiveIntegerField(default=1)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["cart", "stall"], name="stockhold_one_per_line"),
+        ]
+        indexes = [
+            # SUM(quantity) of a stall's live holds is answered from the index alone
+            models.Index(fields=["stall", "expires_at"], include=["quantity"], name="stockhold_stall_live"),
+            # The expiry sweeper walks this
+            models.Index(fields=["expires_at"], name="stockhold_expires"),
+        ]
+
+    def __str__(self):
+        return f"StockHold(cart={self.cart_id}, stall={self.stall_id}, qty={self.quantity}, until={self.expires_at})"
+
+
 class Order(models.Model):
     buyer_profile = models.ForeignKey(
         "user_app.BuyerProfile", on_delete=models.CASCADE, related_name="orders"
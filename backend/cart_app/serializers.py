@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .inventory import available_quantities, live_holds
 from .models import Cart, CartItem, Order, OrderItem
 from store_app.models import Stall
 
@@ -16,14 +17,24 @@ class CartItemSerializer(serializers.ModelSerializer):
     )
     # We don't track quantity anymore; expose a constant 1 for compatibility
     quantity = serializers.SerializerMethodField()
+    # Units other carts may not take from this cart: see CartSerializer
+    available = serializers.SerializerMethodField()
+    held_until = serializers.SerializerMethodField()
 
     class Meta:
         model = CartItem
-        fields = ["id", "stall", "stall_id", "quantity", "added_at"]
+        fields = ["id", "stall", "stall_id", "quantity", "available", "held_until", "added_at"]
 
     def get_quantity(self, obj):
         return 1
 
+    def get_available(self, obj):
+        return self.context.get("available", {}).get(obj.stall_id)
+
+    def get_held_until(self, obj):
+        held_until = self.context.get("held_until", {}).get(obj.stall_id)
+        return serializers.DateTimeField().to_representation(held_until) if held_until else None
+
 
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
@@ -32,6 +43,15 @@ class CartSerializer(serializers.ModelSerializer):
         model = Cart
         fields = ["id", "status", "created_at", "updated_at", "items"]
 
+    def to_representation(self, instance):
+        # Availability for every line at once (nested serializers share this context)
+        stall_ids = [item.stall_id for item in instance.items.all()]
+        self.context["available"] = available_quantities(stall_ids, exclude_cart=instance)
+        self.context["held_until"] = dict(
+            live_holds().filter(cart=instance).values_list("stall_id", "expires_at")
+        )
+        return super().to_representation(instance)
+
 
 class OrderItemSerializer(serializers.ModelSerializer):
     order_id = serializers.PrimaryKeyRelatedField(source="order", read_only=True)
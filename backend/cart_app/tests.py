@@ -0,0 +1,287 @@
+import io
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.transaction import TransactionManagementError
+from django.test import TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from cart_app.inventory import OutOfStock, allocate, available_quantities, place_hold, release_expired_holds, set_stock
+from cart_app.models import Cart, CartItem, OrderItem, StockHold
+from store_app.models import Stall
+from store_app.serializers import StallWriteSerializer
+from user_app.models import BuyerProfile, SellerProfile
+
+User = get_user_model()
+
+
+class CheckoutInventoryTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        chef = User.objects.create_user(username="chef@example.com", password="x", role="seller")
+        self.chef = chef
+        self.seller = SellerProfile.objects.create(user=chef, location="Ferry Building")
+        self.buyer = User.objects.create_user(username="buyer@example.com", password="x", role="buyer")
+        self.profile = BuyerProfile.objects.create(user=self.buyer, location="Ferry Building")
+        self.curry = Stall.objects.create(
+            owner_profile=self.seller, product="Curry", location="Ferry Building", price_cents=1200, quantity=3
+        )
+        self.soup = Stall.objects.create(
+            owner_profile=self.seller, product="Soup", location="Ferry Building", price_cents=800, quantity=0
+        )
+        self.client.force_authenticate(self.buyer)
+
+    def _cart(self, *stalls):
+        cart = Cart.objects.create(buyer_profile=self.profile)
+        for stall in stalls:
+            CartItem.objects.create(cart=cart, stall=stall)
+        return cart
+
+    def _quantity(self, stall):
+        return Stall.objects.values_list("quantity", flat=True).get(pk=stall.pk)
+
+    def test_checkout_decrements_stock(self):
+        self._cart(self.curry)
+        resp = self.client.post(reverse("cart-checkout"), {}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED, resp.data)
+        self.assertEqual(resp.data["total_cents"], 1200)
+        self.assertEqual(resp.data["unfilled"], [])
+        self.assertEqual(self._quantity(self.curry), 2)
+
+    def test_sold_out_line_rejects_whole_order(self):
+        cart = self._cart(self.curry, self.soup)
+        resp = self.client.post(reverse("cart-checkout"), {}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(resp.data["unavailable"], [{"stall_id": self.soup.pk, "missing": 1}])
+        # The curry taken before the soup came up short is back
+        self.assertEqual(self._quantity(self.curry), 3)
+        cart.refresh_from_db()
+        self.assertEqual(cart.status, Cart.OPEN)
+
+    def test_partial_fill(self):
+        self._cart(self.curry, self.soup)
+        resp = self.client.post(reverse("cart-checkout"), {"allow_partial": True}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED, resp.data)
+        self.assertEqual([item["stall"] for item in resp.data["items"]], [self.curry.pk])
+        self.assertEqual(resp.data["unfilled"], [{"stall_id": self.soup.pk, "missing": 1}])
+        self.assertEqual(self._quantity(self.curry), 2)
+
+    def test_declining_returns_stock_once(self):
+        self._cart(self.curry)
+        self.client.post(reverse("cart-checkout"), {}, format="json")
+        item = OrderItem.objects.get()
+        self.client.force_authenticate(self.chef)
+        url = reverse("cart-set-item-status", kwargs={"order_item_id": item.pk})
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, {"status": "declined"}).status_code, 200)
+        self.assertEqual(self._quantity(self.curry), 3)
+        self.client.post(url, {"status": "accepted"})
+        self.assertEqual(self._quantity(self.curry), 2)
+
+    def test_allocate_requires_transaction(self):
+        # APITestCase wraps each test in a transaction; leave it for this check
+        with mock.patch.object(connection, "in_atomic_block", False):
+            with self.assertRaises(TransactionManagementError):
+                allocate([(self.curry.pk, 1)])
+        self.assertEqual(self._quantity(self.curry), 3)
+
+    def test_seller_edit_keeps_concurrent_decrement(self):
+        stall = Stall.objects.get(pk=self.curry.pk)
+        # A checkout lands between loading the stall and saving the edit
+        with transaction.atomic():
+            allocate([(stall.pk, 1)])
+        serializer = StallWriteSerializer(stall, data={"product": "Green curry"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(self._quantity(self.curry), 2)
+        stall.save()
+        self.assertEqual(self._quantity(self.curry), 2)
+        # Stock sent with an edit is still applied, as its own UPDATE
+        serializer = StallWriteSerializer(stall, data={"quantity": 9}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        self.assertEqual(serializer.save().quantity, 9)
+        self.assertEqual(self._quantity(self.curry), 9)
+
+    def test_set_quantity_is_owner_only_and_relative(self):
+        url = reverse("stalls-set-quantity", kwargs={"id": self.curry.pk})
+        self.client.force_authenticate(self.chef)
+        self.assertEqual(self.client.post(url, {"delta": 4}).data["quantity"], 7)
+        self.assertEqual(self.client.post(url, {"delta": -10}).data["quantity"], 0)
+        self.assertEqual(self.client.post(url, {"quantity": 5}).data["quantity"], 5)
+        other = User.objects.create_user(username="chef2@example.com", password="x", role="seller")
+        SellerProfile.objects.create(user=other, location="Ferry Building")
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.post(url, {"quantity": 50}).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class StockHoldTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        chef = User.objects.create_user(username="chef@example.com", password="x", role="seller")
+        seller = SellerProfile.objects.create(user=chef, location="Ferry Building")
+        self.stall = Stall.objects.create(
+            owner_profile=seller, product="Curry", location="Ferry Building", price_cents=1200, quantity=1
+        )
+        self.buyers = []
+        for i in range(2):
+            buyer = User.objects.create_user(username=f"buyer{i}@example.com", password="x", role="buyer")
+            BuyerProfile.objects.create(user=buyer, location="Ferry Building")
+            self.buyers.append(buyer)
+
+    def _add(self, buyer):
+        self.client.force_authenticate(buyer)
+        return self.client.post(reverse("cart-add-item"), {"stall_id": self.stall.pk}, format="json")
+
+    def _expire_holds(self):
+        StockHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_adding_holds_the_last_meal(self):
+        resp = self._add(self.buyers[0])
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED, resp.data)
+        self.assertEqual(resp.data["items"][0]["available"], 1)
+        self.assertIsNotNone(resp.data["items"][0]["held_until"])
+        self.assertEqual(available_quantities([self.stall.pk]), {self.stall.pk: 0})
+
+        resp = self._add(self.buyers[1])
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(resp.data["unavailable"], [{"stall_id": self.stall.pk, "missing": 1}])
+
+    def test_expired_hold_stops_counting(self):
+        self._add(self.buyers[0])
+        self._expire_holds()
+        self.assertEqual(self._add(self.buyers[1]).status_code, status.HTTP_201_CREATED)
+        # The first buyer's checkout now finds the meal held by the second
+        self.client.force_authenticate(self.buyers[0])
+        self.assertEqual(self.client.post(reverse("cart-checkout"), {}, format="json").status_code, 409)
+        self.client.force_authenticate(self.buyers[1])
+        self.assertEqual(self.client.post(reverse("cart-checkout"), {}, format="json").status_code, 201)
+        self.stall.refresh_from_db()
+        self.assertEqual(self.stall.quantity, 0)
+        # Checkout used up the second buyer's hold; the expired one waits for the sweeper
+        self.assertFalse(StockHold.objects.filter(cart__buyer_profile__user=self.buyers[1]).exists())
+
+    def test_removing_item_releases_hold(self):
+        item_id = self._add(self.buyers[0]).data["items"][0]["id"]
+        self.client.delete(reverse("cart-remove-item", kwargs={"item_id": item_id}))
+        self.assertFalse(StockHold.objects.exists())
+        self.assertEqual(self._add(self.buyers[1]).status_code, status.HTTP_201_CREATED)
+
+    def test_sweeper_deletes_expired_holds_in_batches(self):
+        carts = [Cart.objects.create(buyer_profile=self.buyers[0].buyer_profile) for _ in range(6)]
+        past = timezone.now() - timedelta(minutes=1)
+        StockHold.objects.bulk_create(
+            [StockHold(cart=cart, stall=self.stall, expires_at=past) for cart in carts[:5]]
+            + [StockHold(cart=carts[5], stall=self.stall, expires_at=past + timedelta(hours=1))]
+        )
+        self.assertEqual(release_expired_holds(batch_size=2), 2)
+        out = io.StringIO()
+        call_command("release_stock_holds", "--batch-size", "2", stdout=out)
+        self.assertIn("Released 3 expired stock holds in 2 batches", out.getvalue())
+        self.assertEqual(list(StockHold.objects.values_list("cart_id", flat=True)), [carts[5].pk])
+
+
+class InventoryConcurrencyTests(TransactionTestCase):
+    """Many threads, each with its own connection, against one stall."""
+
+    def setUp(self):
+        chef = User.objects.create_user(username="chef@example.com", password="x", role="seller")
+        seller = SellerProfile.objects.create(user=chef, location="Ferry Building")
+        self.stall = Stall.objects.create(owner_profile=seller, product="Curry", location="Ferry Building", quantity=10)
+
+    def _hammer(self, workers):
+        start = threading.Barrier(len(workers))
+        results, errors = [], []
+
+        def run(work):
+            try:
+                start.wait()
+                results.append(work())
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(work,)) for work in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def _checkout(self, quantity=1, partial=False):
+        def work():
+            try:
+                with transaction.atomic():
+                    return allocate([(self.stall.pk, quantity)], partial=partial)[self.stall.pk]
+            except OutOfStock:
+                return 0
+
+        return work
+
+    def test_never_oversells(self):
+        taken = self._hammer([self._checkout() for _ in range(40)])
+        self.assertEqual(sum(taken), 10)
+        self.stall.refresh_from_db()
+        self.assertEqual(self.stall.quantity, 0)
+
+    def test_partial_fills_share_the_rest(self):
+        taken = self._hammer([self._checkout(quantity=3, partial=True) for _ in range(8)])
+        self.assertEqual(sum(taken), 10)
+        self.assertTrue(all(0 <= units <= 3 for units in taken))
+
+    def test_restocks_are_not_lost(self):
+        restock = lambda: set_stock(self.stall.pk, delta=2) and 0
+        taken = self._hammer([self._checkout() for _ in range(20)] + [restock] * 5)
+        self.stall.refresh_from_db()
+        self.assertEqual(self.stall.quantity, 10 + 5 * 2 - sum(taken))
+        self.assertGreaterEqual(self.stall.quantity, 0)
+
+    def test_holds_never_exceed_stock(self):
+        self.stall.quantity = 5
+        self.stall.save(update_fields=["quantity"])
+        carts = []
+        for i in range(20):
+            buyer = User.objects.create_user(username=f"buyer{i}@example.com", password="x", role="buyer")
+            carts.append(Cart.objects.create(buyer_profile=BuyerProfile.objects.create(user=buyer)))
+
+        def hold(cart):
+            def work():
+                try:
+                    place_hold(cart, self.stall.pk)
+                    return 1
+                except OutOfStock:
+                    return 0
+
+            return work
+
+        def checkout(cart):
+            def work():
+                try:
+                    with transaction.atomic():
+                        return allocate([(self.stall.pk, 1)], cart=cart)[self.stall.pk]
+                except OutOfStock:
+                    return 0
+
+            return work
+
+        held = sum(self._hammer([hold(cart) for cart in carts]))
+        self.assertEqual(held, 5)
+        # Holders check out while everyone else keeps trying to grab the stock
+        holders = set(StockHold.objects.values_list("cart_id", flat=True))
+        sold = self._hammer(
+            [checkout(cart) for cart in carts if cart.pk in holders]
+            + [checkout(cart) for cart in carts if cart.pk not in holders]
+            + [release_expired_holds] * 3
+        )
+        self.stall.refresh_from_db()
+        self.assertEqual(self.stall.quantity, 0)
+        self.assertFalse(StockHold.objects.exists())
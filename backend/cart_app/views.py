@@ -4,12 +4,17 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from .inventory import OutOfStock, allocate, place_hold, release_holds, return_stock, take_stock
 from .models import Cart, CartItem, Order, OrderItem
 from .serializers import CartSerializer, CartItemSerializer, OrderSerializer
 from user_app.models import User, BuyerProfile
 from store_app.models import Stall
 
 
+def _shortage_list(shortages):
+    return [{"stall_id": stall_id, "missing": missing} for stall_id, missing in sorted(shortages.items())]
+
+
 class CartViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
 
@@ -49,12 +54,16 @@ class CartViewSet(viewsets.ViewSet):
         except Stall.DoesNotExist:
             return Response({"detail": "Invalid stall_id."}, status=400)
 
-        item = CartItem.objects.filter(cart=cart, stall=stall).first()
-        if item:
-            created = False
-        else:
-            CartItem.objects.create(cart=cart, stall=stall)
-            created = True
+        try:
+            with transaction.atomic():
+                # Holds the meal for STOCK_HOLD_TTL; adding it again renews the hold
+                place_hold(cart, stall.pk)
+                _, created = CartItem.objects.get_or_create(cart=cart, stall=stall)
+        except OutOfStock as exc:
+            return Response(
+                {"detail": "This meal is sold out.", "unavailable": _shortage_list(exc.shortages)},
+                status=409,
+            )
 
         return Response(CartSerializer(cart).data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
@@ -81,7 +90,9 @@ class CartViewSet(viewsets.ViewSet):
             item = cart.items.get(pk=item_id)
         except CartItem.DoesNotExist:
             return Response({"detail": "Item not found in cart."}, status=404)
-        item.delete()
+        with transaction.atomic():
+            item.delete()
+            release_holds(cart, [item.stall_id])
         return Response(CartSerializer(cart).data)
 
     @action(detail=False, methods=["post"], url_path="checkout")
@@ -93,30 +104,59 @@ class CartViewSet(viewsets.ViewSet):
         if cart.items.count() == 0:
             return Response({"detail": "Cart is empty."}, status=400)
 
-        with transaction.atomic():
-            # Create order snapshot without inventory checks; chef will accept/decline
-            order = Order.objects.create(buyer_profile=cart.buyer_profile)
-            total_cents = 0
-            for item in cart.items.select_related("stall"):
-                stall = item.stall
-                line_total = (stall.price_cents or 0)
-                total_cents += line_total
-                OrderItem.objects.create(
-                    order=order,
-                    stall=stall,
-                    product_name=stall.product,
-                    price_cents=stall.price_cents,
-                    quantity=1,
+        # Stock is decremented with conditional UPDATEs (cart_app.inventory), turning
+        # this cart's holds into the order; with `allow_partial`, sold-out lines
+        # are left out instead of failing the order
+        partial = str(request.data.get("allow_partial", "")).lower() in ("1", "true", "yes")
+        try:
+            with transaction.atomic():
+                # Row-locks only this cart, so a double submit checks out once
+                cart = Cart.objects.select_for_update().get(pk=cart.pk)
+                if cart.status != Cart.OPEN:
+                    return Response({"detail": "Cart is already checked out."}, status=409)
+                items = list(cart.items.select_related("stall").order_by("stall_id"))
+                taken = allocate(
+                    [(item.stall_id, item.quantity) for item in items], partial=partial, cart=cart
                 )
-
-            order.total_cents = total_cents
-            order.save(update_fields=["total_cents"])
-
-            # Close cart
-            cart.status = Cart.CHECKED_OUT
-            cart.save(update_fields=["status"])
-
-        return Response(OrderSerializer(order).data, status=201)
+                if not any(taken.values()):
+                    raise OutOfStock({item.stall_id: item.quantity for item in items})
+
+                # Snapshot names and prices of what was actually reserved
+                order = Order.objects.create(buyer_profile=cart.buyer_profile)
+                total_cents = 0
+                unfilled = {}
+                for item in items:
+                    # One cart line per stall, so the stall's allocation is the line's
+                    quantity = taken[item.stall_id]
+                    if quantity < item.quantity:
+                        unfilled[item.stall_id] = item.quantity - quantity
+                    if not quantity:
+                        continue
+                    stall = item.stall
+                    total_cents += (stall.price_cents or 0) * quantity
+                    OrderItem.objects.create(
+                        order=order,
+                        stall=stall,
+                        product_name=stall.product,
+                        price_cents=stall.price_cents,
+                        quantity=quantity,
+                    )
+
+                order.total_cents = total_cents
+                order.save(update_fields=["total_cents"])
+
+                # Close cart
+                cart.status = Cart.CHECKED_OUT
+                cart.save(update_fields=["status"])
+        except OutOfStock as exc:
+            return Response(
+                {"detail": "Some meals are sold out.", "unavailable": _shortage_list(exc.shortages)},
+                status=409,
+            )
+
+        data = OrderSerializer(order).data
+        data["unfilled"] = _shortage_list(unfilled)
+        return Response(data, status=201)
 
     @action(detail=False, methods=["get"], url_path="orders")
     def list_buyer_orders(self, request):
@@ -151,9 +191,22 @@ class CartViewSet(viewsets.ViewSet):
             item = OrderItem.objects.select_related("stall").get(pk=order_item_id)
         except OrderItem.DoesNotExist:
             return Response({"detail": "Order item not found."}, status=404)
-        if item.stall is None or item.stall.owner_profile_id != request.user.seller_profile_id:
+        seller_profile = getattr(request.user, "seller_profile", None)
+        if item.stall is None or item.stall.owner_profile_id != getattr(seller_profile, "id", None):
             return Response({"detail": "You do not own this order item."}, status=403)
-        item.status = status_val
-        item.save(update_fields=["status"])
+        with transaction.atomic():
+            # Conditional on the old status, so a line's stock moves exactly once
+            lines = OrderItem.objects.filter(pk=item.pk)
+            if status_val == "declined":
+                if lines.exclude(status="declined").update(status="declined"):
+                    return_stock(item.stall_id, item.quantity)
+            elif lines.filter(status="declined").update(status="accepted"):
+                # Accepting a declined line takes its stock again
+                if not take_stock(item.stall_id, item.quantity):
+                    transaction.set_rollback(True)
+                    return Response({"detail": "Not enough stock left to accept."}, status=409)
+            else:
+                lines.update(status="accepted")
+            item.refresh_from_db(fields=["status"])
         from .serializers import OrderItemSerializer
         return Response(OrderItemSerializer(item).data)
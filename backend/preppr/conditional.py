@@ -0,0 +1,57 @@
+"""Conditional GET (ETag / Last-Modified) support for DRF detail routes."""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalRetrieveMixin:
+    """
+    Strong ETag + Last-Modified for `retrieve`, derived from the row's `updated_at`.
+
+    Validators come from a single `pk, updated_at` lookup, so a matching
+    `If-None-Match` / `If-Modified-Since` is answered with 304 before the
+    object is loaded or serialized. Views whose payload depends on more than
+    the row (e.g. the requesting user) fold that in via `get_etag_extra`.
+    """
+
+    def get_validators(self):
+        """`(etag, last_modified)` for the requested object, or None if not found."""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        filter_kwargs = {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        try:
+            row = (
+                self.get_queryset()
+                .filter(**filter_kwargs)
+                .values_list("pk", "updated_at")
+                .first()
+            )
+        except (TypeError, ValueError):
+            return None
+        if row is None:
+            return None
+        pk, updated_at = row
+        raw = f"{pk}:{updated_at.isoformat()}:{self.get_etag_extra(pk)}"
+        etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+        return etag, int(updated_at.timestamp())
+
+    def get_etag_extra(self, pk):
+        return ""
+
+    def get_retrieve_response(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = self.get_validators()
+        if validators is None:
+            # Let the normal path produce the 404
+            return self.get_retrieve_response(request, *args, **kwargs)
+        etag, last_modified = validators
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        response = not_modified or self.get_retrieve_response(request, *args, **kwargs)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        # Always revalidate: the 304 path is cheap, stale bodies are not
+        response["Cache-Control"] = "private, no-cache"
+        patch_vary_headers(response, ["Authorization"])
+        return response
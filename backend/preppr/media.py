@@ -0,0 +1,174 @@
+"""
+Serving `MEDIA_ROOT` files from Django.
+
+`serve_media` answers `If-Modified-Since`/`If-None-Match` with 304 from a
+single `stat()`, serves single `Range` requests, and marks content-hashed
+paths (store_app.storage blobs and their variants) as cacheable forever.
+Everything else is cached for `MEDIA_MAX_AGE` seconds and revalidated.
+
+The bytes themselves are sent in one of two ways:
+
+- with `MEDIA_SENDFILE = "x-accel-redirect"` (nginx) or `"x-sendfile"`
+  (Apache, lighttpd) the response is only headers and the front proxy reads
+  the file, ranges included, so workers never stream image bytes
+- otherwise a `FileResponse`, which WSGI servers with `wsgi.file_wrapper`
+  (gunicorn, uWSGI) hand to `sendfile()`
+"""
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+DEFAULT_MAX_AGE = 3600
+# Named after the SHA-256 of their content (or of their source image), never rewritten
+CONTENT_HASHED = re.compile(r"^(?:variants/)?blobs/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})[-.]")
+BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class FileRange:
+    """Read-only view of `length` bytes of `file`, starting at its current position."""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    `(start, end)` (inclusive) for a single `bytes=` range of a `size`-byte file.
+
+    Returns None when the header should be ignored (absent, malformed or a
+    multi-range set, which is answered with the whole file) and `()` when it
+    cannot be satisfied.
+    """
+    match = BYTE_RANGE.match((header or "").replace(" ", ""))
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the final `last` bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    if start >= size or size == 0:
+        return ()
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    validator = request.headers.get("If-Range")
+    if validator is None:
+        return True
+    if validator.startswith(('"', "W/")):
+        return validator == etag
+    return parse_http_date_safe(validator) == last_modified
+
+
+def _cache_control(path):
+    if CONTENT_HASHED.match(path):
+        return f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    return f"public, max-age={getattr(settings, 'MEDIA_MAX_AGE', DEFAULT_MAX_AGE)}, must-revalidate"
+
+
+def _sendfile_headers(path, fullpath):
+    mode = (getattr(settings, "MEDIA_SENDFILE", None) or "").lower()
+    if mode == "x-accel-redirect":
+        prefix = getattr(settings, "MEDIA_ACCEL_PREFIX", "/protected-media/")
+        return {"X-Accel-Redirect": prefix.rstrip("/") + "/" + quote(path)}
+    if mode == "x-sendfile":
+        return {"X-Sendfile": fullpath}
+    return None
+
+
+@require_safe
+def serve_media(request, path):
+    # Dotfiles are in-progress writes (store_app.storage) or not meant to be public
+    if any(part.startswith(".") for part in path.split("/")):
+        raise Http404("Not found.")
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        info = os.stat(fullpath)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404("Not found.")
+    if not stat.S_ISREG(info.st_mode):
+        raise Http404("Not found.")
+
+    size = info.st_size
+    last_modified = int(info.st_mtime)
+    hashed = CONTENT_HASHED.match(path)
+    etag = quote_etag(hashed.group(1) if hashed and path.startswith("blobs/") else f"{size:x}-{info.st_mtime_ns:x}")
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(last_modified),
+        "Cache-Control": _cache_control(path),
+        "Accept-Ranges": "bytes",
+    }
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or "application/octet-stream"
+    handoff = _sendfile_headers(path, fullpath)
+    if handoff is not None:
+        # The proxy sends the body and handles Range itself
+        response = HttpResponse(content_type=content_type)
+        for name, value in {**headers, **handoff}.items():
+            response[name] = value
+        return response
+
+    byte_range = None
+    if request.method == "GET" and _if_range_matches(request, etag, last_modified):
+        byte_range = parse_range(request.headers.get("Range"), size)
+    if byte_range == ():
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if request.method == "HEAD":
+        response = HttpResponse(content_type=content_type)
+        response["Content-Length"] = str(size)
+    elif byte_range:
+        start, end = byte_range
+        file = open(fullpath, "rb")
+        file.seek(start)
+        # Ranges reaching the end stream the real file, which sendfile() can take from here
+        body = file if end == size - 1 else FileRange(file, end - start + 1)
+        response = FileResponse(body, status=206, content_type=content_type)
+        response["Content-Length"] = str(end - start + 1)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    else:
+        response = FileResponse(open(fullpath, "rb"), content_type=content_type)
+    if encoding:
+        response["Content-Encoding"] = encoding
+    for name, value in headers.items():
+        response[name] = value
+    return response
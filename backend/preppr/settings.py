@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",  
+    "django.contrib.postgres",
     # third party apps
     "corsheaders",
     "rest_framework",
@@ -140,6 +141,55 @@ STATIC_URL = "static/"
 # Media uploads (images)
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# How preppr.media hands files to the front proxy: None (FileResponse),
+# "x-accel-redirect" (nginx `internal` location at MEDIA_ACCEL_PREFIX, aliased
+# to MEDIA_ROOT) or "x-sendfile" (Apache mod_xsendfile, lighttpd)
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_PREFIX = "/protected-media/"
+MEDIA_MAX_AGE = 3600  # seconds; content-hashed files are cached for a year
+# Resized JPEG/WebP renditions of uploaded photos (store_app.images)
+IMAGE_VARIANT_WIDTHS = (160, 320, 640, 1280)
+IMAGE_VARIANT_WORKERS = 2  # processes rendering them outside the request
+IMAGE_VARIANTS_INLINE = False  # render synchronously instead (tests, one-off scripts)
+# Chunked uploads (store_app.uploads): partial files live here until completed
+IMAGE_UPLOAD_TEMP_DIR = BASE_DIR / "uploads"
+IMAGE_UPLOAD_MAX_BYTES = 25 * 1024 * 1024
+
+# Caching: serialized stalls are cached per stall + version (store_app.cache).
+# Local memory is per process, so changes made by other workers or management
+# commands show up only once STALL_CACHE_TTL runs out; with several workers on
+# one host use the file-based backend (or a shared cache) so invalidations
+# reach every worker:
+# "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+# "LOCATION": BASE_DIR / "cache",
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "preppr",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+}
+STALL_CACHE_TTL = 5 * 60  # seconds a serialized stall fragment may live
+FACET_CACHE_TTL = 60  # seconds facet counts for one filter set may be reused
+LABELS_CACHE_TTL = 5 * 60  # seconds before workers reload the tag/allergen vocabulary regardless
+
+# ?sort=best scoring (store_app.scoring); weights are renormalized over the
+# components that apply to a request
+STALL_SCORE_WEIGHTS = {"distance": 0.35, "rating": 0.3, "price": 0.15, "macros": 0.2}
+STALL_RATING_PRIOR_MEAN = 3.5  # Bayesian rating: every stall starts with...
+STALL_RATING_PRIOR_COUNT = 5  # ...this many reviews at the prior mean
+STALL_SCORE_PRICE_CAP_CENTS = 3000  # price that scores 0 when no ?price_max is given
+STALL_BEST_SNAPSHOT_TTL = 60  # seconds later ?sort=best pages reuse the first page's scores
+MEAL_PLAN_TIME_LIMIT = 0.2  # seconds /api/stalls/plan/ may spend in the solver
+# Adding a meal to a cart holds it this long (cart_app.inventory); expired
+# holds stop counting at once and are deleted by `manage.py release_stock_holds`
+STOCK_HOLD_TTL = 15 * 60  # seconds
+
+# Geocoding: zipcodes resolve from the local ZipCentroid table
+# (`manage.py load_zip_centroids`). Free-form addresses and unknown zipcodes
+# fall back to this remote geocoder; set to None to stay fully offline.
+GEOCODER_FALLBACK = "nominatim"
+ZIP_INDEX_RECHECK = 60  # seconds between checks for a reloaded ZIP table
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -1,11 +1,11 @@
 """
 URL configuration for preppr project.
 """
+import re
 
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import include, path, re_path
 from django.conf import settings
-from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
@@ -18,8 +18,9 @@ from user_app.views import (
     LogoutView,
 
 )
-from store_app.views import StallViewSet
+from store_app.views import ImageUploadViewSet, StallViewSet
 from cart_app.views import CartViewSet
+from preppr.media import serve_media
 
 # DRF router resources
 router = DefaultRouter()
@@ -27,6 +28,7 @@ router.register("me", MeViewSet, basename="me")
 router.register("buyers", BuyerProfileViewSet, basename="buyers")
 router.register("sellers", SellerProfileViewSet, basename="sellers")
 router.register("stalls", StallViewSet, basename="stalls")
+router.register("uploads", ImageUploadViewSet, basename="uploads")
 router.register("auth/register", UserRegistrationViewSet, basename="register")  # POST /api/auth/register/
 router.register("cart", CartViewSet, basename="cart")
 
@@ -43,6 +45,7 @@ urlpatterns = [
 
 ]
 
-# Serve uploaded media in development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Uploaded media; in production the front proxy serves it or takes over via MEDIA_SENDFILE
+urlpatterns += [
+    re_path(rf"^{re.escape(settings.MEDIA_URL.lstrip('/'))}(?P<path>.+)$", serve_media, name="media"),
+]
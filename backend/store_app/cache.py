@@ -0,0 +1,116 @@
+"""
+Versioned cache of serialized stalls.
+
+Each stall has a version counter (`stall:<id>:v`) that signals bump whenever
+the stall, its tags/allergens, images or seller change. Serialized
+StallSerializer payloads are cached under `stall:<id>:<version>:<host>`, so
+a bump makes old fragments unreachable instead of deleting them. Lists are
+assembled from per-stall fragments; only misses hit the database.
+
+Fields that depend on the request (`is_favorited`, `distance_m`) are never
+cached and are filled in per response.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+
+from .models import CATALOG_PREFETCH
+from .serializers import StallSerializer
+
+PER_REQUEST_FIELDS = ("is_favorited", "distance_m")
+DEFAULT_TTL = 5 * 60
+
+
+def _version_key(stall_id):
+    return f"stall:{stall_id}:v"
+
+
+def _new_version():
+    # Never restart from 0 after an eviction, or stale fragments could match again
+    return time.time_ns()
+
+
+def _variant(request):
+    """Payloads embed absolute media URLs, so fragments are per scheme+host."""
+    if request is None:
+        return "-"
+    return hashlib.md5(request.build_absolute_uri("/").encode()).hexdigest()[:12]
+
+
+def get_versions(stall_ids):
+    keys = {stall_id: _version_key(stall_id) for stall_id in stall_ids}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for stall_id, key in keys.items():
+        if key not in found:
+            cache.add(key, _new_version(), timeout=None)
+            found[key] = cache.get(key)
+        versions[stall_id] = found[key]
+    return versions
+
+
+def bump_stall_versions(stall_ids):
+    """Invalidate cached payloads for `stall_ids` once the current transaction commits."""
+    stall_ids = {stall_id for stall_id in stall_ids if stall_id is not None}
+    if not stall_ids:
+        return
+
+    def bump():
+        for stall_id in stall_ids:
+            key = _version_key(stall_id)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, _new_version(), timeout=None)
+
+    transaction.on_commit(bump)
+
+
+def local_cache_warning():
+    """
+    Notice for management commands that change stalls, or None with a shared cache.
+
+    Their version bumps land in their own process's LocMemCache, so running
+    servers keep serving the old payloads until `STALL_CACHE_TTL` runs out.
+    """
+    if not isinstance(caches["default"], LocMemCache):
+        return None
+    ttl = getattr(settings, "STALL_CACHE_TTL", DEFAULT_TTL)
+    return (
+        f"The cache is local to each process: running servers may show the previous stall data "
+        f"for up to {ttl} seconds (STALL_CACHE_TTL). Use a shared CACHES backend to avoid this."
+    )
+
+
+def serialize_stalls(stalls, context):
+    """StallSerializer payloads for `stalls` (in order), reusing cached fragments."""
+    stalls = list(stalls)
+    if not stalls:
+        return []
+    variant = _variant(context.get("request"))
+    versions = get_versions([stall.id for stall in stalls])
+    keys = {stall.id: f"stall:{stall.id}:{versions[stall.id]}:{variant}" for stall in stalls}
+    fragments = cache.get_many(keys.values())
+
+    misses = [stall for stall in stalls if keys[stall.id] not in fragments]
+    if misses:
+        prefetch_related_objects(misses, *CATALOG_PREFETCH)
+        fresh = {}
+        for stall, payload in zip(misses, StallSerializer(misses, many=True, context=context).data):
+            fresh[keys[stall.id]] = {k: v for k, v in payload.items() if k not in PER_REQUEST_FIELDS}
+        cache.set_many(fresh, getattr(settings, "STALL_CACHE_TTL", DEFAULT_TTL))
+        fragments.update(fresh)
+
+    serializer = StallSerializer(context=context)
+    results = []
+    for stall in stalls:
+        payload = dict(fragments[keys[stall.id]])
+        payload["is_favorited"] = serializer.get_is_favorited(stall)
+        payload["distance_m"] = serializer.get_distance_m(stall)
+        results.append(payload)
+    return results
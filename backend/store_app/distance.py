@@ -0,0 +1,40 @@
+"""Vectorized distance ranking for stall proximity search."""
+from typing import Iterable, Tuple
+
+import numpy as np
+
+from .geo import EARTH_RADIUS_M
+
+
+def batch_haversine_m(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Great-circle distances (meters) from one point to arrays of points, in one pass."""
+    lat1 = np.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlng = np.radians(lngs) - np.radians(lng)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def rank_by_distance(
+    lat: float,
+    lng: float,
+    candidates: Iterable[Tuple[int, float, float, int]],
+    radius_m: float,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rank `(id, latitude, longitude, radius_m)` candidate rows by distance.
+
+    Keeps only rows within `min(radius_m, row radius)` and returns
+    `(ids, distances)` sorted nearest first, ties broken by id.
+    """
+    rows = np.array(list(candidates), dtype=np.float64).reshape(-1, 4)
+    if not len(rows):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    ids = rows[:, 0].astype(np.int64)
+    distances = batch_haversine_m(lat, lng, rows[:, 1], rows[:, 2])
+    limits = np.minimum(max(float(radius_m), 0.0), np.maximum(rows[:, 3], 0.0))
+    mask = distances <= limits
+    ids, distances = ids[mask], distances[mask]
+    order = np.lexsort((ids, distances))
+    return ids[order], distances[order]
@@ -0,0 +1,85 @@
+"""
+Facet counts for the catalog filter sidebar.
+
+All counts come from one aggregate query: a `COUNT(*) FILTER (WHERE ...)`
+per tag, allergen, price level and calorie band over the filtered stalls.
+Tag/allergen membership is tested on the `tag_ids`/`allergen_ids` arrays,
+so the query is a single pass over `store_app_stall` without joins.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .labels import vocabulary
+
+PRICE_LEVELS = (1, 2, 3, 4)
+
+# (label, min calories, max calories inclusive or None)
+CALORIE_BANDS = (
+    ("0-299", 0, 299),
+    ("300-499", 300, 499),
+    ("500-799", 500, 799),
+    ("800+", 800, None),
+)
+
+
+def _band_q(low, high):
+    q = Q(calories__gte=low)
+    return q & Q(calories__lte=high) if high is not None else q
+
+
+def facet_counts(queryset):
+    """Counts per tag, allergen, price level and calorie band over `queryset`."""
+    labels = vocabulary()
+    tags = [(e["id"], e["text"]) for e in labels.entries if e["type"] == "tag"]
+    allergens = [(e["id"], e["text"]) for e in labels.entries if e["type"] == "allergen"]
+
+    aggregates = {"total": Count("pk")}
+    for tag_id, _ in tags:
+        aggregates[f"tag_{tag_id}"] = Count("pk", filter=Q(tag_ids__contains=[tag_id]))
+    for allergen_id, _ in allergens:
+        aggregates[f"allergen_{allergen_id}"] = Count(
+            "pk", filter=Q(allergen_ids__contains=[allergen_id])
+        )
+    for level in PRICE_LEVELS:
+        aggregates[f"price_{level}"] = Count("pk", filter=Q(price_level=level))
+    for index, (_, low, high) in enumerate(CALORIE_BANDS):
+        aggregates[f"calories_{index}"] = Count("pk", filter=_band_q(low, high))
+
+    counts = queryset.order_by().aggregate(**aggregates)
+
+    def by_count(rows):
+        return sorted(rows, key=lambda row: (-row["count"], row["name"].lower()))
+
+    return {
+        "total": counts["total"],
+        "tags": by_count(
+            {"id": pk, "name": name, "count": counts[f"tag_{pk}"]} for pk, name in tags
+        ),
+        "allergens": by_count(
+            {"id": pk, "name": name, "count": counts[f"allergen_{pk}"]} for pk, name in allergens
+        ),
+        "price_level": [
+            {"value": level, "count": counts[f"price_{level}"]} for level in PRICE_LEVELS
+        ],
+        "calories": [
+            {"band": label, "min": low, "max": high, "count": counts[f"calories_{index}"]}
+            for index, (label, low, high) in enumerate(CALORIE_BANDS)
+        ],
+    }
+
+
+def cached_facet_counts(queryset, catalog_filter):
+    """`facet_counts` memoized for `settings.FACET_CACHE_TTL` per normalized filter set."""
+    payload = json.dumps(
+        [catalog_filter.normalized(), vocabulary().version], sort_keys=True, default=str
+    )
+    key = "facets:" + hashlib.md5(payload.encode()).hexdigest()
+    counts = cache.get(key)
+    if counts is None:
+        counts = facet_counts(queryset)
+        cache.set(key, counts, getattr(settings, "FACET_CACHE_TTL", 60))
+    return counts
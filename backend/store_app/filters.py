@@ -0,0 +1,161 @@
+import math
+from typing import List, Optional, Tuple
+
+from .geo import METERS_PER_MILE, zip_centroid
+
+# Largest search radius honored; wider ones are clamped (a delivery range
+# beyond this is meaningless, and huge radii cover the whole geohash grid)
+MAX_RADIUS_M = 500_000.0
+
+# ?<name>_min= / ?<name>_max= range params -> Stall field (inclusive bounds)
+RANGE_FILTERS = {
+    "calories": "calories",
+    "protein": "protein_g",
+    "carbs": "carbs_g",
+    "fat": "fat_g",
+    "price": "price_cents",
+    "price_level": "price_level",
+}
+
+
+def _names(value) -> List[str]:
+    """`"vegan, keto,,vegan"` -> `["keto", "vegan"]`."""
+    return sorted({name.strip() for name in (value or "").split(",") if name.strip()})
+
+
+def range_lookups(params) -> dict:
+    """`?calories_max=600&protein_min=30` -> `{"calories__lte": 600.0, "protein_g__gte": 30.0}`."""
+    ranges = {}
+    for name, field in RANGE_FILTERS.items():
+        for suffix, lookup in (("min", "gte"), ("max", "lte")):
+            try:
+                value = float(params[f"{name}_{suffix}"])
+            except (KeyError, TypeError, ValueError):
+                # ignore missing/invalid bounds
+                continue
+            # `nan`/`inf` parse as floats but cannot be compared with integer columns
+            if math.isfinite(value):
+                ranges[f"{field}__{lookup}"] = value
+    return ranges
+
+
+class CatalogFilter:
+    """
+    The stall catalog's filter query params, parsed once.
+
+    Shared by the list route and the facets action so both see exactly the
+    same stalls. `normalized()` is a canonical form of the filter set (order,
+    spacing and unused params do not matter), suitable for cache keys.
+    """
+
+    def __init__(self, params, user=None):
+        # ?tags=gluten-free,vegan: stalls with any of the tags
+        self.tags = _names(params.get("tags"))
+        # ?allergens_exclude=fish,nuts: stalls with none of the allergens
+        self.allergens_exclude = _names(params.get("allergens_exclude"))
+        # ?category=vegan: single tag name, case-insensitive
+        self.category = (params.get("category") or "").strip().lower() or None
+        # ?q=salmon bowl: full-text search (see store_app.search)
+        self.q = " ".join((params.get("q") or "").split()) or None
+        # ?lat=37.79&lng=-122.41&radius=5 or ?zip=94107&radius=5 (`radius` in
+        # miles, or `radius_m` in meters); ?zip alone matches the seller zipcode
+        self.zip = (params.get("zip") or "").strip() or None
+        self.radius_m = self._radius_m(params)
+        self.center = self._center(params) if self.radius_m is not None else None
+        # ?calories_max=600&protein_min=30&price_max=1500 (see RANGE_FILTERS)
+        self.ranges = range_lookups(params)
+        # ?seller=12 (the seller's user id, as in each stall's `seller.id`) or
+        # ?seller=me for the requesting user's own stalls
+        self.seller = self._seller(params, user)
+
+    @staticmethod
+    def _seller(params, user) -> Optional[int]:
+        value = (params.get("seller") or "").strip()
+        if not value:
+            return None
+        if value == "me":
+            # Anonymous users have no stalls; 0 is never a user id
+            return user.pk if user is not None and user.is_authenticated else 0
+        try:
+            return int(value)
+        except ValueError:
+            # ignore invalid seller
+            return None
+
+    @staticmethod
+    def _radius_m(params) -> Optional[float]:
+        try:
+            if params.get("radius_m"):
+                radius_m = float(params["radius_m"])
+            elif params.get("radius"):
+                radius_m = float(params["radius"]) * METERS_PER_MILE
+            else:
+                return None
+        except (TypeError, ValueError):
+            # ignore invalid radius
+            return None
+        # `nan`, `inf` and non-positive radii are ignored like malformed ones
+        if not math.isfinite(radius_m) or radius_m <= 0:
+            return None
+        return min(radius_m, MAX_RADIUS_M)
+
+    def _center(self, params) -> Optional[Tuple[float, float]]:
+        try:
+            if params.get("lat") and params.get("lng"):
+                lat, lng = float(params["lat"]), float(params["lng"])
+                # Comparisons are False for nan, so this also rejects it
+                if -90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0:
+                    return (lat, lng)
+                return None
+        except (TypeError, ValueError):
+            return None
+        if self.zip:
+            return zip_centroid(self.zip)
+        return None
+
+    def apply(self, qs):
+        if self.seller is not None:
+            qs = qs.filter(owner_profile__user_id=self.seller)
+
+        # Bounds are index range conditions on the (field, id) indexes
+        if self.ranges:
+            qs = qs.filter(**self.ranges)
+
+        # Label filters match the denormalized `tag_ids`/`allergen_ids` arrays
+        # (GIN-indexed `&&`), so they need neither joins nor DISTINCT; names
+        # resolve to ids inside the same query
+        if self.tags:
+            qs = qs.with_tag_names(self.tags)
+        if self.allergens_exclude:
+            qs = qs.without_allergen_names(self.allergens_exclude)
+        if self.category:
+            qs = qs.with_tag_names([self.category], ignore_case=True)
+
+        # Annotates `rank`
+        if self.q:
+            qs = qs.search(self.q)
+
+        # Annotates `distance_m`
+        if self.center:
+            qs = qs.within_radius(self.center[0], self.center[1], self.radius_m)
+        elif self.zip:
+            try:
+                qs = qs.filter(owner_profile__zipcode=int(self.zip))
+            except (TypeError, ValueError):
+                # ignore invalid zip
+                pass
+        return qs
+
+    def normalized(self) -> dict:
+        center = self.center and [round(self.center[0], 5), round(self.center[1], 5)]
+        return {
+            "tags": self.tags,
+            "allergens_exclude": self.allergens_exclude,
+            "category": self.category,
+            "q": self.q and self.q.lower(),
+            # A resolved center supersedes the seller-zipcode match
+            "near": center and [*center, round(self.radius_m)],
+            "zip": None if center else self.zip,
+            "ranges": sorted(self.ranges.items()),
+            "seller": self.seller,
+        }
@@ -0,0 +1,235 @@
+import math
+import re
+import time
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+
+# Geo helpers
+try:
+    from geopy.geocoders import Nominatim
+except Exception:  # Allow import even if geopy not yet installed
+    Nominatim = None
+
+
+_geolocator = None
+_zip_index = None
+_zip_stamp = None
+_zip_checked_at = 0.0
+
+# Bumped by `load_zip_centroids`; part of the stamp compared below
+ZIP_INDEX_VERSION_KEY = "geo:zip-index:v"
+DEFAULT_ZIP_INDEX_RECHECK = 60
+
+_ZIP_RE = re.compile(r"^\s*(\d{5})(?:-\d{4})?\s*$")
+
+
+def _get_geolocator():
+    """Return a process-wide geolocator instead of building one per call."""
+    global _geolocator
+    if _geolocator is None and Nominatim is not None:
+        _geolocator = Nominatim(user_agent="preppr_api")
+    return _geolocator
+
+
+def parse_zipcode(value) -> Optional[int]:
+    """`94107`, `"94107"` or `"94107-1234"` -> 94107; anything else -> None."""
+    if isinstance(value, int):
+        return value if 0 <= value <= 99999 else None
+    match = _ZIP_RE.match(str(value or ""))
+    return int(match.group(1)) if match else None
+
+
+def _zip_table_stamp():
+    """`(rows, max id, version)` of the ZIP table; changes whenever it is (re)loaded."""
+    from django.core.cache import cache
+    from django.db.models import Count, Max
+
+    from .models import ZipCentroid
+
+    table = ZipCentroid.objects.aggregate(rows=Count("pk"), last=Max("pk"))
+    return table["rows"], table["last"], cache.get(ZIP_INDEX_VERSION_KEY)
+
+
+def _get_zip_index():
+    """
+    Every ZipCentroid row as a dict, kept per process.
+
+    At most every `ZIP_INDEX_RECHECK` seconds one aggregate query compares
+    the table's stamp with the loaded one, so servers pick up a
+    `load_zip_centroids` run (even one that started from an empty table)
+    without a restart.
+    """
+    global _zip_index, _zip_stamp, _zip_checked_at
+    now = time.monotonic()
+    recheck = getattr(settings, "ZIP_INDEX_RECHECK", DEFAULT_ZIP_INDEX_RECHECK)
+    if _zip_index is not None and now - _zip_checked_at < recheck:
+        return _zip_index
+    stamp = _zip_table_stamp()
+    _zip_checked_at = now
+    if _zip_index is None or stamp != _zip_stamp:
+        from .models import ZipCentroid
+
+        _zip_index = {
+            zipcode: (lat, lng)
+            for zipcode, lat, lng in ZipCentroid.objects.values_list(
+                "zipcode", "latitude", "longitude"
+            ).iterator(chunk_size=10000)
+        }
+        _zip_stamp = stamp
+    return _zip_index
+
+
+def reset_zip_index():
+    """Reload the ZIP table here on the next lookup, and in other processes at their next check."""
+    global _zip_index
+    from django.core.cache import cache
+
+    _zip_index = None
+    try:
+        cache.incr(ZIP_INDEX_VERSION_KEY)
+    except ValueError:
+        cache.set(ZIP_INDEX_VERSION_KEY, 1, timeout=None)
+
+
+def zip_centroid(zipcode) -> Optional[Tuple[float, float]]:
+    """Offline `zipcode -> (lat, lng)` lookup; never leaves the process."""
+    z = parse_zipcode(zipcode)
+    if z is None:
+        return None
+    return _get_zip_index().get(z)
+
+
+def _nominatim(query: str) -> Optional[Tuple[float, float]]:
+    geolocator = _get_geolocator()
+    if geolocator is None:
+        return None
+    try:
+        loc = geolocator.geocode(query)
+        if not loc:
+            return None
+        return (loc.latitude, loc.longitude)
+    except Exception:
+        return None
+
+
+def geocode(query: str) -> Optional[Tuple[float, float]]:
+    """
+    Resolve a zipcode or free-form address to `(lat, lng)`, or None.
+
+    Zipcodes are answered from the local ZIP-centroid table. Anything else
+    (or a zipcode missing from the table) goes to the remote geocoder only
+    when `settings.GEOCODER_FALLBACK` is set to `"nominatim"`.
+    """
+    if query is None or not str(query).strip():
+        return None
+    coords = zip_centroid(query)
+    if coords:
+        return coords
+    if getattr(settings, "GEOCODER_FALLBACK", None) == "nominatim":
+        return _nominatim(str(query).strip())
+    return None
+
+
+def locate(location: str, zipcode=None) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Coordinates for a profile/stall: its `location`, else its zipcode centroid.
+
+    Always returns a `(lat, lng)` pair (possibly `(None, None)`) for model fields.
+    """
+    coords = geocode(location) or zip_centroid(zipcode)
+    if not coords:
+        return (None, None)
+    return coords
+
+
+# Mean Earth radius in meters (IUGG)
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_MILE = 1609.344
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9  # ~4.8m x 4.8m cells; stored on Stall.geohash
+
+
+def geohash_encode(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Standard base32 geohash of a point."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                bits = (bits << 1) | 1
+                lng_lo = mid
+            else:
+                bits <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_lo = mid
+            else:
+                bits <<= 1
+                lat_hi = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def _geohash_cell_size(precision: int) -> Tuple[float, float]:
+    """(height, width) in degrees of a geohash cell at `precision`."""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return (180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits))
+
+
+def bounding_box(lat: float, lng: float, radius_m: float) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lng, max_lng) enclosing a circle around a point."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    dlng = min(math.degrees(radius_m / (EARTH_RADIUS_M * cos_lat)), 180.0)
+    return (
+        max(lat - dlat, -90.0),
+        min(lat + dlat, 90.0),
+        max(lng - dlng, -180.0),
+        min(lng + dlng, 180.0),
+    )
+
+
+def geohash_cover(bbox: Tuple[float, float, float, float], max_cells: int = 16) -> List[str]:
+    """
+    Geohash prefixes whose cells together cover `bbox`.
+
+    Picks the finest precision that needs at most `max_cells` prefixes so the
+    `LIKE 'prefix%'` scans stay few and narrow.
+    """
+    min_lat, max_lat, min_lng, max_lng = bbox
+    best = [""]
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        height, width = _geohash_cell_size(precision)
+        lat_from = math.floor((min_lat + 90.0) / height)
+        lat_to = math.floor(min(max_lat + 90.0, 180.0 - 1e-9) / height)
+        lng_from = math.floor((min_lng + 180.0) / width)
+        lng_to = math.floor(min(max_lng + 180.0, 360.0 - 1e-9) / width)
+        if (lat_to - lat_from + 1) * (lng_to - lng_from + 1) > max_cells:
+            break
+        best = [
+            geohash_encode(
+                (i + 0.5) * height - 90.0,
+                (j + 0.5) * width - 180.0,
+                precision,
+            )
+            for i in range(lat_from, lat_to + 1)
+            for j in range(lng_from, lng_to + 1)
+        ]
+    return best
@@ -0,0 +1,165 @@
+"""
+Image derivatives: fixed-width JPEG and WebP renditions of uploaded photos.
+
+`Stall.image`, `StallImage.image` and `SellerProfile.image` each have a
+`*variants` JSON field describing their renditions:
+
+    {"source": "stalls/images/a.jpg", "width": 3024, "height": 4032,
+     "sizes": {"320": {"jpeg": "variants/stalls/images/a-320.jpg",
+                       "webp": "variants/stalls/images/a-320.webp"}, ...}}
+
+After an upload commits, `schedule_variants` hands the rendering to a process
+pool (`render_variants` only touches storage, never the database), and the
+result is written back from the parent once the pool is done. Serializers
+expose the renditions through `variant_urls` as a srcset-style map.
+`manage.py build_image_variants` backfills existing media.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.db.models.functions import Now
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = (160, 320, 640, 1280)
+# format -> (Pillow format, file extension, save options)
+VARIANT_FORMATS = {
+    "jpeg": ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+}
+# Model -> its variants field; every model keeps the photo in `image`
+VARIANT_FIELDS = {
+    "store_app.Stall": "image_variants",
+    "store_app.StallImage": "variants",
+    "user_app.SellerProfile": "image_variants",
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def variant_widths():
+    return tuple(sorted(getattr(settings, "IMAGE_VARIANT_WIDTHS", DEFAULT_WIDTHS)))
+
+
+def render_variants(name, widths):
+    """
+    Render `name` (a storage path) at each of `widths` narrower than the original.
+
+    An original narrower than every width gets a single rendition at its own
+    width, so there is always a WebP. Runs in a pool worker: storage only.
+    """
+    from PIL import Image, ImageOps
+
+    with default_storage.open(name, "rb") as source:
+        with Image.open(source) as original:
+            image = ImageOps.exif_transpose(original)
+            image.load()
+    width, height = image.size
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+    stem, _ = os.path.splitext(name)
+    sizes = {}
+    for target in [w for w in widths if w < width] or [width]:
+        resized = image.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+        sizes[str(target)] = {}
+        for key, (pil_format, extension, options) in VARIANT_FORMATS.items():
+            rendition = resized.convert("RGB") if pil_format == "JPEG" else resized
+            path = f"variants/{stem}-{target}.{extension}"
+            buffer = io.BytesIO()
+            rendition.save(buffer, pil_format, **options)
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            sizes[str(target)][key] = default_storage.save(path, ContentFile(buffer.getvalue()))
+    return {"source": name, "width": width, "height": height, "sizes": sizes}
+
+
+def _init_worker():
+    # Spawned (non-forked) workers start without Django configured
+    import django
+
+    django.setup()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, "IMAGE_VARIANT_WORKERS", 2),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def store_variants(label, pk, variants):
+    """Save rendered `variants` unless the image was replaced meanwhile, and refresh caches."""
+    from django.apps import apps
+
+    from .cache import bump_stall_versions
+    from .signals import related_changed
+
+    model = apps.get_model(label)
+    field = VARIANT_FIELDS[label]
+    updates = {field: variants}
+    if label != "store_app.StallImage":
+        updates["updated_at"] = Now()
+    if not model.objects.filter(pk=pk, image=variants["source"]).update(**updates):
+        return
+    if label == "store_app.Stall":
+        bump_stall_versions([pk])
+    elif label == "store_app.StallImage":
+        related_changed(model.objects.filter(pk=pk).values_list("stall_id", flat=True))
+    else:
+        stalls = apps.get_model("store_app", "Stall").objects.filter(owner_profile_id=pk)
+        related_changed(stalls.values_list("id", flat=True))
+
+
+def _finished(label, pk, future):
+    # Runs on the pool's management thread, which has its own DB connection
+    try:
+        store_variants(label, pk, future.result())
+    except Exception:
+        logger.exception("Rendering image variants for %s %s failed", label, pk)
+    finally:
+        connections.close_all()
+
+
+def schedule_variants(instance):
+    """Render variants for `instance.image` in the process pool (inline with `IMAGE_VARIANTS_INLINE`)."""
+    label = instance._meta.label
+    name = instance.image.name
+    if getattr(settings, "IMAGE_VARIANTS_INLINE", False):
+        store_variants(label, instance.pk, render_variants(name, variant_widths()))
+        return None
+    future = get_pool().submit(render_variants, name, variant_widths())
+    future.add_done_callback(lambda done: _finished(label, instance.pk, done))
+    return future
+
+
+def needs_variants(instance):
+    """The image changed since its variants were rendered (or it has none yet)."""
+    variants = getattr(instance, VARIANT_FIELDS[instance._meta.label]) or {}
+    return bool(instance.image) and variants.get("source") != instance.image.name
+
+
+def variant_urls(image, variants, request=None):
+    """`{"webp": {"320w": url, ...}, "jpeg": {...}}` for `image`, or None until its variants exist."""
+    variants = variants or {}
+    if not image or variants.get("source") != image.name or not variants.get("sizes"):
+        return None
+    sizes = variants["sizes"]
+    urls = {}
+    for width in sorted(sizes, key=int):
+        for key, name in sizes[width].items():
+            url = default_storage.url(name)
+            urls.setdefault(key, {})[f"{width}w"] = request.build_absolute_uri(url) if request else url
+    return urls
@@ -0,0 +1,199 @@
+"""
+Bulk stall import for `/api/stalls/import/` and `manage.py import_stalls`.
+
+Rows are streamed from CSV or NDJSON and written in batches. Each batch costs a
+fixed number of queries whatever its size:
+
+- one `INSERT ... ON CONFLICT DO UPDATE ... RETURNING` per label kind resolves
+  every tag/allergen name in the batch to an id (creating missing ones)
+- one lookup of which skus already exist (for the created/updated counts)
+- one upsert of the stalls on `(owner_profile, sku)`
+- one DELETE and one INSERT per M2M table to replace the labels
+- one UPDATE rebuilding `tag_ids`/`allergen_ids`/`search_vector`
+
+Rows that fail validation are reported with their row number and skipped;
+the rest of the batch is still written.
+"""
+import csv
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List
+
+from django.db import DatabaseError, transaction
+from django.db.models.functions import Now
+
+from .cache import bump_stall_versions
+from .geo import geohash_encode, locate
+from .labels import invalidate_labels
+from .models import Allergen, Stall, Tag
+from .search import stall_search_vector
+from .serializers import StallImportSerializer
+
+IMPORT_FORMATS = ("csv", "ndjson")
+# CSV cells holding lists, e.g. `tag_names` = "vegan;gluten-free"
+CSV_LIST_FIELDS = ("tag_names", "allergen_names", "options", "includes")
+CSV_LIST_SEPARATOR = ";"
+
+# Written on every upsert; everything else (ratings, images, derived columns) is kept
+IMPORTED_FIELDS = [
+    name for name in StallImportSerializer.Meta.fields if name not in ("sku", "tag_names", "allergen_names")
+]
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    updated: int = 0
+    # {"row": <1-based data row>, "errors": {field: [messages]}}
+    errors: List[dict] = field(default_factory=list)
+
+    def as_dict(self):
+        return {"created": self.created, "updated": self.updated, "errors": self.errors}
+
+
+def import_format(name) -> str:
+    """`"stalls.jsonl"`/`"text/csv"`/`"application/x-ndjson"` -> one of `IMPORT_FORMATS`, or ""."""
+    name = (name or "").lower()
+    if name.endswith("csv"):
+        return "csv"
+    if name.endswith(("ndjson", "jsonl")):
+        return "ndjson"
+    return ""
+
+
+def read_rows(lines: Iterable[str], fmt: str) -> Iterator[object]:
+    """Row dicts from text lines; unparseable NDJSON lines come through as error strings."""
+    if fmt == "csv":
+        for row in csv.DictReader(lines):
+            cleaned = {}
+            for name, value in row.items():
+                # Empty cells fall back to defaults; extra cells (None key) are dropped
+                if name is None or value is None or not value.strip():
+                    continue
+                name = name.strip()
+                if name in CSV_LIST_FIELDS:
+                    cleaned[name] = [part.strip() for part in value.split(CSV_LIST_SEPARATOR) if part.strip()]
+                else:
+                    cleaned[name] = value.strip()
+            yield cleaned
+        return
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield f"Invalid JSON: {exc}"
+            continue
+        yield row if isinstance(row, dict) else "Each line must be a JSON object."
+
+
+def import_stalls(seller_profile, rows: Iterable[object], batch_size: int = 500) -> ImportResult:
+    """Upsert `rows` (see `read_rows`) as `seller_profile`'s stalls, `batch_size` rows per transaction."""
+    result = ImportResult()
+    # Every imported stall sits at the seller's location, as in StallWriteSerializer.create
+    if seller_profile.latitude is not None:
+        coords = (seller_profile.latitude, seller_profile.longitude)
+    else:
+        coords = locate(seller_profile.location, seller_profile.zipcode)
+    geohash = geohash_encode(*coords) if coords[0] is not None else ""
+
+    batch: Dict[str, tuple] = {}
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            result.errors.append({"row": number, "errors": {"non_field_errors": [str(row)]}})
+            continue
+        serializer = StallImportSerializer(data=row)
+        if not serializer.is_valid():
+            result.errors.append({"row": number, "errors": serializer.errors})
+            continue
+        data = serializer.validated_data
+        sku = data["sku"]
+        if sku in batch:
+            # One upsert cannot touch a row twice; the later row wins
+            earlier = batch.pop(sku)[0]
+            result.errors.append(
+                {"row": earlier, "errors": {"sku": [f"Replaced by row {number} with the same sku."]}}
+            )
+        batch[sku] = (number, data)
+        if len(batch) >= batch_size:
+            _write_batch(seller_profile, coords, geohash, batch, result)
+            batch = {}
+    if batch:
+        _write_batch(seller_profile, coords, geohash, batch, result)
+    return result
+
+
+def _resolve_labels(model, names):
+    """`{name: id}` for `names`, creating missing labels, in one round trip."""
+    if not names:
+        return {}
+    labels = model.objects.bulk_create(
+        [model(name=name) for name in sorted(names)],
+        update_conflicts=True,
+        unique_fields=["name"],
+        update_fields=["name"],
+    )
+    return {label.name: label.pk for label in labels}
+
+
+def _write_batch(seller_profile, coords, geohash, batch, result):
+    rows = list(batch.values())
+    try:
+        with transaction.atomic():
+            tag_ids = _resolve_labels(Tag, {name for _, data in rows for name in data["tag_names"]})
+            allergen_ids = _resolve_labels(
+                Allergen, {name for _, data in rows for name in data["allergen_names"]}
+            )
+            existing = set(
+                Stall.objects.filter(owner_profile=seller_profile, sku__in=batch).values_list("sku", flat=True)
+            )
+
+            stalls = []
+            for _, data in rows:
+                values = {name: data[name] for name in IMPORTED_FIELDS if name in data}
+                stalls.append(
+                    Stall(
+                        owner_profile=seller_profile,
+                        sku=data["sku"],
+                        location=seller_profile.location,
+                        latitude=coords[0],
+                        longitude=coords[1],
+                        geohash=geohash,
+                        **values,
+                    )
+                )
+            # Returns every row's id, inserted or updated
+            stalls = Stall.objects.bulk_create(
+                stalls,
+                update_conflicts=True,
+                unique_fields=["owner_profile", "sku"],
+                update_fields=IMPORTED_FIELDS + ["location", "latitude", "longitude", "geohash", "updated_at"],
+            )
+            stall_ids = [stall.pk for stall in stalls]
+
+            # Each row is the whole listing, labels included
+            for through, column, ids, key in (
+                (Stall.tags.through, "tag_id", tag_ids, "tag_names"),
+                (Stall.allergens.through, "allergen_id", allergen_ids, "allergen_names"),
+            ):
+                through.objects.filter(stall_id__in=stall_ids).delete()
+                through.objects.bulk_create(
+                    [
+                        through(stall_id=stall.pk, **{column: ids[name]})
+                        for stall, (_, data) in zip(stalls, rows)
+                        for name in set(data[key])
+                    ]
+                )
+            Stall.objects.filter(pk__in=stall_ids).refresh_label_ids(
+                search_vector=stall_search_vector(Tag), updated_at=Now()
+            )
+            bump_stall_versions(stall_ids)
+            if tag_ids or allergen_ids:
+                invalidate_labels()
+    except DatabaseError as exc:
+        for number, _ in rows:
+            result.errors.append({"row": number, "errors": {"non_field_errors": [f"Not saved: {exc}"]}})
+        return
+    result.updated += len(existing)
+    result.created += len(rows) - len(existing)
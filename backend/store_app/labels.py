@@ -0,0 +1,127 @@
+"""
+In-process copy of the Tag/Allergen vocabulary.
+
+Both tables are small and read for every typeahead and facet request, so
+each worker keeps them in memory. Signals bump the shared `labels:v` cache
+version whenever either table changes; a worker rebuilds its copy once its
+version is stale. The version key expires after `LABELS_CACHE_TTL` seconds,
+so with a per-process cache, where bumps never reach other workers, their
+copies are still rebuilt that often. Catalog filters do not use this copy: they resolve names in
+SQL (`StallQuerySet.with_tag_names`), so they are never stale.
+"""
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Allergen, Tag
+
+LABELS_VERSION_KEY = "labels:v"
+DEFAULT_LABELS_TTL = 5 * 60
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+_vocabulary = None
+_vocabulary_lock = threading.Lock()
+
+
+def word_keys(text):
+    """`"non-dairy cheese"` -> `{"non dairy cheese", "dairy cheese", "cheese"}`."""
+    words = _WORD_RE.findall(text)
+    return {" ".join(words[i:]) for i in range(len(words))}
+
+
+class PrefixTrie:
+    """
+    Character trie over a fixed vocabulary.
+
+    Each entry is reachable from its full text and from every word in it
+    (`gluten-free` from `gl...` and `fr...`). Every node keeps the entries
+    below it, already ranked, so a lookup is one walk down the prefix.
+    """
+
+    def __init__(self, entries=()):
+        self.root = {}
+        self.size = 0
+        for entry in entries:
+            self.insert(entry)
+        self._rank(self.root)
+
+    def insert(self, entry):
+        text = entry["text"].lower()
+        for key in {text} | word_keys(text):
+            node = self.root
+            for char in key:
+                node = node.setdefault(char, {})
+                node.setdefault("", []).append(entry)
+        self.size += 1
+
+    def _rank(self, node):
+        for char, child in node.items():
+            if char == "":
+                # Same entry may arrive through several keys; keep one copy
+                unique = {(e["type"], e["id"]): e for e in child}.values()
+                node[""] = sorted(unique, key=lambda e: (len(e["text"]), e["text"].lower()))
+            else:
+                self._rank(child)
+
+    def complete(self, prefix):
+        """Entries with a full-text or word prefix match, shortest first."""
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        return node.get("", [])
+
+
+class LabelVocabulary:
+    """Every Tag and Allergen, indexed by prefix."""
+
+    def __init__(self, entries, version=None):
+        self.version = version
+        self.entries = list(entries)
+        self.trie = PrefixTrie(entries)
+
+
+def _labels_ttl():
+    return getattr(settings, "LABELS_CACHE_TTL", DEFAULT_LABELS_TTL)
+
+
+def _labels_version():
+    version = cache.get(LABELS_VERSION_KEY)
+    if version is None:
+        cache.add(LABELS_VERSION_KEY, time.time_ns(), timeout=_labels_ttl())
+        version = cache.get(LABELS_VERSION_KEY)
+    return version
+
+
+def vocabulary():
+    """The process-wide vocabulary, rebuilt if Tag/Allergen changed."""
+    global _vocabulary
+    version = _labels_version()
+    if _vocabulary is None or _vocabulary.version != version:
+        with _vocabulary_lock:
+            if _vocabulary is None or _vocabulary.version != version:
+                entries = [
+                    {"type": kind, "id": pk, "text": name}
+                    for kind, model in (("tag", Tag), ("allergen", Allergen))
+                    for pk, name in model.objects.values_list("id", "name")
+                ]
+                _vocabulary = LabelVocabulary(entries, version)
+    return _vocabulary
+
+
+def invalidate_labels():
+    """Rebuild every worker's vocabulary on its next use once the transaction commits."""
+
+    def bump():
+        try:
+            cache.incr(LABELS_VERSION_KEY)
+        except ValueError:
+            cache.set(LABELS_VERSION_KEY, time.time_ns(), timeout=_labels_ttl())
+
+    transaction.on_commit(bump)
@@ -0,0 +1,12 @@
+"""Timing helpers shared by the `bench_*` management commands."""
+import time
+
+
+def best_of(fn, repeat):
+    """Fastest of `repeat` calls of `fn()`, in milliseconds."""
+    best = float("inf")
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
@@ -0,0 +1,80 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store_app.cache import local_cache_warning
+from store_app.geo import geocode, zip_centroid
+from store_app.models import Stall
+from user_app.models import SellerProfile
+
+
+class Command(BaseCommand):
+    help = "Fill coordinates for seller profiles and stalls that have a location/zipcode but none stored."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Re-geocode rows that already have coordinates.",
+        )
+        parser.add_argument(
+            "--delay",
+            type=float,
+            default=1.0,
+            help="Seconds to sleep between geocoder calls (Nominatim allows ~1 req/s).",
+        )
+
+    def handle(self, *args, **options):
+        force = options["force"]
+        delay = max(options["delay"], 0)
+        resolved = {}
+
+        def lookup(location, zipcode=None):
+            key = location.strip()
+            if key and key not in resolved:
+                resolved[key] = zip_centroid(key)
+                if resolved[key] is None:
+                    # Only remote geocoder calls need throttling
+                    resolved[key] = geocode(key)
+                    if delay:
+                        time.sleep(delay)
+            return resolved.get(key) or zip_centroid(zipcode)
+
+        profiles = SellerProfile.objects.exclude(location="", zipcode__isnull=True)
+        if not force:
+            profiles = profiles.filter(latitude__isnull=True)
+        profile_count = 0
+        for profile in profiles.iterator():
+            coords = lookup(profile.location, profile.zipcode)
+            if not coords:
+                self.stderr.write(f"SellerProfile {profile.id}: unable to geocode {profile.location!r}")
+                continue
+            profile.latitude, profile.longitude = coords
+            profile.save(update_fields=["latitude", "longitude"])
+            profile_count += 1
+
+        stalls = Stall.objects.select_related("owner_profile").exclude(location="")
+        if not force:
+            stalls = stalls.filter(latitude__isnull=True)
+        stall_count = 0
+        for stall in stalls.iterator():
+            owner = stall.owner_profile
+            if owner and owner.latitude is not None and owner.location == stall.location:
+                coords = (owner.latitude, owner.longitude)
+            else:
+                coords = lookup(stall.location, owner.zipcode if owner else None)
+            if not coords:
+                self.stderr.write(f"Stall {stall.id}: unable to geocode {stall.location!r}")
+                continue
+            stall.latitude, stall.longitude = coords
+            stall.save(update_fields=["latitude", "longitude"])
+            stall_count += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Backfilled coordinates for {profile_count} seller profiles and {stall_count} stalls."
+            )
+        )
+        warning = local_cache_warning()
+        if warning and (profile_count or stall_count):
+            self.stdout.write(self.style.WARNING(warning))
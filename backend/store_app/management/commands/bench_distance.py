@@ -0,0 +1,55 @@
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from store_app.distance import rank_by_distance
+from store_app.management.benchmark import best_of
+
+try:
+    from geopy.distance import geodesic
+except Exception:  # Allow import even if geopy not yet installed
+    geodesic = None
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark: per-row geopy geodesic loop vs. the vectorized distance engine."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+        parser.add_argument("--repeat", type=int, default=3, help="Best-of-N timing.")
+        parser.add_argument("--radius", type=int, default=5000, help="Buyer radius in meters.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if geodesic is None:
+            raise CommandError("geopy is required for the baseline loop. Please install geopy.")
+
+        rng = np.random.default_rng(options["seed"])
+        origin = (37.7880, -122.4075)
+        radius_m = options["radius"]
+        repeat = max(options["repeat"], 1)
+
+        self.stdout.write(f"{'stalls':>8} {'geopy loop (ms)':>16} {'vectorized (ms)':>16} {'speedup':>8}")
+        for size in options["sizes"]:
+            # Candidates scattered over ~±0.1° around the buyer, like a bbox prefilter returns
+            lats = origin[0] + rng.uniform(-0.1, 0.1, size)
+            lngs = origin[1] + rng.uniform(-0.1, 0.1, size)
+            radii = rng.integers(500, 10000, size)
+            rows = list(zip(range(size), lats.tolist(), lngs.tolist(), radii.tolist()))
+
+            def geopy_loop():
+                results = []
+                for stall_id, lat, lng, seller_radius in rows:
+                    distance_m = geodesic(origin, (lat, lng)).meters
+                    if distance_m <= min(radius_m, seller_radius):
+                        results.append((distance_m, stall_id))
+                results.sort()
+                return results
+
+            def vectorized():
+                return rank_by_distance(origin[0], origin[1], rows, radius_m)
+
+            loop_ms = best_of(geopy_loop, repeat)
+            vec_ms = best_of(vectorized, repeat)
+            self.stdout.write(
+                f"{size:>8} {loop_ms:>16.2f} {vec_ms:>16.2f} {loop_ms / max(vec_ms, 1e-9):>7.1f}x"
+            )
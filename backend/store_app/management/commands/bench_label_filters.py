@@ -0,0 +1,108 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from store_app.management.benchmark import best_of
+from store_app.models import Allergen, Stall, Tag
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark: tag/allergen filters as M2M joins + DISTINCT vs. the GIN-indexed "
+        "tag_ids/allergen_ids arrays, matched by name as the catalog filters do "
+        "(with_tag_names/without_allergen_names) and by known ids. Seeds synthetic stalls "
+        "in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+        parser.add_argument("--tags", type=int, default=40, help="Tag vocabulary size.")
+        parser.add_argument("--allergens", type=int, default=14, help="Allergen vocabulary size.")
+        parser.add_argument("--per-stall", type=int, default=3, help="Tags and allergens per stall.")
+        parser.add_argument("--repeat", type=int, default=5, help="Best-of-N timing.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options["seed"])
+        repeat = max(options["repeat"], 1)
+
+        self.stdout.write(
+            f"{'stalls':>8} {'query':<10} {'join+distinct (ms)':>19} {'by name (ms)':>13} "
+            f"{'by id (ms)':>11} {'speedup':>8}"
+        )
+        for size in options["sizes"]:
+            with transaction.atomic():
+                tags, allergens = self._seed(size, rng, options)
+                include, exclude = tags[:2], allergens[:2]
+                include_ids, exclude_ids = [t.id for t in include], [a.id for a in exclude]
+                include_names, exclude_names = [t.name for t in include], [a.name for a in exclude]
+                plans = {
+                    # Catalog page: first 20 by id, like GET /api/stalls/?tags=..&allergens_exclude=..
+                    "page": (
+                        lambda qs: list(qs.order_by("id").values_list("id", flat=True)[:20])
+                    ),
+                    # Every match, like the filter action's candidate set
+                    "all": (lambda qs: list(qs.values_list("id", flat=True))),
+                }
+                for name, run in plans.items():
+                    join_ms = best_of(
+                        lambda: run(
+                            Stall.objects.filter(tags__name__in=include_names)
+                            .exclude(allergens__name__in=exclude_names)
+                            .distinct()
+                        ),
+                        repeat,
+                    )
+                    # The production path: names resolved by ARRAY(SELECT id ...) in the query
+                    name_ms = best_of(
+                        lambda: run(
+                            Stall.objects.with_tag_names(include_names).without_allergen_names(exclude_names)
+                        ),
+                        repeat,
+                    )
+                    id_ms = best_of(
+                        lambda: run(Stall.objects.with_tags(include_ids).without_allergens(exclude_ids)),
+                        repeat,
+                    )
+                    self.stdout.write(
+                        f"{size:>8} {name:<10} {join_ms:>19.2f} {name_ms:>13.2f} {id_ms:>11.2f} "
+                        f"{join_ms / max(name_ms, 1e-9):>7.1f}x"
+                    )
+                transaction.set_rollback(True)
+
+    def _seed(self, size, rng, options):
+        tags = Tag.objects.bulk_create(
+            [Tag(name=f"bench-tag-{i}") for i in range(options["tags"])]
+        )
+        allergens = Allergen.objects.bulk_create(
+            [Allergen(name=f"bench-allergen-{i}") for i in range(options["allergens"])]
+        )
+        tag_ids = [t.id for t in tags]
+        allergen_ids = [a.id for a in allergens]
+        per_stall = options["per_stall"]
+
+        stalls, tag_rows, allergen_rows = [], [], []
+        for _ in range(size):
+            stall_tags = sorted(rng.choice(tag_ids, per_stall, replace=False).tolist())
+            stall_allergens = sorted(rng.choice(allergen_ids, per_stall, replace=False).tolist())
+            stalls.append(
+                Stall(
+                    product="Bench meal",
+                    location="Bench",
+                    tag_ids=stall_tags,
+                    allergen_ids=stall_allergens,
+                )
+            )
+        stalls = Stall.objects.bulk_create(stalls, batch_size=5000)
+        TagThrough, AllergenThrough = Stall.tags.through, Stall.allergens.through
+        for stall in stalls:
+            tag_rows += [TagThrough(stall_id=stall.id, tag_id=t) for t in stall.tag_ids]
+            allergen_rows += [
+                AllergenThrough(stall_id=stall.id, allergen_id=a) for a in stall.allergen_ids
+            ]
+        TagThrough.objects.bulk_create(tag_rows, batch_size=10000)
+        AllergenThrough.objects.bulk_create(allergen_rows, batch_size=10000)
+        with connection.cursor() as cursor:
+            for model in (Stall, TagThrough, AllergenThrough, Tag, Allergen):
+                cursor.execute(f"ANALYZE {model._meta.db_table}")
+        return tags, allergens
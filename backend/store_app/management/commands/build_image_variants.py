@@ -0,0 +1,65 @@
+from concurrent.futures import wait
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from store_app.cache import local_cache_warning
+from store_app.images import VARIANT_FIELDS, get_pool, render_variants, store_variants, variant_widths
+
+
+class Command(BaseCommand):
+    help = (
+        "Render resized JPEG/WebP variants for stall, stall gallery and seller profile "
+        "images that do not have current ones yet."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Re-render images whose variants are already current.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=200,
+            help="Images queued in the process pool at a time.",
+        )
+
+    def handle(self, *args, **options):
+        force = options["force"]
+        chunk_size = max(options["chunk_size"], 1)
+        pool = get_pool()
+        widths = variant_widths()
+        rendered, failed = 0, 0
+
+        def drain(pending):
+            nonlocal rendered, failed
+            wait(pending.values())
+            for (label, pk), future in pending.items():
+                try:
+                    store_variants(label, pk, future.result())
+                    rendered += 1
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"{label} {pk}: {exc}")
+
+        for label, field in VARIANT_FIELDS.items():
+            model = apps.get_model(label)
+            rows = model.objects.exclude(image="").exclude(image__isnull=True)
+            pending = {}
+            for pk, name, variants in rows.values_list("pk", "image", field).iterator():
+                if not force and (variants or {}).get("source") == name:
+                    continue
+                pending[(label, pk)] = pool.submit(render_variants, name, widths)
+                if len(pending) >= chunk_size:
+                    drain(pending)
+                    pending = {}
+            drain(pending)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rendered variants for {rendered} images ({failed} failed).")
+        )
+        warning = local_cache_warning()
+        if warning and rendered:
+            self.stdout.write(self.style.WARNING(warning))
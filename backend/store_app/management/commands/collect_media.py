@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from django.utils import timezone
+
+from store_app.storage import collect_garbage, recount_references
+from store_app.uploads import expire_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete content-addressed photo blobs (and their variants) that no stall, gallery "
+        "image or seller profile has referenced for the grace period, and chunked "
+        "upload sessions untouched for as long."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours",
+            type=float,
+            default=24,
+            help="Only collect blobs unreferenced for at least this long.",
+        )
+        parser.add_argument(
+            "--recount",
+            action="store_true",
+            help="Recompute reference counts from the image fields first (run while uploads are quiet).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="List what would be deleted without deleting it.",
+        )
+
+    def handle(self, *args, **options):
+        if options["recount"]:
+            fixed = recount_references()
+            self.stdout.write(f"Corrected {fixed} reference counts.")
+        dry_run = options["dry_run"]
+        grace = timedelta(hours=max(options["grace_hours"], 0))
+        expired = expire_uploads(timezone.now() - grace, dry_run=dry_run)
+        if expired:
+            self.stdout.write(f"{'Would drop' if dry_run else 'Dropped'} {expired} stale upload sessions.")
+        removed = collect_garbage(grace, dry_run=dry_run)
+        for name in removed:
+            self.stdout.write(f"{'Would delete' if dry_run else 'Deleted'} {name}")
+        verb = "Would delete" if dry_run else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(removed)} unreferenced blobs."))
@@ -0,0 +1,70 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store_app.cache import local_cache_warning
+from store_app.imports import IMPORT_FORMATS, import_format, import_stalls, read_rows
+from user_app.models import SellerProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update a seller's stalls from a CSV or NDJSON file (upserted on sku). "
+        "Invalid rows are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV/NDJSON file, or - for stdin.")
+        parser.add_argument(
+            "--seller",
+            required=True,
+            help="Seller profile id, or the seller's username/email.",
+        )
+        parser.add_argument(
+            "--format",
+            choices=IMPORT_FORMATS,
+            help="Input format (default: from the file extension).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Rows written per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        seller = options["seller"]
+        lookup = {"pk": int(seller)} if seller.isdigit() else {"user__username": seller}
+        try:
+            seller_profile = SellerProfile.objects.get(**lookup)
+        except SellerProfile.DoesNotExist:
+            raise CommandError(f"No seller profile {seller!r}")
+        if not seller_profile.location.strip():
+            raise CommandError("Seller profile must have a location set before importing meals.")
+
+        path = options["path"]
+        fmt = options["format"] or import_format(path)
+        if not fmt:
+            raise CommandError("Cannot tell the format from the file name; pass --format.")
+
+        stream = sys.stdin if path == "-" else open(path, encoding="utf-8-sig", newline="")
+        try:
+            result = import_stalls(
+                seller_profile, read_rows(stream, fmt), batch_size=max(options["batch_size"], 1)
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for error in result.errors:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported stalls: {result.created} created, {result.updated} updated, "
+                f"{len(result.errors)} rows skipped."
+            )
+        )
+        warning = local_cache_warning()
+        if warning and (result.created or result.updated):
+            self.stdout.write(self.style.WARNING(warning))
@@ -0,0 +1,85 @@
+import csv
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from store_app.geo import DEFAULT_ZIP_INDEX_RECHECK, reset_zip_index
+from store_app.models import ZipCentroid
+
+# Accepted header names, e.g. the Census Gazetteer ZCTA file
+# (GEOID, INTPTLAT, INTPTLONG) or a plain zip,lat,lng CSV.
+ZIP_COLUMNS = ("zipcode", "zip", "geoid", "zcta5")
+LAT_COLUMNS = ("latitude", "lat", "intptlat")
+LNG_COLUMNS = ("longitude", "lng", "lon", "intptlong")
+
+
+def _pick(header, names):
+    for name in names:
+        if name in header:
+            return header[name]
+    return None
+
+
+class Command(BaseCommand):
+    help = "Bulk-load ZIP code centroids from a CSV/TSV file into ZipCentroid."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or tab-separated file with zip, latitude and longitude columns.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            help="Delete existing centroids before loading.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options["batch_size"], 1)
+        with open(options["path"], newline="", encoding="utf-8-sig") as fh:
+            sample = fh.readline()
+            fh.seek(0)
+            reader = csv.reader(fh, delimiter="\t" if "\t" in sample else ",")
+            header = {name.strip().lower(): i for i, name in enumerate(next(reader, []))}
+            zip_i = _pick(header, ZIP_COLUMNS)
+            lat_i = _pick(header, LAT_COLUMNS)
+            lng_i = _pick(header, LNG_COLUMNS)
+            if None in (zip_i, lat_i, lng_i):
+                raise CommandError("File must have zipcode, latitude and longitude columns.")
+
+            loaded = skipped = 0
+            with transaction.atomic():
+                if options["replace"]:
+                    ZipCentroid.objects.all().delete()
+                batch = []
+                for row in reader:
+                    try:
+                        batch.append(
+                            ZipCentroid(
+                                zipcode=int(row[zip_i]),
+                                latitude=float(row[lat_i]),
+                                longitude=float(row[lng_i]),
+                            )
+                        )
+                    except (IndexError, ValueError):
+                        skipped += 1
+                        continue
+                    if len(batch) >= batch_size:
+                        loaded += self._flush(batch)
+                        batch = []
+                loaded += self._flush(batch)
+
+        reset_zip_index()
+        self.stdout.write(self.style.SUCCESS(f"Loaded {loaded} ZIP centroids ({skipped} rows skipped)."))
+        recheck = getattr(settings, "ZIP_INDEX_RECHECK", DEFAULT_ZIP_INDEX_RECHECK)
+        self.stdout.write(f"Running servers reload their ZIP index within {recheck} seconds.")
+
+    def _flush(self, batch):
+        if not batch:
+            return 0
+        ZipCentroid.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=["zipcode"],
+            update_fields=["latitude", "longitude"],
+        )
+        return len(batch)
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store_app.cache import local_cache_warning
+from store_app.reviews import reconcile_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every stall's rating_sum/rating_count/average_rating from its reviews, "
+        "in batches; only stalls that drifted are written. Safe to run while reviews come in."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Stalls locked and recomputed per transaction.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between batches, to spread load on a busy database.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options["batch_size"], 1)
+        pause = max(options["pause"], 0)
+        last_id, checked, fixed = 0, 0, 0
+        while True:
+            next_id, fixed_ids = reconcile_batch(last_id, batch_size)
+            if next_id is None:
+                break
+            checked += 1
+            fixed += len(fixed_ids)
+            for stall_id in fixed_ids:
+                self.stdout.write(f"Stall {stall_id}: rating totals corrected")
+            last_id = next_id
+            if pause:
+                time.sleep(pause)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Reconciled ratings in {checked} batches; corrected {fixed} stalls.")
+        )
+        warning = local_cache_warning()
+        if warning and fixed:
+            self.stdout.write(self.style.WARNING(warning))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store_app', '0003_stall_protein_g'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stall',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stall',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
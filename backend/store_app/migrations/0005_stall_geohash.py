@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+from store_app.geo import geohash_encode
+
+
+def fill_geohash(apps, schema_editor):
+    Stall = apps.get_model("store_app", "Stall")
+    stalls = Stall.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    for stall in stalls.iterator():
+        stall.geohash = geohash_encode(stall.latitude, stall.longitude)
+        stall.save(update_fields=["geohash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store_app', '0004_stall_latitude_longitude'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stall',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=12),
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store_app', '0006_zipcentroid'),
+        ('user_app', '0002_sellerprofile_latitude_longitude'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stall',
+            index=models.Index(fields=['average_rating', 'id'], name='store_app_s_average_d36bd2_idx'),
+        ),
+    ]
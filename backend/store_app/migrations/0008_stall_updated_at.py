@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store_app', '0007_stall_rating_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stall',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:02
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+from store_app.search import stall_search_vector
+
+
+def fill_search_vector(apps, schema_editor):
+    Stall = apps.get_model("store_app", "Stall")
+    Tag = apps.get_model("store_app", "Tag")
+    Stall.objects.update(search_vector=stall_search_vector(Tag))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store_app', '0008_stall_updated_at'),
+        ('user_app', '0003_profile_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stall',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='stall',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='stall_search_vector_gin'),
+        ),
+        migrations.RunPython(fill_search_vector, migrations.RunPython.noop),
+    ]
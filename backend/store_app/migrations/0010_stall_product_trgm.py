@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:06
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store_app', '0009_stall_search_vector'),
+        ('user_app', '0003_profile_updated_at'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='stall',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['product'], name='stall_product_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
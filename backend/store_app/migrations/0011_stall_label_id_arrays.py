@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:08
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+from store_app.models import label_id_arrays
+
+
+def fill_label_ids(apps, schema_editor):
+    Stall = apps.get_model("store_app", "Stall")
+    Stall.objects.update(**label_id_arrays(Stall.tags.through, Stall.allergens.through))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store_app', '0010_stall_product_trgm'),
+        ('user_app', '0003_profile_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stall',
+            name='allergen_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='stall',
+            name='tag_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddIndex(
+            model_name='stall',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tag_ids'], name='stall_tag_ids_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='stall',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['allergen_ids'], name='stall_allergen_ids_gin'),
+        ),
+        migrations.RunPython(fill_label_ids, migrations.RunPython.noop),
+    ]
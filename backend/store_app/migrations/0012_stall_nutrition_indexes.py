@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store_app', '0011_stall_label_id_arrays'),
+        ('user_app', '0003_profile_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stall',
+            index=models.Index(fields=['calories', 'id'], name='store_app_s_calorie_323915_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stall',
+            index=models.Index(fields=['protein_g', 'id'], name='store_app_s_protein_096a2b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stall',
+            index=models.Index(fields=['carbs_g', 'id'], name='store_app_s_carbs_g_821762_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stall',
+            index=models.Index(fields=['fat_g', 'id'], name='store_app_s_fat_g_c9385f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stall',
+            index=models.Index(fields=['price_cents', 'id'], name='store_app_s_price_c_b36249_idx'),
+        ),
+    ]
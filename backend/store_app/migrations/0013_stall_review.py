@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:28
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Round
+
+
+def fill_rating_sum(apps, schema_editor):
+    # Keep any totals set before reviews existed consistent with add_rating()
+    Stall = apps.get_model("store_app", "Stall")
+    Stall.objects.filter(rating_count__gt=0).update(
+        rating_sum=Round(F("average_rating") * F("rating_count"))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store_app', '0012_stall_nutrition_indexes'),
+        ('user_app', '0003_profile_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stall',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_rating_sum, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='Review',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)])),
+                ('comment', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('buyer_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='user_app.buyerprofile')),
+                ('stall', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='store_app.stall')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['stall', 'id'], name='store_app_r_stall_i_48a084_idx')],
+                'constraints': [models.UniqueConstraint(fields=('stall', 'buyer_profile'), name='review_one_per_buyer')],
+            },
+        ),
+    ]
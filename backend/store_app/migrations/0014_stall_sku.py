@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store_app', '0013_stall_review'),
+        ('user_app', '0003_profile_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stall',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='stall',
+            constraint=models.UniqueConstraint(fields=('owner_profile', 'sku'), name='stall_owner_sku_unique'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:39
+
+import store_app.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store_app', '0015_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stall',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=store_app.storage.get_image_storage, upload_to='stalls/main/'),
+        ),
+        migrations.AlterField(
+            model_name='stallimage',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=store_app.storage.get_image_storage, upload_to='stalls/images/'),
+        ),
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('ref_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ref_count', 'updated_at'], name='store_app_m_ref_cou_df1f7b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:34
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store_app', '0017_image_upload'),
+        ('user_app', '0005_profile_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stall',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('product'), name='gin_trgm_ops'), name='stall_product_upper_trgm'),
+        ),
+    ]
@@ -1,4 +1,19 @@
+import math
+import uuid
+
+from django.conf import settings
+from django.contrib.postgres.expressions import ArraySubquery
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db.models import F, FloatField, OuterRef, Q, Value
+from django.db.models.functions import ASin, Cast, Cos, Greatest, Least, Now, Power, Radians, Sin, Sqrt, Upper
+
+from .geo import EARTH_RADIUS_M, bounding_box, geohash_cover, geohash_encode
+from .search import search_query, search_rank, stall_search_vector
+from .storage import get_image_storage
 
 
 class Tag(models.Model):
@@ -15,6 +30,157 @@ class Allergen(models.Model):
         return self.name
 
 
+class ZipCentroid(models.Model):
+    """US ZIP code centroid; bulk-loaded with `manage.py load_zip_centroids`."""
+    zipcode = models.IntegerField(primary_key=True)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+
+    def __str__(self):
+        return f"{self.zipcode:05d} ({self.latitude}, {self.longitude})"
+
+
+# Relations StallSerializer walks; prefetched as one query each
+CATALOG_PREFETCH = ("tags", "allergens", "images")
+
+
+class StallQuerySet(models.QuerySet):
+    def for_catalog(self, prefetch=True):
+        """
+        Prefetch plan for StallSerializer: a fixed number of queries for any page size.
+
+        With `prefetch=False` only the owner join is applied; store_app.cache
+        prefetches `CATALOG_PREFETCH` for cache misses alone.
+        """
+        qs = self.select_related("owner_profile__user").defer("search_vector")
+        return qs.prefetch_related(*CATALOG_PREFETCH) if prefetch else qs
+
+    def within_radius(self, lat, lng, radius_m):
+        """
+        Stalls within `min(radius_m, stall.radius_m)` of `(lat, lng)`.
+
+        Narrows candidates with geohash prefixes and a lat/lng bounding box
+        (both index-backed), then applies an exact haversine check in SQL.
+        Rows are annotated with `distance_m`.
+        """
+        radius_m = max(float(radius_m), 0.0)
+        qs = self.in_bounding_box(lat, lng, radius_m)
+        return qs.annotate(distance_m=haversine_m(lat, lng)).filter(
+            distance_m__lte=Least(Value(radius_m), F("radius_m"))
+        )
+
+    def search(self, text, prefix=False):
+        """
+        Full-text match against `search_vector`, annotated with `rank` (ts_rank).
+
+        Blank input (or input without searchable terms) leaves the queryset as is.
+        """
+        query = search_query(text, prefix=prefix)
+        if query is None:
+            return self
+        return self.filter(search_vector=query).annotate(rank=search_rank(query))
+
+    def refresh_search_vector(self):
+        """Recompute `search_vector` for these stalls in one UPDATE."""
+        return self.update(search_vector=stall_search_vector(Tag))
+
+    def refresh_label_ids(self, **extra):
+        """Rebuild `tag_ids`/`allergen_ids` from the M2M tables in one UPDATE."""
+        arrays = label_id_arrays(self.model.tags.through, self.model.allergens.through)
+        return self.update(**arrays, **extra)
+
+    def add_rating(self, rating_delta, count_delta=0):
+        """
+        Fold a review change into `rating_sum`/`rating_count`/`average_rating` in one UPDATE.
+
+        The new values are computed from the row itself (`F()`), under its
+        row lock, so concurrent reviews add up instead of overwriting each
+        other. Callers bump the cache versions (see store_app.reviews).
+        """
+        rating_sum = F("rating_sum") + rating_delta
+        rating_count = F("rating_count") + count_delta
+        return self.update(
+            rating_sum=rating_sum,
+            rating_count=rating_count,
+            average_rating=Cast(rating_sum, FloatField()) / Greatest(rating_count, Value(1)),
+            updated_at=Now(),
+        )
+
+    def with_tags(self, tag_ids):
+        """Stalls carrying any of `tag_ids` (`&&` on the GIN index, no join)."""
+        return self.filter(tag_ids__overlap=list(tag_ids))
+
+    def without_allergens(self, allergen_ids):
+        """Stalls carrying none of `allergen_ids`."""
+        allergen_ids = list(allergen_ids)
+        return self.exclude(allergen_ids__overlap=allergen_ids) if allergen_ids else self
+
+    def with_tag_names(self, names, ignore_case=False):
+        """`with_tags` by name; unknown names match nothing."""
+        return self.filter(tag_ids__overlap=label_ids_named(Tag, names, ignore_case))
+
+    def without_allergen_names(self, names):
+        """`without_allergens` by name; unknown names exclude nothing."""
+        names = list(names)
+        return self.exclude(allergen_ids__overlap=label_ids_named(Allergen, names)) if names else self
+
+    def in_bounding_box(self, lat, lng, radius_m):
+        """Index-backed candidate set: stalls in the box enclosing the search circle."""
+        bbox = bounding_box(lat, lng, max(float(radius_m), 0.0))
+        cells = Q()
+        for prefix in geohash_cover(bbox):
+            cells |= Q(geohash__startswith=prefix)
+        min_lat, max_lat, min_lng, max_lng = bbox
+        return self.filter(
+            cells,
+            latitude__range=(min_lat, max_lat),
+            longitude__range=(min_lng, max_lng),
+        )
+
+
+def haversine_m(lat, lng, lat_field="latitude", lng_field="longitude"):
+    """SQL expression for the great-circle distance (meters) from a point to a row."""
+    dlat = Radians(F(lat_field) - Value(lat)) / 2
+    dlng = Radians(F(lng_field) - Value(lng)) / 2
+    a = Power(Sin(dlat), 2) + Value(math.cos(math.radians(lat))) * Cos(
+        Radians(F(lat_field))
+    ) * Power(Sin(dlng), 2)
+    # Clamp for float error so ASIN never sees a value above 1
+    return Value(2 * EARTH_RADIUS_M) * ASin(Sqrt(Least(a, Value(1.0))))
+
+
+def label_ids_named(model, names, ignore_case=False):
+    """
+    `ARRAY(SELECT id ...)` of the Tag/Allergen rows named `names`.
+
+    Names are resolved by the database within the filtering query (the unique
+    index on `name`), so a label created moments ago by any process matches.
+    """
+    if ignore_case:
+        named = Q()
+        for name in names:
+            named |= Q(name__iexact=name)
+        labels = model.objects.filter(named) if named else model.objects.none()
+    else:
+        labels = model.objects.filter(name__in=list(names))
+    # Cast each id in the subquery: casting the array around it is redone for every stall row
+    return ArraySubquery(labels.order_by().values(label_id=Cast("id", models.IntegerField())))
+
+
+def label_id_arrays(tags_through, allergens_through):
+    """`tag_ids`/`allergen_ids` expressions read back from the M2M through tables."""
+    return {
+        "tag_ids": ArraySubquery(
+            tags_through.objects.filter(stall_id=OuterRef("pk")).order_by("tag_id").values("tag_id")
+        ),
+        "allergen_ids": ArraySubquery(
+            allergens_through.objects.filter(stall_id=OuterRef("pk"))
+            .order_by("allergen_id")
+            .values("allergen_id")
+        ),
+    }
+
+
 class Stall(models.Model):
     owner_profile = models.ForeignKey(
         "user_app.SellerProfile",
@@ -25,20 +191,32 @@ class Stall(models.Model):
     )
     # Basic listing info
     product = models.CharField(max_length=120)
+    # Seller's own identifier; bulk imports upsert on (owner_profile, sku)
+    sku = models.CharField(max_length=64, null=True, blank=True)
     description = models.TextField(blank=True, default="")
-    image = models.ImageField(upload_to="stalls/main/", blank=True, null=True)
+    image = models.ImageField(upload_to="stalls/main/", storage=get_image_storage, blank=True, null=True)
+    # Resized JPEG/WebP renditions of `image` (see store_app.images)
+    image_variants = models.JSONField(blank=True, default=dict, editable=False)
 
 
     # Location / availability
     location = models.CharField(max_length=255)
+    # Coordinates resolved from `location` at write time (see store_app.geo)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # Derived from latitude/longitude on save; prefix scans back proximity search
+    geohash = models.CharField(max_length=12, blank=True, default="", db_index=True)
     quantity = models.PositiveIntegerField(default=0)
     radius_m = models.PositiveIntegerField(default=1000)
 
     # Pricing and rating
     price_cents = models.PositiveIntegerField(default=0)
     price_level = models.PositiveSmallIntegerField(default=1)  # 1-4 for $ ... $$$$
+    # Running totals over `reviews`, written by StallQuerySet.add_rating() and
+    # checked by `manage.py reconcile_ratings`; never aggregated per read
     average_rating = models.FloatField(default=0.0)
     rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
 
     # Nutrition (approximate per serving)
     calories = models.PositiveIntegerField(default=0)
@@ -49,15 +227,80 @@ class Stall(models.Model):
     # Labels and warnings
     tags = models.ManyToManyField(Tag, blank=True, related_name="stalls")
     allergens = models.ManyToManyField(Allergen, blank=True, related_name="stalls")
+    # Mirrors of the two M2Ms above for join-free filtering; kept in sync by signals
+    tag_ids = ArrayField(models.IntegerField(), blank=True, default=list, editable=False)
+    allergen_ids = ArrayField(models.IntegerField(), blank=True, default=list, editable=False)
 
     # Options and details
     options = models.JSONField(blank=True, default=list)   # e.g., ["Single meal", "7-day meal prep", "Custom"]
     includes = models.JSONField(blank=True, default=list)  # e.g., ["x7 salmon entrees", "x7 asparagus"]
     special_requests_allowed = models.BooleanField(default=True)
 
+    # Also touched when tags/allergens/images/seller change (see signals)
+    updated_at = models.DateTimeField(auto_now=True)
+    # product + tag names + description; kept current by refresh_search_vector()
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = StallQuerySet.as_manager()
+
+    # Maintained by StallQuerySet.refresh_search_vector()/refresh_label_ids()/add_rating()
+    # and the image pipeline
+    DERIVED_FIELDS = (
+        "search_vector",
+        "tag_ids",
+        "allergen_ids",
+        "average_rating",
+        "rating_count",
+        "rating_sum",
+        "image_variants",
+    )
+    # Changed only by relative/conditional UPDATEs (cart_app.inventory); a
+    # plain save() writing back the loaded stock would undo checkouts meanwhile
+    STOCK_FIELDS = ("quantity",)
+
+    class Meta:
+        constraints = [
+            # NULL skus never conflict, so stalls created without one are unaffected
+            models.UniqueConstraint(fields=["owner_profile", "sku"], name="stall_owner_sku_unique"),
+        ]
+        indexes = [
+            # Keyset pagination for ?sort=rating
+            models.Index(fields=["average_rating", "id"]),
+            # Nutrition/price range filters and keyset sorts (store_app.filters)
+            models.Index(fields=["calories", "id"]),
+            models.Index(fields=["protein_g", "id"]),
+            models.Index(fields=["carbs_g", "id"]),
+            models.Index(fields=["fat_g", "id"]),
+            models.Index(fields=["price_cents", "id"]),
+            GinIndex(fields=["search_vector"], name="stall_search_vector_gin"),
+            GinIndex(fields=["tag_ids"], name="stall_tag_ids_gin"),
+            GinIndex(fields=["allergen_ids"], name="stall_allergen_ids_gin"),
+            # Typeahead (store_app.suggest): word similarity (`%>`) on the column...
+            GinIndex(fields=["product"], name="stall_product_trgm", opclasses=["gin_trgm_ops"]),
+            # ...and `istartswith`, which Django compiles to UPPER(product) LIKE 'SAL%'
+            GinIndex(OpClass(Upper("product"), name="gin_trgm_ops"), name="stall_product_upper_trgm"),
+        ]
+
     def __str__(self):
         return f"{self.product} @ {self.location}"
 
+    def save(self, *args, **kwargs):
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geohash_encode(self.latitude, self.longitude)
+        else:
+            self.geohash = ""
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"latitude", "longitude"} & set(update_fields):
+            kwargs["update_fields"] = set(update_fields) | {"geohash"}
+        elif update_fields is None and not self._state.adding and not kwargs.get("force_insert"):
+            # Derived columns and stock are written by set-based UPDATEs only; a
+            # plain save() must not write back the copies loaded with this instance
+            skip = set(self.DERIVED_FIELDS) | set(self.STOCK_FIELDS) | self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields if not f.primary_key and f.attname not in skip
+            ]
+        super().save(*args, **kwargs)
+
 
 class SpecialRequest(models.Model):
     stall = models.ForeignKey("store_app.Stall", on_delete=models.CASCADE, related_name="special_requests")
@@ -70,9 +313,33 @@ class SpecialRequest(models.Model):
         return f"Request by {self.buyer_profile_id} for stall {self.stall_id}"
 
 
+class Review(models.Model):
+    """One buyer's star rating (and optional comment) for a stall; posting again replaces it."""
+    stall = models.ForeignKey("store_app.Stall", on_delete=models.CASCADE, related_name="reviews")
+    buyer_profile = models.ForeignKey("user_app.BuyerProfile", on_delete=models.CASCADE, related_name="reviews")
+    rating = models.PositiveSmallIntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
+    comment = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["stall", "buyer_profile"], name="review_one_per_buyer"),
+        ]
+        indexes = [
+            # Keyset pages of a stall's reviews, newest first
+            models.Index(fields=["stall", "id"]),
+        ]
+
+    def __str__(self):
+        return f"Review {self.rating}/5 by {self.buyer_profile_id} for stall {self.stall_id}"
+
+
 class StallImage(models.Model):
     stall = models.ForeignKey("store_app.Stall", on_delete=models.CASCADE, related_name="images")
-    image = models.ImageField(upload_to="stalls/images/", blank=True, null=True)
+    image = models.ImageField(upload_to="stalls/images/", storage=get_image_storage, blank=True, null=True)
+    # Resized JPEG/WebP renditions of `image` (see store_app.images)
+    variants = models.JSONField(blank=True, default=dict, editable=False)
     alt_text = models.CharField(max_length=200, blank=True, default="")
     position = models.PositiveIntegerField(default=0)
     is_primary = models.BooleanField(default=False)
@@ -86,3 +353,48 @@ class StallImage(models.Model):
 
     def __str__(self):
         return f"StallImage(stall={self.stall_id}, pos={self.position})"
+
+
+class MediaBlob(models.Model):
+    """A content-addressed file (see store_app.storage) and how many image fields use it."""
+    name = models.CharField(max_length=255, unique=True)
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Last reference change; `collect_media` waits a grace period after it
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["ref_count", "updated_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+class ImageUpload(models.Model):
+    """A chunked, resumable photo upload (see store_app.uploads)."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="image_uploads")
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    # Hex SHA-256 of the whole file, checked when the upload is completed
+    sha256 = models.CharField(max_length=64)
+    # Bytes received so far; the next chunk must start here
+    offset = models.PositiveBigIntegerField(default=0)
+    # Stored (content-addressed) name once complete
+    name = models.CharField(max_length=255, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["updated_at"]),
+        ]
+
+    @property
+    def complete(self):
+        return bool(self.name)
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
@@ -0,0 +1,230 @@
+import base64
+import json
+import math
+from collections import OrderedDict
+
+import numpy as np
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a composite `(sort key, id)` keyset.
+
+    Each page is `WHERE (key, id) > cursor ORDER BY key, id LIMIT n`, so
+    fetching page 100 costs the same as page 1: no OFFSET, no COUNT. The
+    cursor is an opaque token holding the sort name and the last row's keys.
+
+    Query params: `sort` (see `orderings`), `page_size`, `cursor`.
+    """
+
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    sort_query_param = "sort"
+    invalid_cursor_message = "Invalid cursor"
+
+    # sort name -> ordering; the last field must be unique (`id`) to break ties
+    orderings = {
+        "id": ("id",),
+        "rating": ("-average_rating", "-id"),
+        "distance": ("distance_m", "id"),
+        "relevance": ("-rank", "-id"),
+        # Scored in memory (store_app.scoring); see paginate_top
+        "best": ("-score", "-id"),
+        # Nutrition/price sorts; `-name` is highest first. Each has a (field, id) index
+        "calories": ("calories", "id"),
+        "-calories": ("-calories", "-id"),
+        "protein": ("protein_g", "id"),
+        "-protein": ("-protein_g", "-id"),
+        "carbs": ("carbs_g", "id"),
+        "-carbs": ("-carbs_g", "-id"),
+        "fat": ("fat_g", "id"),
+        "-fat": ("-fat_g", "-id"),
+        "price": ("price_cents", "id"),
+        "-price": ("-price_cents", "-id"),
+    }
+    # sorts over a queryset annotation -> (annotation, error when it is missing)
+    annotated_sorts = {
+        "distance": ("distance_m", "sort=distance requires lat/lng or zip together with radius."),
+        "relevance": ("rank", "sort=relevance requires q."),
+    }
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_sort(self, request, queryset=None, default="id"):
+        sort = request.query_params.get(self.sort_query_param) or default
+        if sort not in self.orderings:
+            raise ValidationError(
+                {"sort": f"Must be one of: {', '.join(self.orderings)}."}
+            )
+        if queryset is not None and sort in self.annotated_sorts:
+            annotation, message = self.annotated_sorts[sort]
+            if annotation not in queryset.query.annotations:
+                raise ValidationError({"sort": message})
+        return sort
+
+    def paginate_queryset(self, queryset, request, view=None, default_sort="id"):
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        self.sort = self.get_sort(request, queryset, default=default_sort)
+        ordering = self.orderings[self.sort]
+
+        qs = queryset.order_by(*ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            qs = qs.filter(self._after(ordering, position))
+
+        rows = list(qs[: self.page_size_value + 1])
+        self.has_next = len(rows) > self.page_size_value
+        rows = rows[: self.page_size_value]
+        self.next_position = (
+            [getattr(rows[-1], field.lstrip("-")) for field in ordering]
+            if self.has_next
+            else None
+        )
+        return rows
+
+    def paginate_ranked(self, ids, distances, request):
+        """
+        Keyset-paginate an in-memory ranking already sorted by `(distance, id)`.
+
+        Returns the page's `(ids, distances)` arrays.
+        """
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        self.sort = "distance"
+        start = 0
+        position = self.decode_cursor(request)
+        if position is not None:
+            last_distance, last_id = position
+            after = (distances > last_distance) | ((distances == last_distance) & (ids > last_id))
+            start = int(np.argmax(after)) if after.any() else len(ids)
+
+        end = start + self.page_size_value
+        self.has_next = end < len(ids)
+        page_ids, page_distances = ids[start:end], distances[start:end]
+        self.next_position = (
+            [float(page_distances[-1]), int(page_ids[-1])] if self.has_next else None
+        )
+        return page_ids, page_distances
+
+    def paginate_top(self, ids, scores, request):
+        """
+        Keyset-paginate an unsorted in-memory scoring, best first (`?sort=best`).
+
+        Only the page is ordered: `np.argpartition` selects the top
+        `page_size + 1` candidates in linear time. Ties go to the higher id.
+        Returns the page's `(ids, scores)` arrays.
+        """
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        self.sort = "best"
+        position = self.decode_cursor(request)
+        if position is not None:
+            last_score, last_id = position
+            keep = (scores < last_score) | ((scores == last_score) & (ids < last_id))
+            ids, scores = ids[keep], scores[keep]
+
+        k = self.page_size_value + 1
+        top = np.arange(len(ids))
+        if len(ids) > k:
+            kth_best = scores[np.argpartition(-scores, k - 1)[k - 1]]
+            # Everything tied with the k-th score competes on id below
+            top = np.flatnonzero(scores >= kth_best)
+        top = top[np.lexsort((-ids[top], -scores[top]))][:k]
+
+        self.has_next = len(top) > self.page_size_value
+        top = top[: self.page_size_value]
+        page_ids, page_scores = ids[top], scores[top]
+        self.next_position = (
+            [float(page_scores[-1]), int(page_ids[-1])] if self.has_next else None
+        )
+        return page_ids, page_scores
+
+    def _after(self, ordering, position):
+        """Rows strictly after `position` in `ordering` (one direction throughout)."""
+        *keys, tiebreak = ordering
+        descending = tiebreak.startswith("-")
+        op = "lt" if descending else "gt"
+        *key_values, last_id = position
+        condition = Q(**{f"{tiebreak.lstrip('-')}__{op}": last_id})
+        for field, value in reversed(list(zip(keys, key_values))):
+            name = field.lstrip("-")
+            condition = Q(**{f"{name}__{op}": value}) | (Q(**{name: value}) & condition)
+            # Redundant bound the planner can use as an index range condition
+            condition &= Q(**{f"{name}__{op}e": value})
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            sort, position = payload["s"], payload["p"]
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if sort != self.sort or not isinstance(position, list) or len(position) != len(
+            self.orderings[sort]
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        # Every sort key is a non-null number and the tiebreak an id; anything
+        # else was edited by hand and would fail in the ORM or numpy compare
+        *keys, last_id = position
+        if not all(self._is_number(key) for key in keys) or not (
+            isinstance(last_id, int) and not isinstance(last_id, bool)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    @staticmethod
+    def _is_number(value):
+        return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+    def encode_cursor(self, position):
+        payload = json.dumps({"s": self.sort, "p": position}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode("ascii")).decode("ascii")
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([("next", self.get_next_link()), ("results", data)]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class ReviewPagination(KeysetPagination):
+    """A stall's reviews, keyset-paginated on the (stall, id) index."""
+
+    page_size = 10
+    orderings = {
+        "newest": ("-id",),
+        "oldest": ("id",),
+    }
+    annotated_sorts = {}
@@ -0,0 +1,187 @@
+"""
+Meal-plan optimizer behind `/api/stalls/plan/`.
+
+Picks at most `max_meals` different stalls whose combined calories land
+closest to a calorie target and whose protein reaches a protein target,
+without the total price exceeding a budget: a 0/1 knapsack with a
+cardinality bound and a two-sided objective.
+
+Solved by dynamic programming over a small grid: meals chosen x calorie
+bucket x protein bucket (protein above the target shares one bucket), each
+cell holding the cheapest plan that reaches it. Every item is one vectorized
+pass over the grid, so the cost is items x cells regardless of how the
+targets are set. Candidates are first cut to those that can matter on that
+grid (see `_prune`), which keeps 10k rows down to a few hundred.
+
+The grid makes the result optimal up to one bucket of calories/protein per
+meal; totals and penalties reported are exact for the stalls picked. A time
+limit still applies: when it hits, the best plan over the items seen so far
+is returned with `complete=False`.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+# Penalty per budget spent, relative to missing a target by 100%
+COST_WEIGHT = 0.1
+# Calorie totals within this fraction of the target count as on target
+CALORIE_TOLERANCE = 0.05
+# Plans over this multiple of the calorie target are never useful
+CALORIE_CAP = 1.5
+# Grid resolution: buckets per calorie target / per protein target
+CALORIE_BUCKETS = 40
+PROTEIN_BUCKETS = 40
+
+
+@dataclass
+class MealPlan:
+    stall_ids: List[int] = field(default_factory=list)
+    calories: float = 0.0
+    protein_g: float = 0.0
+    price_cents: int = 0
+    penalty: float = float("inf")
+    complete: bool = True
+
+
+def plan_penalty(calories, protein_g, price_cents, *, target_calories, target_protein, budget_cents):
+    """
+    What the planner minimizes: cost share of the budget (weighted by
+    `COST_WEIGHT`), plus calories off target beyond `CALORIE_TOLERANCE` and
+    protein short of target, each relative to its target. Works on scalars
+    and numpy arrays alike.
+    """
+    value = COST_WEIGHT * np.asarray(price_cents, dtype=np.float64) / max(budget_cents, 1)
+    if target_calories:
+        off = np.abs(calories - target_calories) - CALORIE_TOLERANCE * target_calories
+        value = value + np.maximum(off, 0.0) / target_calories
+    if target_protein:
+        value = value + np.maximum(target_protein - protein_g, 0.0) / target_protein
+    return value
+
+
+def _prune(cal_bucket, prot_bucket, price, max_meals):
+    """
+    Indexes of the items worth considering, cheapest first.
+
+    An item is dropped when `max_meals` items in its calorie bucket have at
+    least its protein bucket and are no more expensive: whatever plan uses it
+    can swap it for one of those that is not already in the plan.
+    """
+    if not len(price):
+        return np.zeros(0, dtype=np.int64)
+    order = np.lexsort((-prot_bucket, price, cal_bucket))
+    bands, buckets = cal_bucket[order], prot_bucket[order]
+    # at_least[i, q]: items up to and including i (in order) with protein bucket >= q
+    at_least = np.cumsum(buckets[:, None] >= np.arange(buckets.max() + 1), axis=0)
+    rows = np.arange(len(order))
+    band_start = np.flatnonzero(np.r_[True, bands[1:] != bands[:-1]])
+    first = band_start[np.cumsum(np.r_[True, bands[1:] != bands[:-1]]) - 1]
+    before_band = np.where(first > 0, at_least[first - 1, buckets], 0)
+    dominating = at_least[rows, buckets] - 1 - before_band
+    kept = order[dominating < max_meals]
+    return kept[np.argsort(price[kept], kind="stable")]
+
+
+def plan_meals(
+    options: Iterable[Tuple[int, int, float, float]],
+    *,
+    calories: Optional[float] = None,
+    protein_g: Optional[float] = None,
+    budget_cents: int,
+    max_meals: int = 3,
+    time_limit: Optional[float] = None,
+) -> MealPlan:
+    """
+    Best plan from `(stall_id, price_cents, calories, protein_g)` options.
+
+    At least one of `calories`/`protein_g` should be given; an empty plan is
+    returned when nothing improves on eating nothing.
+    """
+    if time_limit is None:
+        time_limit = getattr(settings, "MEAL_PLAN_TIME_LIMIT", 0.2)
+    deadline = time.perf_counter() + time_limit
+
+    rows = np.array(list(options), dtype=np.float64).reshape(-1, 4)
+    if not len(rows):
+        nothing = plan_penalty(
+            0.0, 0.0, 0, target_calories=calories, target_protein=protein_g, budget_cents=budget_cents
+        )
+        return MealPlan(penalty=float(nothing))
+    ids = rows[:, 0].astype(np.int64)
+    price, cal, prot = rows[:, 1], rows[:, 2], rows[:, 3]
+
+    if calories:
+        cal_step = calories / CALORIE_BUCKETS
+        n_cal = int(CALORIE_CAP * CALORIE_BUCKETS) + 1
+        cal_bucket = np.floor(cal / cal_step).astype(np.int64)
+    else:
+        n_cal = 1
+        cal_bucket = np.zeros(len(rows), dtype=np.int64)
+    if protein_g:
+        n_prot = PROTEIN_BUCKETS + 1
+        prot_bucket = np.minimum(np.floor(prot / (protein_g / PROTEIN_BUCKETS)), PROTEIN_BUCKETS)
+        prot_bucket = prot_bucket.astype(np.int64)
+    else:
+        n_prot = 1
+        prot_bucket = np.zeros(len(rows), dtype=np.int64)
+
+    usable = (price <= budget_cents) & (cal_bucket < n_cal) & ((cal > 0) | (prot > 0))
+    usable &= (cal >= 0) & (prot >= 0) & (price >= 0)
+    items = _prune(cal_bucket[usable], prot_bucket[usable], price[usable], max_meals)
+    items = np.flatnonzero(usable)[items]
+
+    # cost[c, b, q]: cheapest plan of c meals in calorie bucket b, protein bucket q;
+    # picks[c, b, q, :c] are its items
+    top = n_prot - 1
+    cost = np.full((max_meals + 1, n_cal, n_prot), np.inf)
+    cost[0, 0, 0] = 0.0
+    picks = np.full((max_meals + 1, n_cal, n_prot, max_meals), -1, dtype=np.int64)
+    slots = np.arange(max_meals)
+    complete = True
+    for item in items.tolist():
+        if time.perf_counter() > deadline:
+            complete = False
+            break
+        db, dq = int(cal_bucket[item]), int(prot_bucket[item])
+        source_cost = cost[:-1, : n_cal - db] + price[item]
+        source_picks = picks[:-1, : n_cal - db]
+
+        # Adding the item moves protein bucket q to min(q + dq, top)
+        candidate = np.full_like(source_cost, np.inf)
+        candidate_picks = np.empty_like(source_picks)
+        candidate[..., dq:top] = source_cost[..., : top - dq]
+        candidate_picks[..., dq:top, :] = source_picks[..., : top - dq, :]
+        saturated = np.argmin(source_cost[..., top - dq :], axis=-1) + (top - dq)
+        candidate[..., top] = np.take_along_axis(source_cost, saturated[..., None], axis=-1)[..., 0]
+        candidate_picks[..., top, :] = np.take_along_axis(
+            source_picks, saturated[..., None, None], axis=-2
+        )[..., 0, :]
+        # The c-th meal of a c+1 meal plan is this item
+        candidate_picks[slots, ..., slots] = item
+
+        target = cost[1:, db:]
+        better = (candidate < target) & (candidate <= budget_cents)
+        target[better] = candidate[better]
+        picks[1:, db:][better] = candidate_picks[better]
+
+    # Score every reachable cell on exact totals and keep the best
+    reached = np.isfinite(cost)
+    chosen = picks[reached]
+    taken = chosen >= 0
+    safe = np.where(taken, chosen, 0)
+    totals = [np.where(taken, column[safe], 0.0).sum(axis=-1) for column in (cal, prot, price)]
+    penalties = plan_penalty(
+        *totals, target_calories=calories, target_protein=protein_g, budget_cents=budget_cents
+    )
+    best = int(np.argmin(penalties))
+    return MealPlan(
+        stall_ids=ids[chosen[best][taken[best]]].tolist(),
+        calories=float(totals[0][best]),
+        protein_g=float(totals[1][best]),
+        price_cents=int(totals[2][best]),
+        penalty=float(penalties[best]),
+        complete=complete,
+    )
@@ -0,0 +1,96 @@
+"""
+Stall reviews and the running rating totals kept on `Stall`.
+
+Writing a review updates `rating_sum`/`rating_count`/`average_rating` with
+one `F()` UPDATE in the same transaction (StallQuerySet.add_rating), so
+reads never aggregate over `Review` and concurrent reviews cannot lose each
+other's increments. `manage.py reconcile_ratings` recomputes exact totals in
+batches to repair drift from writes that bypassed this module.
+"""
+import math
+from typing import Tuple
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Now
+
+from .cache import bump_stall_versions
+from .models import Review, Stall
+
+
+def submit_review(stall_id, buyer_profile, rating, comment="") -> Tuple[Review, bool]:
+    """Create or replace `buyer_profile`'s review of the stall; returns `(review, created)`."""
+    with transaction.atomic():
+        # Locks an existing review, so two edits by the same buyer apply in turn
+        review, created = Review.objects.select_for_update().get_or_create(
+            stall_id=stall_id,
+            buyer_profile=buyer_profile,
+            defaults={"rating": rating, "comment": comment},
+        )
+        if created:
+            Stall.objects.filter(pk=stall_id).add_rating(rating, 1)
+        else:
+            delta = rating - review.rating
+            review.rating, review.comment = rating, comment
+            review.save(update_fields=["rating", "comment", "updated_at"])
+            if delta:
+                Stall.objects.filter(pk=stall_id).add_rating(delta)
+        bump_stall_versions([stall_id])
+    return review, created
+
+
+def delete_review(stall_id, buyer_profile) -> bool:
+    """Remove `buyer_profile`'s review of the stall; False when there was none."""
+    with transaction.atomic():
+        review = (
+            Review.objects.select_for_update()
+            .filter(stall_id=stall_id, buyer_profile=buyer_profile)
+            .first()
+        )
+        if review is None:
+            return False
+        review.delete()
+        Stall.objects.filter(pk=stall_id).add_rating(-review.rating, -1)
+        bump_stall_versions([stall_id])
+    return True
+
+
+def reconcile_batch(after_id=0, batch_size=500):
+    """
+    Recompute exact rating totals for the next `batch_size` stalls with `id > after_id`.
+
+    The batch's stall rows are locked first: a review written meanwhile either
+    committed before (and is counted here) or waits and applies its `F()`
+    delta on top of the corrected totals. Only rows that drifted are written.
+    Returns `(last_id, fixed_ids)`; `last_id` is None once past the end.
+    """
+    with transaction.atomic():
+        stalls = list(
+            Stall.objects.select_for_update()
+            .filter(id__gt=after_id)
+            .order_by("id")
+            .values_list("id", "rating_sum", "rating_count", "average_rating")[:batch_size]
+        )
+        if not stalls:
+            return None, []
+        exact = {
+            row["stall_id"]: (row["total"], row["count"])
+            for row in Review.objects.filter(stall_id__in=[stall[0] for stall in stalls])
+            .values("stall_id")
+            .annotate(total=Sum("rating"), count=Count("id"))
+            .order_by()
+        }
+        fixed = []
+        for stall_id, rating_sum, rating_count, average in stalls:
+            total, count = exact.get(stall_id, (0, 0))
+            expected_average = total / count if count else 0.0
+            if (rating_sum, rating_count) == (total, count) and math.isclose(
+                average, expected_average, abs_tol=1e-9
+            ):
+                continue
+            Stall.objects.filter(pk=stall_id).update(
+                rating_sum=total, rating_count=count, average_rating=expected_average, updated_at=Now()
+            )
+            fixed.append(stall_id)
+        bump_stall_versions(fixed)
+    return stalls[-1][0], fixed
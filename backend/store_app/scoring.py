@@ -0,0 +1,132 @@
+"""
+`?sort=best`: one relevance score per stall, computed over numpy columns.
+
+The score is a weighted mean of components in [0, 1]:
+
+- `distance`: 1 at the buyer, 0 at the search radius (only for proximity searches)
+- `rating`: Bayesian average rating, so 5.0 from 1 review does not beat 4.8 from 200
+- `price`: 1 when free, 0 at `price_max` (or `STALL_SCORE_PRICE_CAP_CENTS`)
+- `macros`: closeness to `?target_calories=`, `target_protein`, `target_carbs`, `target_fat`
+
+Weights come from `settings.STALL_SCORE_WEIGHTS`; components that do not
+apply to a request are dropped and the remaining weights renormalized.
+
+Scoring reads every candidate row, so it runs once per search: the first
+page caches the scored ids (`scored_snapshot`) and later cursor pages only
+select their top-k from that snapshot.
+"""
+import hashlib
+import json
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+DEFAULT_WEIGHTS = {"distance": 0.35, "rating": 0.3, "price": 0.15, "macros": 0.2}
+DEFAULT_SNAPSHOT_TTL = 60
+
+# Stall columns the score reads (besides an optional `distance_m`)
+SCORE_FIELDS = (
+    "average_rating",
+    "rating_count",
+    "price_cents",
+    "calories",
+    "protein_g",
+    "carbs_g",
+    "fat_g",
+)
+
+# ?target_<name>= -> Stall field
+MACRO_TARGETS = {
+    "calories": "calories",
+    "protein": "protein_g",
+    "carbs": "carbs_g",
+    "fat": "fat_g",
+}
+
+
+def macro_targets(params) -> Dict[str, float]:
+    """`?target_protein=40` -> `{"protein_g": 40.0}`; missing, invalid or non-positive targets are skipped."""
+    targets = {}
+    for name, field in MACRO_TARGETS.items():
+        try:
+            value = float(params[f"target_{name}"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if value > 0:
+            targets[field] = value
+    return targets
+
+
+def price_cap(params) -> float:
+    try:
+        cap = float(params["price_max"])
+    except (KeyError, TypeError, ValueError):
+        cap = 0
+    return cap if cap > 0 else float(getattr(settings, "STALL_SCORE_PRICE_CAP_CENTS", 3000))
+
+
+def score_columns(
+    columns: Dict[str, np.ndarray],
+    *,
+    radius_m: Optional[float] = None,
+    targets: Optional[Dict[str, float]] = None,
+    price_cap_cents: float = 3000,
+    weights: Optional[Dict[str, float]] = None,
+) -> np.ndarray:
+    """
+    Scores for stalls given as `{field: array}` columns (`SCORE_FIELDS`, plus
+    `distance_m` when the search has a center).
+    """
+    weights = weights or getattr(settings, "STALL_SCORE_WEIGHTS", DEFAULT_WEIGHTS)
+    components = {}
+
+    distances = columns.get("distance_m")
+    if distances is not None and radius_m:
+        components["distance"] = 1.0 - np.clip(distances / float(radius_m), 0.0, 1.0)
+
+    prior_mean = float(getattr(settings, "STALL_RATING_PRIOR_MEAN", 3.5))
+    prior_count = float(getattr(settings, "STALL_RATING_PRIOR_COUNT", 5))
+    counts = columns["rating_count"]
+    bayesian = (prior_mean * prior_count + columns["average_rating"] * counts) / (prior_count + counts)
+    components["rating"] = np.clip(bayesian / 5.0, 0.0, 1.0)
+
+    components["price"] = 1.0 - np.clip(columns["price_cents"] / price_cap_cents, 0.0, 1.0)
+
+    if targets:
+        fits = [
+            np.clip(1.0 - np.abs(columns[field] - target) / target, 0.0, 1.0)
+            for field, target in targets.items()
+        ]
+        components["macros"] = np.mean(fits, axis=0)
+
+    total = sum(weights.get(name, 0.0) for name in components)
+    scores = np.zeros(len(counts), dtype=np.float64)
+    if total <= 0:
+        return scores
+    for name, values in components.items():
+        scores += (weights.get(name, 0.0) / total) * values
+    return scores
+
+
+def rows_to_columns(rows, fields: Sequence[str]) -> Dict[str, np.ndarray]:
+    """`values_list(*fields)` rows -> `{field: float64 array}`."""
+    matrix = np.array(list(rows), dtype=np.float64).reshape(-1, len(fields))
+    return {field: matrix[:, i] for i, field in enumerate(fields)}
+
+
+def scored_snapshot(parts, build: Callable[[], Dict[str, np.ndarray]], fresh=False) -> Dict[str, np.ndarray]:
+    """
+    `build()` (`{"id", "score"[, "distance_m"]}` arrays) memoized per `parts` for
+    `settings.STALL_BEST_SNAPSHOT_TTL` seconds.
+
+    `fresh` rebuilds it; first pages pass it, so every new search scores current data.
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    key = "best:" + hashlib.md5(payload.encode()).hexdigest()
+    snapshot = None if fresh else cache.get(key)
+    if snapshot is None:
+        snapshot = build()
+        cache.set(key, snapshot, getattr(settings, "STALL_BEST_SNAPSHOT_TTL", DEFAULT_SNAPSHOT_TTL))
+    return snapshot
@@ -0,0 +1,61 @@
+import re
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, FloatField, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Cast, Coalesce
+
+# Text search configuration used for both the stored vectors and the queries
+SEARCH_CONFIG = "english"
+
+_TERM_RE = re.compile(r"[^\W_]+")
+
+
+def stall_search_vector(tag_model):
+    """
+    `tsvector` expression for a stall row: product (A), tag names (B), description (C).
+
+    `tag_model` is passed in so migrations can build it from historical models.
+    """
+    tag_names = Subquery(
+        tag_model.objects.filter(stalls=OuterRef("pk"))
+        .order_by()
+        .values("stalls")
+        .annotate(names=StringAgg("name", " ", output_field=TextField()))
+        .values("names")[:1]
+    )
+    return (
+        SearchVector("product", weight="A", config=SEARCH_CONFIG)
+        + SearchVector(
+            Coalesce(tag_names, Value(""), output_field=TextField()),
+            weight="B",
+            config=SEARCH_CONFIG,
+        )
+        + SearchVector("description", weight="C", config=SEARCH_CONFIG)
+    )
+
+
+def search_query(text, prefix=False):
+    """
+    `SearchQuery` for user input, or None when it holds no searchable terms.
+
+    The default accepts web-search syntax (`"quoted phrase"`, `or`, `-word`).
+    With `prefix=True` every word matches as a prefix (`sal` finds `salmon`),
+    which keeps partial-word inputs like the filter action's `food` working.
+    """
+    text = (text or "").strip()
+    if not text:
+        return None
+    if not prefix:
+        return SearchQuery(text, search_type="websearch", config=SEARCH_CONFIG)
+    terms = _TERM_RE.findall(text.lower())
+    if not terms:
+        return None
+    return SearchQuery(
+        " & ".join(f"{term}:*" for term in terms), search_type="raw", config=SEARCH_CONFIG
+    )
+
+
+def search_rank(query):
+    """`ts_rank` of `query` against the stored vector, as float8 so cursors round-trip."""
+    return Cast(SearchRank(F("search_vector"), query), FloatField())
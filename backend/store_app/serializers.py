@@ -1,5 +1,14 @@
+import os
+
+from django.core.files import File
+from django.core.validators import validate_image_file_extension
+from django.db.models import F, FloatField, IntegerField, Value
+from django.db.models.functions import Cast, Greatest, Round
 from rest_framework import serializers
-from .models import Stall, Tag, Allergen, SpecialRequest, StallImage
+from .models import Stall, Tag, Allergen, SpecialRequest, StallImage, Review, ImageUpload
+from .geo import locate
+from .images import variant_urls
+from .uploads import max_upload_bytes
 from user_app.models import User, SellerProfile  # adjust path as needed
 
 
@@ -17,10 +26,14 @@ class AllergenSerializer(serializers.ModelSerializer):
 
 class StallImageSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    variants = serializers.SerializerMethodField()
 
     class Meta:
         model = StallImage
-        fields = ["id", "image", "alt_text", "position", "is_primary"]
+        fields = ["id", "image", "variants", "alt_text", "position", "is_primary"]
+
+    def get_variants(self, obj):
+        return variant_urls(obj.image, obj.variants, self.context.get("request"))
 
     def get_image(self, obj):
         if not obj.image:
@@ -46,17 +59,23 @@ class StallSerializer(serializers.ModelSerializer):
     images = StallImageSerializer(many=True, read_only=True)
     seller = serializers.SerializerMethodField()  # 👈 nested seller info
     image = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
+    distance_m = serializers.SerializerMethodField()
 
     class Meta:
         model = Stall
         fields = [
             "id",
             "product",
+            "sku",
             "description",
             "image",
+            "image_variants",
             "images",
             "seller",   # 👈 include seller object
             "location",
+            "latitude",
+            "longitude",
             "quantity",
             "radius_m",
             "price_cents",
@@ -73,15 +92,30 @@ class StallSerializer(serializers.ModelSerializer):
             "includes",
             "special_requests_allowed",
             "is_favorited",
+            "distance_m",
         ]
 
+    def get_distance_m(self, obj):
+        # Only set by proximity searches; None elsewhere
+        distance_m = getattr(obj, "distance_m", None)
+        return round(distance_m) if distance_m is not None else None
+
+    def _favorite_stall_id(self):
+        """The requesting buyer's favorite stall id, looked up once per request."""
+        if "favorite_stall_id" not in self.context:
+            request = self.context.get("request")
+            user = getattr(request, "user", None)
+            favorite_stall_id = None
+            if user and user.is_authenticated and getattr(user, "role", None) == "buyer":
+                profile = getattr(user, "buyer_profile", None)
+                favorite_stall_id = getattr(profile, "favorite_stall_id", None)
+            # Nested/list serializers share the root's context dict
+            self.context["favorite_stall_id"] = favorite_stall_id
+        return self.context["favorite_stall_id"]
+
     def get_is_favorited(self, obj):
-        request = self.context.get("request")
-        user = getattr(request, "user", None)
-        if not user or not user.is_authenticated or getattr(user, "role", None) != "buyer":
-            return False
-        profile = getattr(user, "buyer_profile", None)
-        return bool(profile and getattr(profile, "favorite_stall_id", None) == obj.id)
+        favorite_stall_id = self._favorite_stall_id()
+        return favorite_stall_id is not None and favorite_stall_id == obj.id
 
     def get_seller(self, obj):
         owner = getattr(obj, "owner_profile", None)
@@ -93,6 +127,9 @@ class StallSerializer(serializers.ModelSerializer):
                 "last_name": u.last_name,
                 "avatar": u.avatar,
                 "profile_image": owner.image.url if owner.image else None,
+                "profile_image_variants": variant_urls(
+                    owner.image, owner.image_variants, self.context.get("request")
+                ),
             }
         return None
 
@@ -105,20 +142,55 @@ class StallSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(url)
         return url
 
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image, obj.image_variants, self.context.get("request"))
+
+
+class ImageUploadField(serializers.UUIDField):
+    """
+    Id of a completed chunked upload (store_app.uploads) made by the requesting
+    user; validates to the stored file's name, assignable to an image field.
+    """
+    default_error_messages = {
+        "unknown": "No completed upload with this id.",
+        "expired": "This upload has expired; upload the file again.",
+    }
+
+    def to_internal_value(self, data):
+        upload_id = super().to_internal_value(data)
+        request = self.context.get("request")
+        user = getattr(request, "user", None)
+        upload = (
+            ImageUpload.objects.filter(pk=upload_id, owner_id=getattr(user, "pk", None))
+            .exclude(name="")
+            .first()
+        )
+        if upload is None:
+            self.fail("unknown")
+        if not StallImage._meta.get_field("image").storage.exists(upload.name):
+            self.fail("expired")
+        return upload.name
+
 
 class StallWriteSerializer(serializers.ModelSerializer):
     tag_names = serializers.ListField(child=serializers.CharField(), required=False)
     allergen_names = serializers.ListField(child=serializers.CharField(), required=False)
     image = serializers.ImageField(required=False, allow_empty_file=False, write_only=True)
     images = serializers.ListField(child=serializers.ImageField(), required=False, write_only=True)
+    # Alternatives to `image`/`images` for photos sent through /api/uploads/
+    image_upload = ImageUploadField(required=False, write_only=True)
+    image_uploads = serializers.ListField(child=ImageUploadField(), required=False, write_only=True)
 
     class Meta:
         model = Stall
         fields = [
             "product",
+            "sku",
             "description",
             "image",
             "images",
+            "image_upload",
+            "image_uploads",
             "location",
             "quantity",
             "radius_m",
@@ -135,6 +207,29 @@ class StallWriteSerializer(serializers.ModelSerializer):
             "allergen_names",
         ]
 
+    def validate_sku(self, value):
+        value = (value or "").strip() or None
+        if value is None:
+            return None
+        owner = getattr(self.instance, "owner_profile", None)
+        if owner is None:
+            request = self.context.get("request")
+            owner = getattr(getattr(request, "user", None), "seller_profile", None)
+        taken = Stall.objects.filter(owner_profile=owner, sku=value)
+        if self.instance is not None:
+            taken = taken.exclude(pk=self.instance.pk)
+        if owner is not None and taken.exists():
+            raise serializers.ValidationError("You already have a stall with this sku.")
+        return value
+
+    def validate(self, attrs):
+        for upload_key, key in (("image_upload", "image"), ("image_uploads", "images")):
+            if upload_key in attrs:
+                if key in attrs:
+                    raise serializers.ValidationError({upload_key: f"Give either {key} or {upload_key}."})
+                attrs[key] = attrs.pop(upload_key)
+        return attrs
+
     def _assign_labels(self, stall, tag_names, allergen_names):
         if tag_names is not None:
             tags = [Tag.objects.get_or_create(name=name.strip())[0] for name in tag_names if name.strip()]
@@ -143,18 +238,72 @@ class StallWriteSerializer(serializers.ModelSerializer):
             alls = [Allergen.objects.get_or_create(name=name.strip())[0] for name in allergen_names if name.strip()]
             stall.allergens.set(alls)
 
+    def _locate(self, stall):
+        """Store coordinates for `stall.location`, reusing the seller's when it matches."""
+        owner = stall.owner_profile
+        if owner and owner.latitude is not None and owner.location == stall.location:
+            stall.latitude, stall.longitude = owner.latitude, owner.longitude
+        else:
+            stall.latitude, stall.longitude = locate(
+                stall.location, owner.zipcode if owner else None
+            )
+
+    def _set_stock(self, stall, quantity):
+        # save() leaves stock alone (Stall.STOCK_FIELDS); one UPDATE of it instead
+        from cart_app.inventory import set_stock
+
+        set_stock(stall.pk, quantity=quantity)
+        stall.refresh_from_db(fields=["quantity", "updated_at"])
+
+    def _refresh_search_vector(self, stall):
+        # One UPDATE once product/description/tags are final for this request
+        Stall.objects.filter(pk=stall.pk).refresh_search_vector()
+
     def _sync_images(self, stall, image_files):
+        """
+        Make the gallery match `image_files`, in order, by content.
+
+        Photos already in the gallery are recognised by their content hash
+        (see store_app.storage) and kept, at most with a new position; only
+        new photos are written and only dropped ones are deleted. Entries may
+        also be names already in storage (from `image_uploads`).
+        """
+        from .signals import related_changed
+
         if image_files is None:
             return
-        stall.images.all().delete()
-        for idx, img in enumerate(image_files):
-            StallImage.objects.create(
+        storage = StallImage._meta.get_field("image").storage
+        existing = {}
+        for image in stall.images.all():
+            existing.setdefault(image.image.name, []).append(image)
+
+        moved, added = [], []
+        for position, upload in enumerate(image_files):
+            name = upload if isinstance(upload, str) else storage.name_for(upload)
+            if existing.get(name):
+                image = existing[name].pop(0)
+                if (image.position, image.is_primary) != (position, position == 0):
+                    image.position, image.is_primary = position, position == 0
+                    moved.append(image)
+                continue
+            image = StallImage(
                 stall=stall,
-                image=img,
                 alt_text=f"{stall.product}",
-                position=idx,
-                is_primary=(idx == 0),
+                position=position,
+                is_primary=(position == 0),
             )
+            # Bytes already stored (by any stall) are referenced, not rewritten
+            image.image = name if storage.exists(name) else upload
+            added.append(image)
+
+        dropped = [image.pk for images in existing.values() for image in images]
+        if dropped:
+            StallImage.objects.filter(pk__in=dropped).delete()
+        if moved:
+            StallImage.objects.bulk_update(moved, ["position", "is_primary"])
+            related_changed([stall.pk])
+        for image in added:
+            image.save()
 
     def create(self, validated_data):
         tag_names = validated_data.pop("tag_names", None)
@@ -176,6 +325,8 @@ class StallWriteSerializer(serializers.ModelSerializer):
 
         # Always set location from seller's profile to ensure consistency
         validated_data["location"] = seller_profile.location
+        validated_data["latitude"] = seller_profile.latitude
+        validated_data["longitude"] = seller_profile.longitude
 
         # Require at least one image
         from rest_framework import serializers as drf_serializers
@@ -183,13 +334,17 @@ class StallWriteSerializer(serializers.ModelSerializer):
             raise drf_serializers.ValidationError({"image": "An image is required to create a meal."})
 
         # Attach seller_profile (owner) to the stall
-        stall = Stall.objects.create(owner_profile=seller_profile, **validated_data)
+        stall = Stall(owner_profile=seller_profile, **validated_data)
+        if stall.latitude is None:
+            self._locate(stall)
+        stall.save()
 
         if primary_image is not None:
             stall.image = primary_image
             stall.save(update_fields=["image"])
 
         self._assign_labels(stall, tag_names, allergen_names)
+        self._refresh_search_vector(stall)
         self._sync_images(stall, image_files)
 
         if not stall.image and image_files:
@@ -204,11 +359,22 @@ class StallWriteSerializer(serializers.ModelSerializer):
         image_files = validated_data.pop("images", None)
         primary_image = validated_data.pop("image", None)
 
+        location_changed = (
+            "location" in validated_data and validated_data["location"] != instance.location
+        )
+        quantity = validated_data.pop("quantity", None)
         for k, v in validated_data.items():
             setattr(instance, k, v)
+        if location_changed:
+            self._locate(instance)
         instance.save()
+        if quantity is not None:
+            self._set_stock(instance, quantity)
 
         self._assign_labels(instance, tag_names, allergen_names)
+        # Tag changes refresh it from the m2m signal (store_app.signals)
+        if {"product", "description"} & set(validated_data):
+            self._refresh_search_vector(instance)
         if primary_image is not None:
             instance.image = primary_image
             instance.save(update_fields=["image"])
@@ -216,8 +382,119 @@ class StallWriteSerializer(serializers.ModelSerializer):
         return instance
 
 
+class StallImportSerializer(serializers.ModelSerializer):
+    """
+    One row of a bulk import (store_app.imports): a whole listing keyed by `sku`.
+
+    Fields left out take their defaults; images are not imported.
+    """
+    sku = serializers.CharField(max_length=64)
+    tag_names = serializers.ListField(child=serializers.CharField(max_length=50), required=False, default=list)
+    allergen_names = serializers.ListField(child=serializers.CharField(max_length=50), required=False, default=list)
+
+    class Meta:
+        model = Stall
+        fields = [
+            "sku",
+            "product",
+            "description",
+            "quantity",
+            "radius_m",
+            "price_cents",
+            "price_level",
+            "calories",
+            "fat_g",
+            "carbs_g",
+            "protein_g",
+            "options",
+            "includes",
+            "special_requests_allowed",
+            "tag_names",
+            "allergen_names",
+        ]
+        # Uniqueness per seller is the upsert key, not an error
+        validators = []
+
+
+class StallBulkPatchSerializer(serializers.Serializer):
+    """
+    Changes applied to every selected stall by `/api/stalls/bulk_update/`.
+
+    Price takes at most one of `price_cents` (absolute), `price_delta_cents`
+    or `price_percent` (relative); quantity one of `quantity`/`quantity_delta`.
+    Relative changes never go below 0.
+    """
+    price_cents = serializers.IntegerField(min_value=0, required=False)
+    price_delta_cents = serializers.IntegerField(required=False)
+    price_percent = serializers.FloatField(min_value=-100, max_value=1000, required=False)
+    quantity = serializers.IntegerField(min_value=0, required=False)
+    quantity_delta = serializers.IntegerField(required=False)
+    special_requests_allowed = serializers.BooleanField(required=False)
+
+    def validate(self, attrs):
+        for group in (("price_cents", "price_delta_cents", "price_percent"), ("quantity", "quantity_delta")):
+            given = [name for name in group if name in attrs]
+            if len(given) > 1:
+                raise serializers.ValidationError(f"Give only one of {', '.join(given)}.")
+        if not attrs:
+            raise serializers.ValidationError("Nothing to change.")
+        return attrs
+
+    def update_expressions(self):
+        """`QuerySet.update()` kwargs computing the new values in SQL from each row's own."""
+        data = self.validated_data
+        values = {}
+        if "price_cents" in data:
+            values["price_cents"] = data["price_cents"]
+        elif "price_delta_cents" in data:
+            values["price_cents"] = Greatest(F("price_cents") + data["price_delta_cents"], Value(0))
+        elif "price_percent" in data:
+            factor = 1 + data["price_percent"] / 100
+            scaled = Round(Cast(F("price_cents"), FloatField()) * factor)
+            values["price_cents"] = Greatest(Cast(scaled, IntegerField()), Value(0))
+        if "quantity" in data:
+            values["quantity"] = data["quantity"]
+        elif "quantity_delta" in data:
+            values["quantity"] = Greatest(F("quantity") + data["quantity_delta"], Value(0))
+        if "special_requests_allowed" in data:
+            values["special_requests_allowed"] = data["special_requests_allowed"]
+        return values
+
+
 class SpecialRequestSerializer(serializers.ModelSerializer):
     class Meta:
         model = SpecialRequest
         fields = ["id", "stall", "buyer_profile", "note", "status", "created_at"]
         read_only_fields = ["buyer_profile", "status", "created_at"]
+
+
+class ReviewSerializer(serializers.ModelSerializer):
+    buyer_first_name = serializers.CharField(source="buyer_profile.user.first_name", read_only=True)
+
+    class Meta:
+        model = Review
+        fields = ["id", "stall", "buyer_profile", "buyer_first_name", "rating", "comment", "created_at", "updated_at"]
+        read_only_fields = ["stall", "buyer_profile", "created_at", "updated_at"]
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    complete = serializers.BooleanField(read_only=True)
+    sha256 = serializers.RegexField(r"^[0-9a-fA-F]{64}$", max_length=64)
+
+    class Meta:
+        model = ImageUpload
+        fields = ["id", "filename", "size", "sha256", "offset", "complete", "created_at", "updated_at"]
+        read_only_fields = ["id", "offset", "created_at", "updated_at"]
+
+    def validate_filename(self, value):
+        validate_image_file_extension(File(None, name=value))
+        return os.path.basename(value)
+
+    def validate_size(self, value):
+        limit = max_upload_bytes()
+        if value < 1 or value > limit:
+            raise serializers.ValidationError(f"Size must be between 1 and {limit} bytes.")
+        return value
+
+    def validate_sha256(self, value):
+        return value.lower()
@@ -0,0 +1,122 @@
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Now
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from user_app.models import SellerProfile
+
+from .cache import bump_stall_versions
+from .images import needs_variants, schedule_variants
+from .storage import TRACKED_IMAGE_FIELDS, track_references
+from .labels import invalidate_labels
+from .models import Allergen, Stall, StallImage, Tag
+from .search import stall_search_vector
+
+
+def related_changed(stall_ids):
+    """A stall's payload changed without a Stall.save(): touch `updated_at` and the cache."""
+    stall_ids = {stall_id for stall_id in stall_ids if stall_id is not None}
+    if stall_ids:
+        Stall.objects.filter(pk__in=stall_ids).update(updated_at=Now())
+        bump_stall_versions(stall_ids)
+
+
+@receiver(post_save, sender=Stall)
+@receiver(post_delete, sender=Stall)
+def stall_changed(sender, instance, **kwargs):
+    bump_stall_versions([instance.pk])
+
+
+@receiver(post_save, sender=StallImage)
+@receiver(post_delete, sender=StallImage)
+def stall_image_changed(sender, instance, **kwargs):
+    related_changed([instance.stall_id])
+
+
+def labels_changed(stall_ids, tags=False):
+    """
+    Tags/allergens of these stalls changed: also rebuild their `tag_ids`/`allergen_ids`,
+    and with `tags` their `search_vector` (tag names are searchable), in the same UPDATE.
+    """
+    stall_ids = {stall_id for stall_id in stall_ids if stall_id is not None}
+    if stall_ids:
+        extra = {"search_vector": stall_search_vector(Tag)} if tags else {}
+        Stall.objects.filter(pk__in=stall_ids).refresh_label_ids(updated_at=Now(), **extra)
+        bump_stall_versions(stall_ids)
+
+
+@receiver(m2m_changed, sender=Stall.tags.through)
+@receiver(m2m_changed, sender=Stall.allergens.through)
+def stall_labels_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    tags = sender is Stall.tags.through
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            labels_changed([instance.pk], tags=tags)
+        return
+    # Reverse side: `instance` is a Tag/Allergen and `pk_set` holds stall ids
+    if action == "pre_clear":
+        instance._cleared_stall_ids = list(instance.stalls.values_list("id", flat=True))
+    elif action == "post_clear":
+        labels_changed(getattr(instance, "_cleared_stall_ids", []), tags=tags)
+    elif action in ("post_add", "post_remove"):
+        labels_changed(pk_set or [], tags=tags)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Allergen)
+def label_saved(sender, instance, created=False, **kwargs):
+    invalidate_labels()
+    if created:
+        return
+    # A rename changes every stall that carries the label
+    stalls = instance.stalls.all()
+    related_changed(stalls.values_list("id", flat=True))
+    if sender is Tag:
+        # Tag names are part of the stall search vector
+        stalls.refresh_search_vector()
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Allergen)
+def label_deleting(sender, instance, **kwargs):
+    # The through rows are gone by post_delete; remember who carried the label
+    instance._stall_ids = list(instance.stalls.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Allergen)
+def label_deleted(sender, instance, **kwargs):
+    invalidate_labels()
+    labels_changed(getattr(instance, "_stall_ids", []), tags=sender is Tag)
+
+
+@receiver(post_save, sender=SellerProfile)
+def seller_profile_changed(sender, instance, **kwargs):
+    related_changed(instance.stalls.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def seller_user_changed(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, which stalls do not show
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    profile = getattr(instance, "seller_profile", None)
+    if profile is not None:
+        related_changed(profile.stalls.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Stall)
+@receiver(post_save, sender=StallImage)
+@receiver(post_save, sender=SellerProfile)
+def image_saved(sender, instance, **kwargs):
+    # Rendered in the background once the upload is committed (see store_app.images)
+    if needs_variants(instance) and getattr(instance, "_variants_pending", None) != instance.image.name:
+        instance._variants_pending = instance.image.name
+        transaction.on_commit(lambda: schedule_variants(instance))
+
+
+# Reference counts of content-addressed image blobs (see store_app.storage)
+for label, field_name in TRACKED_IMAGE_FIELDS.items():
+    track_references(apps.get_model(label), field_name)
@@ -0,0 +1,268 @@
+"""
+Content-addressed, deduplicated storage for uploaded photos.
+
+`ContentAddressedStorage` names every file after the SHA-256 of its bytes
+(`blobs/ab/cd/abcd...ef.jpg`), so uploading the same photo twice stores it
+once and an unchanged photo is recognised by name alone. Files are written
+to a temporary file while hashing and renamed into place atomically.
+
+`MediaBlob` rows count how many image fields point at each blob. The counts
+are kept by signals on the models listed in `TRACKED_IMAGE_FIELDS`
+(`track_references`); blobs nobody references are removed by
+`manage.py collect_media` after a grace period.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Now
+from django.db.models.signals import post_delete, post_init, post_save
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+BLOB_PREFIX = "blobs/"
+HASH_CHUNK = 1024 * 1024
+
+# label -> image field kept in content-addressed storage
+TRACKED_IMAGE_FIELDS = {
+    "store_app.Stall": "image",
+    "store_app.StallImage": "image",
+    "user_app.SellerProfile": "image",
+}
+
+
+def blob_name(digest, original_name=""):
+    """`blobs/ab/cd/<sha256><ext>`; the extension is kept so content types still resolve."""
+    extension = os.path.splitext(original_name)[1].lower()
+    return f"{BLOB_PREFIX}{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+def content_digest(content):
+    """SHA-256 hex digest of a Django `File`, read in chunks; leaves it rewound."""
+    sha = hashlib.sha256()
+    if hasattr(content, "seek"):
+        content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK):
+        sha.update(chunk)
+    if hasattr(content, "seek"):
+        content.seek(0)
+    return sha.hexdigest()
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage (under MEDIA_ROOT) that stores each distinct content once."""
+
+    def generate_filename(self, filename):
+        # The final name is decided by the content in _save()
+        return filename
+
+    def get_available_name(self, name, max_length=None):
+        # Same name means same bytes, so an existing file is reused, never suffixed
+        return name
+
+    def name_for(self, content):
+        """Name `content` would be stored under, without writing anything."""
+        return blob_name(content_digest(content), getattr(content, "name", "") or "")
+
+    def _save(self, name, content):
+        directory = self.path(BLOB_PREFIX)
+        os.makedirs(directory, exist_ok=True)
+        if self.directory_permissions_mode is not None:
+            os.chmod(directory, self.directory_permissions_mode)
+        # Hash while writing a temporary file, then move it to its content address
+        sha = hashlib.sha256()
+        fd, temporary = tempfile.mkstemp(dir=directory, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                if hasattr(content, "seek"):
+                    content.seek(0)
+                for chunk in content.chunks(HASH_CHUNK):
+                    sha.update(chunk)
+                    out.write(chunk)
+            return self.adopt(temporary, sha.hexdigest(), name)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+            raise
+
+    def adopt(self, path, digest, original_name=""):
+        """Move the local file `path`, whose SHA-256 is `digest`, to its content address."""
+        final = blob_name(digest, original_name)
+        if self.exists(final):
+            os.unlink(path)
+            # Fresh mtime keeps collect_media off a blob that is being reused
+            os.utime(self.path(final))
+            return final
+        os.makedirs(os.path.dirname(self.path(final)), exist_ok=True)
+        os.chmod(path, self.file_permissions_mode or 0o644)
+        # A rename on the same filesystem (atomic; a concurrent upload of the
+        # same bytes just replaces equal content), a copy across filesystems
+        shutil.move(path, self.path(final))
+        return final
+
+
+def get_image_storage():
+    return ContentAddressedStorage()
+
+
+# -- Reference counting --------------------------------------------------------
+
+
+def change_references(names, delta):
+    """Add `delta` to the reference count of each content-addressed name in `names`."""
+    from .models import MediaBlob
+
+    for name in names:
+        if not is_blob(name):
+            continue
+        blob = MediaBlob.objects.filter(name=name)
+        if blob.update(ref_count=F("ref_count") + delta, updated_at=Now()):
+            continue
+        try:
+            with transaction.atomic():
+                MediaBlob.objects.create(name=name, ref_count=max(delta, 0))
+        except IntegrityError:
+            # Created concurrently; apply the delta to that row
+            blob.update(ref_count=F("ref_count") + delta, updated_at=Now())
+
+
+def _stored_name(instance, attname):
+    """The field's raw value as loaded/assigned, without triggering a deferred load."""
+    value = instance.__dict__.get(attname)
+    return getattr(value, "name", value) or ""
+
+
+def track_references(model, field_name):
+    """Keep `MediaBlob.ref_count` in step with `model.<field_name>` saves and deletes."""
+
+    def remember(sender, instance, **kwargs):
+        # Deferred fields are absent from __dict__: their old name stays unknown (None)
+        if field_name in instance.__dict__:
+            instance._blob_names = {field_name: _stored_name(instance, field_name)}
+        else:
+            instance._blob_names = {field_name: None}
+
+    def saved(sender, instance, created=False, update_fields=None, **kwargs):
+        if update_fields is not None and field_name not in update_fields:
+            return
+        if field_name not in instance.__dict__:
+            return
+        old = None if created else getattr(instance, "_blob_names", {}).get(field_name)
+        new = _stored_name(instance, field_name)
+        if old == new:
+            return
+        change_references([new], 1)
+        if old:
+            change_references([old], -1)
+        instance._blob_names = {field_name: new}
+
+    def deleted(sender, instance, **kwargs):
+        name = getattr(instance, "_blob_names", {}).get(field_name)
+        if name is None:
+            name = _stored_name(instance, field_name)
+        change_references([name], -1)
+
+    uid = f"blob-refs:{model._meta.label}.{field_name}"
+    post_init.connect(remember, sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(saved, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(deleted, sender=model, weak=False, dispatch_uid=uid)
+
+
+# -- Garbage collection ----------------------------------------------------------
+
+
+def recount_references():
+    """Recompute every `MediaBlob.ref_count` from the tracked image fields; returns rows changed."""
+    from .models import MediaBlob
+
+    counts = Counter()
+    for label, field_name in TRACKED_IMAGE_FIELDS.items():
+        names = apps.get_model(label).objects.filter(**{f"{field_name}__startswith": BLOB_PREFIX})
+        counts.update(names.values_list(field_name, flat=True).iterator())
+
+    changed = []
+    for blob in MediaBlob.objects.only("pk", "name", "ref_count").iterator():
+        count = counts.pop(blob.name, 0)
+        if blob.ref_count != count:
+            blob.ref_count = count
+            changed.append(blob)
+    MediaBlob.objects.bulk_update(changed, ["ref_count"], batch_size=500)
+    MediaBlob.objects.bulk_create(
+        [MediaBlob(name=name, ref_count=count) for name, count in counts.items()],
+        ignore_conflicts=True,
+    )
+    return len(changed) + len(counts)
+
+
+def delete_blob(name):
+    """Remove a blob file and its rendered variants (`variants/<blob stem>-<width>.<ext>`)."""
+    storage = get_image_storage()
+    if storage.exists(name):
+        storage.delete(name)
+    directory, filename = os.path.split(os.path.splitext(name)[0])
+    directory = f"variants/{directory}"
+    if default_storage.exists(directory):
+        for variant in default_storage.listdir(directory)[1]:
+            if variant.startswith(f"{filename}-"):
+                default_storage.delete(f"{directory}/{variant}")
+
+
+def _stale(storage, name, cutoff):
+    try:
+        return storage.get_modified_time(name) < cutoff
+    except FileNotFoundError:
+        return True
+
+
+def collect_garbage(grace=timedelta(hours=24), dry_run=False):
+    """
+    Delete blobs nobody has referenced for `grace`; returns the names removed.
+
+    Two kinds qualify: `MediaBlob` rows at zero references whose count and
+    file are both older than `grace`, and files under `blobs/` without a row
+    (uploads whose transaction rolled back, interrupted writes).
+    """
+    from .models import MediaBlob
+
+    storage = get_image_storage()
+    cutoff = timezone.now() - grace
+    removed = []
+
+    unreferenced = MediaBlob.objects.filter(ref_count__lte=0, updated_at__lt=cutoff)
+    for pk, name in unreferenced.values_list("pk", "name").iterator():
+        if not _stale(storage, name, cutoff):
+            continue
+        if not dry_run:
+            # Skipped when the blob was referenced again since the query above
+            if not MediaBlob.objects.filter(pk=pk, ref_count__lte=0).delete()[0]:
+                continue
+            delete_blob(name)
+        removed.append(name)
+
+    root = storage.path(BLOB_PREFIX)
+    for directory, _, filenames in os.walk(root):
+        names = [
+            os.path.relpath(os.path.join(directory, filename), storage.location).replace(os.sep, "/")
+            for filename in filenames
+        ]
+        names = [name for name in names if _stale(storage, name, cutoff)]
+        known = set(MediaBlob.objects.filter(name__in=names).values_list("name", flat=True))
+        for name in names:
+            if name in known:
+                continue
+            if not dry_run:
+                delete_blob(name)
+            removed.append(name)
+    return removed
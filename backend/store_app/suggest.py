@@ -0,0 +1,74 @@
+"""
+Typeahead completions for the catalog search box.
+
+Tag and Allergen names come from the in-process vocabulary (store_app.labels)
+and never touch the database per keystroke. Stall products are matched in
+SQL against two `pg_trgm` GIN indexes (migrations 0010 and 0018).
+"""
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Q
+from django.db.models.functions import Length
+
+from .labels import vocabulary, word_keys
+from .models import Stall
+
+MAX_PREFIX_LENGTH = 50
+
+
+def normalize_prefix(value):
+    """Lowercase, trim and collapse whitespace; None when nothing is left."""
+    prefix = " ".join(str(value or "").lower().split())[:MAX_PREFIX_LENGTH]
+    return prefix or None
+
+
+def match_quality(text, prefix):
+    """0: text starts with prefix, 1: a word (run) in it does, 2: fuzzy match only."""
+    text = text.lower()
+    if text.startswith(prefix):
+        return 0
+    if any(key.startswith(prefix) for key in word_keys(text)):
+        return 1
+    return 2
+
+
+def product_completions(prefix, limit):
+    """
+    Distinct stall products matching `prefix`, best first.
+
+    `istartswith` compiles to `UPPER(product) LIKE 'PREFIX%'`, answered by the
+    `UPPER(product)` trigram index; the word-similarity operator (`%>`, which
+    also tolerates small typos) by the one on `product`. Each branch of the OR
+    needs its own index, or the planner falls back to a sequential scan.
+    """
+    rows = (
+        Stall.objects.filter(
+            Q(product__istartswith=prefix) | Q(product__trigram_word_similar=prefix)
+        )
+        .annotate(similarity=TrigramWordSimilarity(prefix, "product"))
+        .order_by("-similarity", Length("product"), "product", "id")
+        .values_list("id", "product")[: limit * 3]
+    )
+    seen, results = set(), []
+    for pk, product in rows:
+        if product.lower() in seen:
+            continue
+        seen.add(product.lower())
+        results.append({"type": "stall", "id": pk, "text": product})
+    return results
+
+
+def suggest(prefix, limit=10):
+    """
+    Ranked completions across stall products, tags and allergens.
+
+    Full-text prefix matches rank above word-prefix matches, which rank
+    above fuzzy (trigram-only) product matches; ties go to shorter text.
+    """
+    prefix = normalize_prefix(prefix)
+    if prefix is None:
+        return []
+    candidates = vocabulary().trie.complete(prefix) + product_completions(prefix, limit)
+    candidates.sort(
+        key=lambda e: (match_quality(e["text"], prefix), len(e["text"]), e["text"].lower())
+    )
+    return candidates[:limit]
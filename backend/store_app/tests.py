@@ -1,3 +1,1571 @@
-from django.test import TestCase
+import base64
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from store_app.distance import rank_by_distance
+from store_app.planner import plan_meals
+from store_app.serializers import StallSerializer, StallWriteSerializer
+from store_app.scoring import SCORE_FIELDS, rows_to_columns, score_columns
+from store_app import geo
+from store_app.geo import bounding_box, geohash_cover, geohash_encode
+from store_app.models import Allergen, ImageUpload, MediaBlob, Review, Stall, StallImage, Tag, ZipCentroid
+from store_app.labels import PrefixTrie, vocabulary
+from store_app.uploads import UploadError, partial_path, write_chunk
+from user_app.models import BuyerProfile, SellerProfile
+
+User = get_user_model()
+
+# Two points roughly 1.5 km apart in San Francisco
+FERRY_BUILDING = (37.7955, -122.3937)
+UNION_SQUARE = (37.7880, -122.4075)
+
+
+class GeohashTests(SimpleTestCase):
+    def test_encode_known_point(self):
+        # Reference value from the original geohash.org implementation
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+
+    def test_cover_contains_points_inside_bbox(self):
+        bbox = bounding_box(*UNION_SQUARE, 5000)
+        prefixes = geohash_cover(bbox)
+        self.assertLessEqual(len(prefixes), 16)
+        for point in (FERRY_BUILDING, UNION_SQUARE, (bbox[0], bbox[2]), (bbox[1], bbox[3])):
+            cell = geohash_encode(*point)
+            self.assertTrue(any(cell.startswith(p) for p in prefixes), point)
+
+
+class DistanceEngineTests(SimpleTestCase):
+    def test_rank_masks_and_sorts(self):
+        rows = [
+            (1, *FERRY_BUILDING, 5000),
+            (2, *UNION_SQUARE, 5000),
+            (3, *FERRY_BUILDING, 500),  # seller radius too small
+            (4, 37.3382, -121.8863, 100000),  # beyond buyer radius
+        ]
+        ids, distances = rank_by_distance(*UNION_SQUARE, rows, 5000)
+        self.assertEqual(ids.tolist(), [2, 1])
+        self.assertAlmostEqual(distances[0], 0.0)
+        self.assertAlmostEqual(distances[1], 1450, delta=100)
+
+    def test_rank_empty(self):
+        ids, distances = rank_by_distance(*UNION_SQUARE, [], 5000)
+        self.assertEqual(len(ids), 0)
+        self.assertEqual(len(distances), 0)
+
+
+@override_settings(GEOCODER_FALLBACK=None)
+class ZipGeocoderTests(TestCase):
+    def setUp(self):
+        ZipCentroid.objects.create(zipcode=94108, latitude=UNION_SQUARE[0], longitude=UNION_SQUARE[1])
+        geo.reset_zip_index()
+        self.addCleanup(geo.reset_zip_index)
+
+    def test_zipcodes_resolve_offline(self):
+        with mock.patch.object(geo, "_nominatim") as remote:
+            self.assertEqual(geo.geocode("94108"), UNION_SQUARE)
+            self.assertEqual(geo.geocode("94108-1234"), UNION_SQUARE)
+            self.assertEqual(geo.zip_centroid(94108), UNION_SQUARE)
+            self.assertIsNone(geo.geocode("1 Market St"))
+            remote.assert_not_called()
+
+    def test_index_loads_once(self):
+        geo.geocode("94108")
+        with self.assertNumQueries(0):
+            geo.geocode("94108")
+            geo.geocode("10001")
+
+    def test_index_notices_table_loaded_elsewhere(self):
+        ZipCentroid.objects.all().delete()
+        self.assertIsNone(geo.zip_centroid(94108))
+        # Loaded by another process: no reset_zip_index() here
+        ZipCentroid.objects.create(zipcode=94108, latitude=UNION_SQUARE[0], longitude=UNION_SQUARE[1])
+        self.assertIsNone(geo.zip_centroid(94108))  # within the recheck interval
+        with override_settings(ZIP_INDEX_RECHECK=0):
+            self.assertEqual(geo.zip_centroid(94108), UNION_SQUARE)
+
+    def test_locate_falls_back_to_zipcode(self):
+        self.assertEqual(geo.locate("Somewhere vague", 94108), UNION_SQUARE)
+        self.assertEqual(geo.locate("", None), (None, None))
+
+    @override_settings(GEOCODER_FALLBACK="nominatim")
+    def test_free_form_addresses_use_fallback(self):
+        with mock.patch.object(geo, "_nominatim", return_value=FERRY_BUILDING) as remote:
+            self.assertEqual(geo.geocode("1 Ferry Building"), FERRY_BUILDING)
+            self.assertEqual(geo.geocode("94108"), UNION_SQUARE)
+        remote.assert_called_once_with("1 Ferry Building")
+
+
+class StallFilterTests(APITestCase):
+    def setUp(self):
+        user = User.objects.create_user(username="chef@example.com", password="x", role="seller")
+        self.seller = SellerProfile.objects.create(
+            user=user,
+            location="Ferry Building",
+            latitude=FERRY_BUILDING[0],
+            longitude=FERRY_BUILDING[1],
+        )
+        self.filter_url = reverse("stalls-filter")
+
+    def _stall(self, product, coords, radius_m=5000):
+        return Stall.objects.create(
+            owner_profile=self.seller,
+            product=product,
+            location=self.seller.location,
+            latitude=coords[0],
+            longitude=coords[1],
+            radius_m=radius_m,
+        )
+
+    @mock.patch("store_app.views.geocode", return_value=UNION_SQUARE)
+    def test_filter_uses_stored_coordinates(self, geocode):
+        near = self._stall("Salmon bowl", FERRY_BUILDING)
+        self._stall("Too far", (37.3382, -121.8863))  # San Jose
+        Stall.objects.create(owner_profile=self.seller, product="Unplaced", location="Nowhere")
+
+        resp = self.client.get(self.filter_url, {"zipcode": "94108", "radius_m": 5000})
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        results = resp.data["results"]
+        self.assertEqual([s["id"] for s in results], [near.id])
+        self.assertAlmostEqual(results[0]["distance_m"], 1450, delta=100)
+        # Only the buyer's zipcode is geocoded; stall rows are never sent to the geocoder
+        geocode.assert_called_once_with("94108")
+
+    @mock.patch("store_app.views.geocode", return_value=UNION_SQUARE)
+    def test_filter_rejects_non_positive_radius(self, geocode):
+        for radius_m in ("0", "-500", "nan"):
+            resp = self.client.get(self.filter_url, {"zipcode": "94108", "radius_m": radius_m})
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @mock.patch("store_app.views.geocode", return_value=UNION_SQUARE)
+    def test_filter_respects_seller_radius(self, geocode):
+        self._stall("Short range", FERRY_BUILDING, radius_m=500)
+
+        resp = self.client.get(self.filter_url, {"zipcode": "94108", "radius_m": 5000})
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["results"], [])
+
+    def test_within_radius_annotates_distance(self):
+        stall = self._stall("Salmon bowl", FERRY_BUILDING)
+        self._stall("Too far", (37.3382, -121.8863))
+
+        rows = list(Stall.objects.within_radius(*UNION_SQUARE, 5000))
+
+        self.assertEqual([s.id for s in rows], [stall.id])
+        self.assertAlmostEqual(rows[0].distance_m, 1450, delta=100)
+
+
+class StallListRadiusTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username="chef2@example.com", password="x", role="seller")
+        self.seller = SellerProfile.objects.create(user=user, location="Ferry Building", zipcode=94111)
+        ZipCentroid.objects.create(zipcode=94108, latitude=UNION_SQUARE[0], longitude=UNION_SQUARE[1])
+        geo.reset_zip_index()
+        self.addCleanup(geo.reset_zip_index)
+        self.list_url = reverse("stalls-list")
+
+        self.near = self._stall("Salmon bowl", FERRY_BUILDING, tags=["vegan"])
+        self.near_untagged = self._stall("Steak plate", FERRY_BUILDING)
+        self.far = self._stall("Tacos", (37.3382, -121.8863), tags=["vegan"])
+
+    def _stall(self, product, coords, tags=()):
+        stall = Stall.objects.create(
+            owner_profile=self.seller,
+            product=product,
+            location=self.seller.location,
+            latitude=coords[0],
+            longitude=coords[1],
+            radius_m=50000,
+        )
+        stall.tags.add(*(Tag.objects.get_or_create(name=name)[0] for name in tags))
+        return stall
+
+    def _ids(self, resp):
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return sorted(s["id"] for s in resp.data["results"])
+
+    def test_lat_lng_radius(self):
+        resp = self.client.get(self.list_url, {"lat": UNION_SQUARE[0], "lng": UNION_SQUARE[1], "radius": 5})
+        self.assertEqual(self._ids(resp), sorted([self.near.id, self.near_untagged.id]))
+
+    def test_zip_radius_combines_with_tags(self):
+        resp = self.client.get(self.list_url, {"zip": "94108", "radius_m": 5000, "tags": "vegan"})
+        self.assertEqual(self._ids(resp), [self.near.id])
+
+    def test_zip_without_radius_matches_seller_zipcode(self):
+        resp = self.client.get(self.list_url, {"zip": "94111"})
+        self.assertEqual(len(self._ids(resp)), 3)
+
+    def test_non_finite_radius_and_coordinates(self):
+        point = {"lat": UNION_SQUARE[0], "lng": UNION_SQUARE[1]}
+        everything = sorted([self.near.id, self.near_untagged.id, self.far.id])
+        # Invalid radii are ignored, so no proximity filter applies
+        for radius in ("nan", "inf", "-5", "0"):
+            self.assertEqual(self._ids(self.client.get(self.list_url, {**point, "radius": radius})), everything)
+        # A huge radius is clamped; each stall's own radius still applies
+        resp = self.client.get(self.list_url, {**point, "radius": "1e12"})
+        self.assertEqual(self._ids(resp), sorted([self.near.id, self.near_untagged.id]))
+        for lat, lng in (("nan", "-122.4"), ("37.8", "inf"), ("91", "0")):
+            self.assertEqual(self._ids(self.client.get(self.list_url, {"lat": lat, "lng": lng, "radius": 5})), everything)
+
+    def test_labels_created_elsewhere_filter_at_once(self):
+        # As in a worker whose vocabulary predates the labels: no version bump reaches it
+        vocabulary()
+        self.near_untagged.tags.add(Tag.objects.create(name="Spicy"))
+        self.near.allergens.add(Allergen.objects.create(name="sesame"))
+        self.assertNotIn("Spicy", [e["text"] for e in vocabulary().entries])
+
+        self.assertEqual(self._ids(self.client.get(self.list_url, {"tags": "Spicy"})), [self.near_untagged.id])
+        self.assertEqual(self._ids(self.client.get(self.list_url, {"category": "spicy"})), [self.near_untagged.id])
+        resp = self.client.get(self.list_url, {"allergens_exclude": "sesame"})
+        self.assertEqual(self._ids(resp), sorted([self.near_untagged.id, self.far.id]))
+
+
+class StallSearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="chef5@example.com", password="x", role="seller")
+        self.seller = SellerProfile.objects.create(user=self.user, location="Ferry Building")
+        self.list_url = reverse("stalls-list")
+
+        self.bowl = self._stall("Salmon bowl", "Rice, greens and miso glaze")
+        self.plate = self._stall("Rice plate", "Served with grilled salmon on the side")
+        self.tacos = self._stall("Tacos", "Corn tortillas", tags=["pescatarian"])
+        Stall.objects.refresh_search_vector()
+
+    def _stall(self, product, description, tags=()):
+        stall = Stall.objects.create(
+            owner_profile=self.seller,
+            product=product,
+            description=description,
+            location=self.seller.location,
+            latitude=FERRY_BUILDING[0],
+            longitude=FERRY_BUILDING[1],
+        )
+        stall.tags.add(*(Tag.objects.get_or_create(name=name)[0] for name in tags))
+        return stall
+
+    def _search(self, params):
+        resp = self.client.get(self.list_url, params)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK, resp.data)
+        return [s["id"] for s in resp.data["results"]]
+
+    def test_product_match_outranks_description_match(self):
+        self.assertEqual(self._search({"q": "salmon"}), [self.bowl.id, self.plate.id])
+
+    def test_matches_stemmed_words_and_tag_names(self):
+        self.assertEqual(self._search({"q": "bowls"}), [self.bowl.id])
+        self.assertEqual(self._search({"q": "pescatarian"}), [self.tacos.id])
+
+    def test_tag_changes_refresh_search_vector(self):
+        spicy = Tag.objects.create(name="spicy")
+        self.bowl.tags.add(spicy)
+        self.assertEqual(self._search({"q": "spicy"}), [self.bowl.id])
+        spicy.stalls.add(self.plate)
+        self.assertCountEqual(self._search({"q": "spicy"}), [self.bowl.id, self.plate.id])
+        self.bowl.tags.clear()
+        spicy.stalls.remove(self.plate)
+        self.assertEqual(self._search({"q": "spicy"}), [])
+
+    def test_relevance_pages(self):
+        resp = self.client.get(self.list_url, {"q": "salmon", "page_size": 1})
+        resp = self.client.get(resp.data["next"])
+        self.assertEqual([s["id"] for s in resp.data["results"]], [self.plate.id])
+        self.assertIsNone(resp.data["next"])
+
+    def test_relevance_sort_requires_q(self):
+        resp = self.client.get(self.list_url, {"sort": "relevance"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_write_serializer_refreshes_vector(self):
+        self.client.force_authenticate(self.user)
+        url = reverse("stalls-detail", kwargs={"id": self.tacos.id})
+        resp = self.client.patch(url, {"product": "Fish tacos", "tag_names": ["spicy"]}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK, resp.data)
+
+        self.assertEqual(self._search({"q": "fish"}), [self.tacos.id])
+        self.assertEqual(self._search({"q": "spicy"}), [self.tacos.id])
+        self.assertEqual(self._search({"q": "pescatarian"}), [])
+
+    def test_tag_rename_refreshes_vector(self):
+        tag = Tag.objects.get(name="pescatarian")
+        tag.name = "seafood"
+        tag.save()
+        self.assertEqual(self._search({"q": "seafood"}), [self.tacos.id])
+
+    @mock.patch("store_app.views.geocode", return_value=FERRY_BUILDING)
+    def test_filter_food_matches_prefixes(self, geocode):
+        resp = self.client.get(reverse("stalls-filter"), {"zipcode": "94111", "food": "salm"})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK, resp.data)
+        self.assertEqual(sorted(s["id"] for s in resp.data["results"]), [self.bowl.id, self.plate.id])
+
+
+class PrefixTrieTests(SimpleTestCase):
+    def test_completes_full_text_and_word_prefixes(self):
+        trie = PrefixTrie(
+            [
+                {"type": "tag", "id": 1, "text": "Gluten-free"},
+                {"type": "tag", "id": 2, "text": "Dairy free"},
+                {"type": "allergen", "id": 1, "text": "Fish"},
+            ]
+        )
+        self.assertEqual([e["id"] for e in trie.complete("glu")], [1])
+        self.assertEqual([e["text"] for e in trie.complete("f")], ["Fish", "Dairy free", "Gluten-free"])
+        self.assertEqual([e["text"] for e in trie.complete("dairy fr")], ["Dairy free"])
+        self.assertEqual(trie.complete("x"), [])
+
+
+class StallSuggestTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username="chef6@example.com", password="x", role="seller")
+        self.seller = SellerProfile.objects.create(user=user, location="Ferry Building")
+        self.url = reverse("stalls-suggest")
+        for product in ("Salmon bowl", "Grilled salmon", "Salmon bowl", "Steak plate"):
+            Stall.objects.create(owner_profile=self.seller, product=product, location="Ferry Building")
+        Tag.objects.create(name="salad")
+        Allergen.objects.create(name="salmon")
+
+    def _texts(self, params):
+        resp = self.client.get(self.url, params)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK, resp.data)
+        return [(r["type"], r["text"]) for r in resp.data["results"]]
+
+    def test_vocabulary_reloads_when_version_expires(self):
+        # A worker whose cache never sees the bump for a label added elsewhere
+        self._texts({"prefix": "sm"})
+        Tag.objects.create(name="smoky")
+        self.assertEqual(self._texts({"prefix": "sm"}), [])
+        later = time.time() + settings.LABELS_CACHE_TTL + 1
+        with mock.patch("time.time", return_value=later):
+            self.assertEqual(self._texts({"prefix": "sm"}), [("tag", "smoky")])
+
+    def test_ranks_completions_across_sources(self):
+        self.assertEqual(
+            self._texts({"prefix": "Sal"}),
+            [
+                ("tag", "salad"),
+                ("allergen", "salmon"),
+                ("stall", "Salmon bowl"),
+                ("stall", "Grilled salmon"),
+            ],
+        )
+        self.assertEqual(self._texts({"prefix": "sal", "limit": 1}), [("tag", "salad")])
+        self.assertEqual(self._texts({"prefix": "  "}), [])
+
+    def test_label_changes_refresh_trie(self):
+        self.assertEqual(self._texts({"prefix": "vega"}), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name="vegan")
+        self.assertEqual(self._texts({"prefix": "vega"}), [("tag", "vegan")])
+
+    def test_labels_served_from_memory(self):
+        self._texts({"prefix": "s"})
+        with CaptureQueriesContext(connection) as ctx:
+            self._texts({"prefix": "sa"})
+        # Only the product lookup reaches the database
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+
+class StallLabelArrayTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username="chef7@example.com", password="x", role="seller")
+        self.seller = SellerProfile.objects.create(user=user, location="Ferry Building")
+        self.vegan = Tag.objects.create(name="vegan")
+        self.spicy = Tag.objects.create(name="Spicy")
+        self.nuts = Allergen.objects.create(name="nuts")
+        self.stall = Stall.objects.create(owner_profile=self.seller, product="Curry", location="Ferry Building")
+
+    def _arrays(self):
+        return Stall.objects.values_list("tag_ids", "allergen_ids").get(pk=self.stall.pk)
+
+    def test_arrays_follow_m2m_changes(self):
+        self.stall.tags.add(self.spicy, self.vegan)
+        self.stall.allergens.add(self.nuts)
+        self.assertEqual(self._arrays(), (sorted([self.vegan.id, self.spicy.id]), [self.nuts.id]))
+
+        self.vegan.stalls.remove(self.stall)
+        self.stall.allergens.clear()
+        self.assertEqual(self._arrays(), ([self.spicy.id], []))
+
+        self.spicy.delete()
+        self.assertEqual(self._arrays(), ([], []))
+
+    def test_save_does_not_overwrite_arrays(self):
+        self.stall.tags.add(self.vegan)
+        self.stall.quantity = 3
+        self.stall.save()
+        self.assertEqual(self._arrays(), ([self.vegan.id], []))
+
+    def test_list_filters_without_joins(self):
+        other = Stall.objects.create(owner_profile=self.seller, product="Peanut noodles", location="Ferry Building")
+        self.stall.tags.add(self.vegan, self.spicy)
+        other.tags.add(self.spicy)
+        other.allergens.add(self.nuts)
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(
+                reverse("stalls-list"), {"tags": "vegan,Spicy", "allergens_exclude": "nuts"}
+            )
+        self.assertEqual([s["id"] for s in resp.data["results"]], [self.stall.id])
+        stall_query = next(q["sql"] for q in ctx.captured_queries if 'FROM "store_app_stall"' in q["sql"])
+        self.assertNotIn("DISTINCT", stall_query)
+        self.assertNotIn("store_app_stall_tags", stall_query)
+
+        resp = self.client.get(reverse("stalls-list"), {"category": "spicy"})
+        self.assertEqual(sorted(s["id"] for s in resp.data["results"]), [self.stall.id, other.id])
+
+
+class StallFacetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username="chef8@example.com", password="x", role="seller")
+        self.seller = SellerProfile.objects.create(user=user, location="Ferry Building")
+        self.url = reverse("stalls-facets")
+        vegan, keto = Tag.objects.create(name="vegan"), Tag.objects.create(name="keto")
+        nuts = Allergen.objects.create(name="nuts")
+        for product, calories, price_level, tags, allergens in (
+            ("Tofu bowl", 450, 2, [vegan], [nuts]),
+            ("Lentil soup", 250, 1, [vegan], []),
+            ("Steak plate", 900, 4, [keto], []),
+        ):
+            stall = Stall.objects.create(
+                owner_profile=self.seller,
+                product=product,
+                location="Ferry Building",
+                calories=calories,
+                price_level=price_level,
+            )
+            stall.tags.set(tags)
+            stall.allergens.set(allergens)
+
+    def _counts(self, rows, key="name"):
+        return {row[key]: row["count"] for row in rows}
+
+    def test_counts_all_facets_in_one_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        # Vocabulary load (tags, allergens) + the aggregate
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertEqual(resp.data["total"], 3)
+        self.assertEqual(self._counts(resp.data["tags"]), {"vegan": 2, "keto": 1})
+        self.assertEqual(self._counts(resp.data["allergens"]), {"nuts": 1})
+        self.assertEqual(self._counts(resp.data["price_level"], "value"), {1: 1, 2: 1, 3: 0, 4: 1})
+        self.assertEqual(
+            self._counts(resp.data["calories"], "band"),
+            {"0-299": 1, "300-499": 1, "500-799": 0, "800+": 1},
+        )
+
+    def test_applies_list_filters(self):
+        resp = self.client.get(self.url, {"category": "Vegan", "allergens_exclude": "nuts"})
+        self.assertEqual(resp.data["total"], 1)
+        self.assertEqual(self._counts(resp.data["tags"]), {"vegan": 1, "keto": 0})
+
+    def test_cached_per_normalized_filter_set(self):
+        self.client.get(self.url, {"tags": "vegan,keto"})
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(self.url, {"tags": " keto ,vegan", "page_size": 5})
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(resp.data["total"], 3)
+
+
+class StallPaginationTests(APITestCase):
+    def setUp(self):
+        user = User.objects.create_user(username="chef3@example.com", password="x", role="seller")
+        self.seller = SellerProfile.objects.create(user=user, location="Ferry Building")
+        self.list_url = reverse("stalls-list")
+        # Pairs of equal ratings exercise the id tiebreak
+        self.stalls = [
+            Stall.objects.create(
+                owner_profile=self.seller,
+                product=f"Meal {i}",
+                location="Ferry Building",
+                latitude=FERRY_BUILDING[0] + i * 0.001,
+                longitude=FERRY_BUILDING[1],
+                radius_m=50000,
+                average_rating=float(i // 2),
+            )
+            for i in range(7)
+        ]
+
+    def _walk(self, url, params):
+        ids, pages = [], 0
+        resp = self.client.get(url, params)
+        while True:
+            self.assertEqual(resp.status_code, status.HTTP_200_OK, resp.data)
+            ids += [s["id"] for s in resp.data["results"]]
+            pages += 1
+            if not resp.data["next"]:
+                return ids, pages
+            self.assertNotIn("offset", resp.data["next"])
+            resp = self.client.get(resp.data["next"])
+
+    def test_id_pages(self):
+        ids, pages = self._walk(self.list_url, {"page_size": 3})
+        self.assertEqual(ids, [s.id for s in self.stalls])
+        self.assertEqual(pages, 3)
+
+    def test_rating_pages(self):
+        ids, _ = self._walk(self.list_url, {"page_size": 2, "sort": "rating"})
+        expected = sorted(self.stalls, key=lambda s: (s.average_rating, s.id), reverse=True)
+        self.assertEqual(ids, [s.id for s in expected])
+
+    def test_distance_pages(self):
+        params = {"page_size": 2, "sort": "distance", "lat": FERRY_BUILDING[0], "lng": FERRY_BUILDING[1], "radius": 30}
+        ids, _ = self._walk(self.list_url, params)
+        self.assertEqual(ids, [s.id for s in self.stalls])
+
+    def test_malformed_cursor_values(self):
+        for sort, position in [
+            ("id", ["x"]),
+            ("id", [{"id": 1}]),
+            ("id", [True]),
+            ("rating", [[1], 3]),
+            ("rating", [2.0, "3"]),
+            ("rating", [None, 3]),
+        ]:
+            payload = json.dumps({"s": sort, "p": position}).encode("ascii")
+            cursor = base64.urlsafe_b64encode(payload).decode("ascii")
+            resp = self.client.get(self.list_url, {"sort": sort, "cursor": cursor})
+            self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND, (sort, position))
+
+    @mock.patch("store_app.views.geocode", return_value=FERRY_BUILDING)
+    def test_filter_action_pages(self, geocode):
+        url = reverse("stalls-filter")
+        ids, pages = self._walk(url, {"zipcode": "94111", "page_size": 3})
+        self.assertEqual(ids, [s.id for s in self.stalls])
+        self.assertEqual(pages, 3)
+        ids, _ = self._walk(url, {"zipcode": "94111", "page_size": 3, "sort": "rating"})
+        self.assertEqual(ids[0], self.stalls[-1].id)
+
+    def test_seller_pages(self):
+        user = User.objects.create_user(username="chef3b@example.com", password="x", role="seller")
+        other = SellerProfile.objects.create(user=user, location="Ferry Building")
+        theirs = [
+            Stall.objects.create(owner_profile=other, product=f"Other {i}", location="Ferry Building")
+            for i in range(3)
+        ]
+
+        ids, pages = self._walk(self.list_url, {"seller": user.id, "page_size": 2})
+        self.assertEqual(ids, [s.id for s in theirs])
+        self.assertEqual(pages, 2)
+
+        self.client.force_authenticate(self.seller.user)
+        ids, _ = self._walk(self.list_url, {"seller": "me", "page_size": 3})
+        self.assertEqual(ids, [s.id for s in self.stalls])
+
+        self.client.force_authenticate(None)
+        ids, _ = self._walk(self.list_url, {"seller": "me"})
+        self.assertEqual(ids, [])
+        # An invalid seller is ignored like other malformed params
+        ids, _ = self._walk(self.list_url, {"seller": "chef", "page_size": 50})
+        self.assertEqual(len(ids), 10)
+
+    def test_distance_sort_requires_location(self):
+        resp = self.client.get(self.list_url, {"sort": "distance"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor_from_other_sort_is_rejected(self):
+        resp = self.client.get(self.list_url, {"page_size": 2})
+        resp = self.client.get(resp.data["next"] + "&sort=rating")
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class StallNutritionFilterTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username="chef9@example.com", password="x", role="seller")
+        self.seller = SellerProfile.objects.create(user=user, location="Ferry Building")
+        self.list_url = reverse("stalls-list")
+        self.salad = self._stall("Chicken salad", calories=420, protein_g=38, price_cents=1200)
+        self.pasta = self._stall("Pasta", calories=850, protein_g=22, price_cents=1400)
+        self.shake = self._stall("Protein shake", calories=300, protein_g=45, price_cents=700)
+
+    def _stall(self, product, **nutrition):
+        return Stall.objects.create(
+            owner_profile=self.seller,
+            product=product,
+            location="Ferry Building",
+            latitude=FERRY_BUILDING[0],
+            longitude=FERRY_BUILDING[1],
+            **nutrition,
+        )
+
+    def _ids(self, params, url=None):
+        resp = self.client.get(url or self.list_url, params)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK, resp.data)
+        return [s["id"] for s in resp.data["results"]]
+
+    def test_range_filters(self):
+        self.assertEqual(self._ids({"calories_max": 500}), [self.salad.id, self.shake.id])
+        self.assertEqual(self._ids({"protein_min": 30, "price_max": 1000}), [self.shake.id])
+        self.assertEqual(self._ids({"calories_min": 420, "calories_max": 420}), [self.salad.id])
+        # Invalid bounds are ignored like other malformed filters
+        self.assertEqual(len(self._ids({"fat_max": "lots"})), 3)
+        for value in ("nan", "inf", "-Infinity"):
+            self.assertEqual(len(self._ids({"calories_max": value, "price_min": value})), 3)
+
+    @mock.patch("store_app.views.geocode", return_value=FERRY_BUILDING)
+    def test_filter_action_ignores_non_finite_ranges(self, geocode):
+        ids = self._ids({"zipcode": "94111", "calories_max": "nan", "protein_min": "inf"}, reverse("stalls-filter"))
+        self.assertEqual(len(ids), 3)
+
+    def test_nutrition_sorts_page_through_keyset(self):
+        resp = self.client.get(self.list_url, {"sort": "-protein", "page_size": 2})
+        ids = [s["id"] for s in resp.data["results"]]
+        ids += [s["id"] for s in self.client.get(resp.data["next"]).data["results"]]
+        self.assertEqual(ids, [self.shake.id, self.salad.id, self.pasta.id])
+        self.assertEqual(self._ids({"sort": "price"}), [self.shake.id, self.salad.id, self.pasta.id])
+
+    @mock.patch("store_app.views.geocode", return_value=FERRY_BUILDING)
+    def test_filter_action_accepts_ranges(self, geocode):
+        ids = self._ids({"zipcode": "94111", "calories_max": 500, "sort": "-protein"}, reverse("stalls-filter"))
+        self.assertEqual(ids, [self.shake.id, self.salad.id])
+
+
+class StallScoringTests(SimpleTestCase):
+    def _columns(self, **overrides):
+        base = {field: np.zeros(2) for field in SCORE_FIELDS}
+        base.update({k: np.array(v, dtype=float) for k, v in overrides.items()})
+        return base
+
+    def test_rating_weighted_by_review_count(self):
+        columns = self._columns(average_rating=[5.0, 4.8], rating_count=[1, 200])
+        scores = score_columns(columns, weights={"rating": 1})
+        self.assertLess(scores[0], scores[1])
+
+    def test_macro_fit_and_distance(self):
+        columns = self._columns(protein_g=[40, 10], distance_m=[4000, 100])
+        by_macros = score_columns(columns, targets={"protein_g": 40}, weights={"macros": 1})
+        self.assertEqual(by_macros.tolist(), [1.0, 0.25])
+        by_distance = score_columns(columns, radius_m=5000, weights={"distance": 1})
+        self.assertGreater(by_distance[1], by_distance[0])
+        # No target given: the macro weight is dropped, not counted as a zero
+        self.assertEqual(
+            score_columns(columns, weights={"macros": 1, "price": 1}).tolist(), [1.0, 1.0]
+        )
+
+
+class StallBestSortTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username="chef10@example.com", password="x", role="seller")
+        self.seller = SellerProfile.objects.create(user=user, location="Ferry Building")
+        self.stalls = [
+            Stall.objects.create(
+                owner_profile=self.seller,
+                product=f"Meal {i}",
+                location="Ferry Building",
+                latitude=FERRY_BUILDING[0] + i * 0.002,
+                longitude=FERRY_BUILDING[1],
+                radius_m=50000,
+                average_rating=4.5,
+                rating_count=20,
+                # Pairs share a price, so scores tie and the id decides
+                price_cents=500 * (1 + i // 2),
+            )
+            for i in range(7)
+        ]
+
+    def _walk(self, url, params):
+        ids = []
+        resp = self.client.get(url, params)
+        while True:
+            self.assertEqual(resp.status_code, status.HTTP_200_OK, resp.data)
+            ids += [s["id"] for s in resp.data["results"]]
+            if not resp.data["next"]:
+                return ids, resp
+            resp = self.client.get(resp.data["next"])
+
+    def test_list_best_pages(self):
+        ids, _ = self._walk(reverse("stalls-list"), {"sort": "best", "page_size": 3})
+        # Cheapest first; equal prices put the higher id first
+        expected = sorted(self.stalls, key=lambda s: (s.price_cents, -s.id))
+        self.assertEqual(ids, [s.id for s in expected])
+
+    def test_macro_targets_reorder(self):
+        Stall.objects.filter(pk=self.stalls[-1].pk).update(protein_g=45)
+        resp = self.client.get(reverse("stalls-list"), {"sort": "best", "target_protein": 45, "page_size": 1})
+        self.assertEqual(resp.data["results"][0]["id"], self.stalls[-1].id)
+
+    def test_later_pages_reuse_first_page_scores(self):
+        with mock.patch("store_app.views.rows_to_columns", wraps=rows_to_columns) as load:
+            ids, _ = self._walk(reverse("stalls-list"), {"sort": "best", "page_size": 2})
+            self.assertEqual(len(ids), 7)
+            self.assertEqual(load.call_count, 1)
+            # A new search scores again
+            self.client.get(reverse("stalls-list"), {"sort": "best", "page_size": 2})
+            self.assertEqual(load.call_count, 2)
+
+    def test_stall_deleted_between_pages(self):
+        resp = self.client.get(reverse("stalls-list"), {"sort": "best", "page_size": 3})
+        first = [s["id"] for s in resp.data["results"]]
+        gone = next(s for s in self.stalls if s.id not in first)
+        gone.delete()
+        ids, _ = self._walk(resp.data["next"], {})
+        self.assertCountEqual(first + ids, [s.id for s in self.stalls if s.id != gone.id])
+
+    @mock.patch("store_app.views.geocode", return_value=FERRY_BUILDING)
+    def test_filter_action_best(self, geocode):
+        params = {"zipcode": "94111", "radius_m": 2000, "sort": "best", "page_size": 2}
+        with mock.patch("store_app.views.rows_to_columns", wraps=rows_to_columns) as load:
+            ids, resp = self._walk(reverse("stalls-filter"), params)
+        # Four pages, one read of the candidates
+        self.assertEqual(load.call_count, 1)
+        # Meal 6 is ~1.3 km out, so all 7 are in range; the nearest cheap meal leads
+        self.assertEqual(sorted(ids), sorted(s.id for s in self.stalls))
+        self.assertEqual(ids[0], self.stalls[0].id)
+        self.assertIsNotNone(resp.data["results"][0]["distance_m"])
+
+
+class MealPlannerTests(SimpleTestCase):
+    def test_meets_targets_cheaply(self):
+        options = [
+            (1, 900, 700, 50),
+            (2, 400, 700, 50),  # same meal, cheaper
+            (3, 500, 600, 10),
+            (4, 300, 650, 45),
+            (5, 2500, 2000, 150),  # over budget
+        ]
+        plan = plan_meals(options, calories=2000, protein_g=140, budget_cents=2000, max_meals=3)
+        self.assertEqual(sorted(plan.stall_ids), [1, 2, 4])
+        self.assertEqual(plan.price_cents, 1600)
+        self.assertTrue(plan.complete)
+
+    def test_respects_meal_count_and_budget(self):
+        options = [(i, 500, 500, 30) for i in range(1, 10)]
+        plan = plan_meals(options, calories=2000, protein_g=120, budget_cents=1200, max_meals=4)
+        self.assertEqual(len(plan.stall_ids), 2)
+        plan = plan_meals(options, calories=2000, protein_g=120, budget_cents=5000, max_meals=3)
+        self.assertEqual(len(plan.stall_ids), 3)
+
+    def test_nothing_helps(self):
+        plan = plan_meals([(1, 5000, 500, 30)], calories=2000, budget_cents=1000)
+        self.assertEqual(plan.stall_ids, [])
+        self.assertEqual(plan_meals([], protein_g=50, budget_cents=1000).stall_ids, [])
+
+
+class StallPlanTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username="chef11@example.com", password="x", role="seller")
+        self.seller = SellerProfile.objects.create(user=user, location="Ferry Building")
+        self.fish = Allergen.objects.create(name="fish")
+        self.url = reverse("stalls-plan")
+
+    def _stall(self, product, price_cents, calories, protein_g, quantity=5):
+        return Stall.objects.create(
+            owner_profile=self.seller,
+            product=product,
+            location="Ferry Building",
+            quantity=quantity,
+            price_cents=price_cents,
+            calories=calories,
+            protein_g=protein_g,
+        )
+
+    def test_plan(self):
+        salmon = self._stall("Salmon bowl", 900, 700, 50)
+        tofu = self._stall("Tofu bowl", 700, 650, 35)
+        oats = self._stall("Oats", 300, 600, 20)
+        self._stall("Sold out steak", 100, 700, 60, quantity=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            salmon.allergens.add(self.fish)
+
+        params = {"calories": 2000, "protein": 100, "budget_cents": 3000}
+        resp = self.client.get(self.url, params)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK, resp.data)
+        self.assertEqual(sorted(m["id"] for m in resp.data["meals"]), [salmon.id, tofu.id, oats.id])
+        self.assertEqual(resp.data["totals"]["price_cents"], 1900)
+        self.assertTrue(resp.data["complete"])
+
+        resp = self.client.get(self.url, {**params, "allergens_exclude": "fish"})
+        self.assertEqual(sorted(m["id"] for m in resp.data["meals"]), [tofu.id, oats.id])
+
+    def test_validation(self):
+        self.assertEqual(self.client.get(self.url, {"calories": 2000}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"budget_cents": 1000}).status_code, 400)
+        resp = self.client.get(self.url, {"calories": 2000, "budget_cents": 1000, "meals": 7})
+        self.assertEqual(resp.status_code, 400)
+
+
+class StallReviewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username="chef12@example.com", password="x", role="seller")
+        self.seller = SellerProfile.objects.create(user=user, location="Ferry Building")
+        self.stall = Stall.objects.create(owner_profile=self.seller, product="Salmon bowl", location="Ferry Building")
+        self.url = reverse("stalls-reviews", kwargs={"id": self.stall.id})
+        self.buyers = []
+        for i in range(3):
+            buyer = User.objects.create_user(username=f"eater{i}@example.com", password="x", role="buyer")
+            BuyerProfile.objects.create(user=buyer)
+            self.buyers.append(buyer)
+
+    def _review(self, buyer, rating, expected=status.HTTP_201_CREATED):
+        self.client.force_authenticate(buyer)
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(self.url, {"rating": rating, "comment": "ok"}, format="json")
+        self.assertEqual(resp.status_code, expected, resp.data)
+        return resp
+
+    def _totals(self):
+        return Stall.objects.values_list("rating_sum", "rating_count", "average_rating").get(pk=self.stall.pk)
+
+    def test_reviews_update_totals(self):
+        detail = reverse("stalls-detail", kwargs={"id": self.stall.id})
+        self.client.get(detail)  # warm the cache
+        self._review(self.buyers[0], 5)
+        self._review(self.buyers[1], 2)
+        self.assertEqual(self._totals(), (7, 2, 3.5))
+        # Posting again replaces the buyer's review
+        self._review(self.buyers[1], 4, expected=status.HTTP_200_OK)
+        self.assertEqual(self._totals(), (9, 2, 4.5))
+        self.assertEqual(Review.objects.filter(stall=self.stall).count(), 2)
+
+        resp = self.client.get(detail)
+        self.assertEqual((resp.data["average_rating"], resp.data["rating_count"]), (4.5, 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(self.url).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self._totals(), (5, 1, 5.0))
+        self.assertEqual(self.client.delete(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_stale_instances_do_not_clobber_totals(self):
+        stale = Stall.objects.get(pk=self.stall.pk)
+        self._review(self.buyers[0], 4)
+        self._review(self.buyers[1], 3)
+        # A seller edit loaded before the reviews must not write old totals back
+        stale.product = "Tuna bowl"
+        stale.save()
+        self.assertEqual(self._totals(), (7, 2, 3.5))
+
+    def test_validation_and_permissions(self):
+        self.client.force_authenticate(self.buyers[0])
+        self.assertEqual(self.client.post(self.url, {"rating": 6}, format="json").status_code, 400)
+        self.client.force_authenticate(self.seller.user)
+        self.assertEqual(self.client.post(self.url, {"rating": 5}, format="json").status_code, 403)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.post(self.url, {"rating": 5}, format="json").status_code, 401)
+
+    def test_list_newest_first(self):
+        for buyer, rating in zip(self.buyers, (3, 4, 5)):
+            self._review(buyer, rating)
+        self.client.force_authenticate(None)
+        resp = self.client.get(self.url, {"page_size": 2})
+        self.assertEqual([r["rating"] for r in resp.data["results"]], [5, 4])
+        resp = self.client.get(resp.data["next"])
+        self.assertEqual([r["rating"] for r in resp.data["results"]], [3])
+        self.assertIsNone(resp.data["next"])
+
+    def test_reconcile_ratings(self):
+        self._review(self.buyers[0], 4)
+        other = Stall.objects.create(owner_profile=self.seller, product="Tofu", location="Ferry Building")
+        # Drift: totals written around store_app.reviews
+        Stall.objects.filter(pk=self.stall.pk).update(rating_sum=40, rating_count=9, average_rating=4.4)
+        Stall.objects.filter(pk=other.pk).update(rating_sum=3, rating_count=1, average_rating=3.0)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("reconcile_ratings", batch_size=1, stdout=mock.MagicMock())
+        self.assertEqual(self._totals(), (4, 1, 4.0))
+        self.assertEqual(
+            Stall.objects.values_list("rating_sum", "rating_count", "average_rating").get(pk=other.pk),
+            (0, 0, 0.0),
+        )
+
+
+class StallImportTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="chef13@example.com", password="x", role="seller")
+        self.seller = SellerProfile.objects.create(
+            user=self.user, location="Ferry Building", latitude=FERRY_BUILDING[0], longitude=FERRY_BUILDING[1]
+        )
+        self.vegan = Tag.objects.create(name="vegan")
+        self.url = reverse("stalls-bulk-import")
+        self.client.force_authenticate(self.user)
+
+    def _upload(self, name, content):
+        upload = SimpleUploadedFile(name, content.encode())
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(self.url, {"file": upload}, format="multipart")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK, resp.data)
+        return resp.data
+
+    def _csv(self, rows):
+        header = "sku,product,price_cents,calories,tag_names,allergen_names\n"
+        return header + "".join(f"{','.join(map(str, row))}\n" for row in rows)
+
+    def test_csv_upsert(self):
+        data = self._upload("menu.csv", self._csv([
+            ("A1", "Salmon bowl", 1200, 650, "keto;vegan", "fish"),
+            ("A2", "Tofu bowl", 900, 500, "vegan", ""),
+            ("A3", "", "x", 0, "", ""),
+        ]))
+        self.assertEqual((data["created"], data["updated"]), (2, 0))
+        self.assertEqual([e["row"] for e in data["errors"]], [3])
+        self.assertEqual(set(data["errors"][0]["errors"]), {"product", "price_cents"})
+
+        salmon = Stall.objects.get(owner_profile=self.seller, sku="A1")
+        keto = Tag.objects.get(name="keto")
+        self.assertEqual(sorted(salmon.tag_ids), sorted([self.vegan.id, keto.id]))
+        self.assertEqual([a.name for a in salmon.allergens.all()], ["fish"])
+        self.assertEqual(salmon.location, "Ferry Building")
+        self.assertEqual(salmon.geohash, geohash_encode(*FERRY_BUILDING))
+        self.assertEqual(list(Stall.objects.search("salmon").values_list("sku", flat=True)), ["A1"])
+
+        # Re-importing updates in place and replaces labels
+        data = self._upload("menu.csv", self._csv([("A1", "Salmon poke", 1300, 700, "", "")]))
+        self.assertEqual((data["created"], data["updated"], data["errors"]), (0, 1, []))
+        salmon = Stall.objects.get(pk=salmon.pk)
+        self.assertEqual((salmon.product, salmon.price_cents, salmon.tag_ids), ("Salmon poke", 1300, []))
+        self.assertEqual(Stall.objects.filter(owner_profile=self.seller).count(), 2)
+
+    def test_queries_do_not_grow_with_rows(self):
+        def count(n, offset):
+            rows = [(f"S{offset + i}", f"Meal {i}", 500, 400, f"vegan;t{i}", "nuts") for i in range(n)]
+            with CaptureQueriesContext(connection) as ctx:
+                self._upload("menu.csv", self._csv(rows))
+            return len(ctx.captured_queries)
+
+        self.assertEqual(count(3, 0), count(30, 100))
+
+    def test_ndjson_and_duplicate_skus(self):
+        lines = [
+            {"sku": "N1", "product": "Oats", "tag_names": ["vegan"]},
+            "not json",
+            {"sku": "N1", "product": "Overnight oats"},
+        ]
+        content = "\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+        data = self._upload("menu.ndjson", content)
+        self.assertEqual(data["created"], 1)
+        self.assertEqual([e["row"] for e in data["errors"]], [2, 1])
+        self.assertEqual(Stall.objects.get(sku="N1").product, "Overnight oats")
+
+    def test_requires_seller_and_known_format(self):
+        upload = SimpleUploadedFile("menu.txt", b"sku,product\n")
+        self.assertEqual(self.client.post(self.url, {"file": upload}, format="multipart").status_code, 400)
+        buyer = User.objects.create_user(username="eater13@example.com", password="x", role="buyer")
+        self.client.force_authenticate(buyer)
+        upload = SimpleUploadedFile("menu.csv", b"sku,product\n")
+        self.assertEqual(self.client.post(self.url, {"file": upload}, format="multipart").status_code, 403)
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            f.write(json.dumps({"sku": "C1", "product": "Curry", "allergen_names": ["nuts"]}) + "\n")
+        self.addCleanup(os.unlink, f.name)
+        out = io.StringIO()
+        call_command("import_stalls", f.name, seller="chef13@example.com", stdout=out)
+        self.assertIn("1 created", out.getvalue())
+        self.assertEqual(Stall.objects.get(sku="C1").allergen_ids, [Allergen.objects.get(name="nuts").id])
+        # Servers do not see this process's cache bumps
+        self.assertIn("STALL_CACHE_TTL", out.getvalue())
+
+
+class StallBulkUpdateTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="chef14@example.com", password="x", role="seller")
+        self.seller = SellerProfile.objects.create(user=self.user, location="Ferry Building")
+        other = User.objects.create_user(username="chef15@example.com", password="x", role="seller")
+        self.other_seller = SellerProfile.objects.create(user=other, location="Ferry Building")
+        self.vegan = Tag.objects.create(name="vegan")
+        self.mine = [
+            Stall.objects.create(
+                owner_profile=self.seller, product=f"Meal {i}", location="Ferry Building",
+                price_cents=1000 + i * 100, quantity=5,
+            )
+            for i in range(3)
+        ]
+        self.theirs = Stall.objects.create(
+            owner_profile=self.other_seller, product="Other", location="Ferry Building", price_cents=1000, quantity=5
+        )
+        self.mine[0].tags.add(self.vegan)
+        self.theirs.tags.add(self.vegan)
+        self.url = reverse("stalls-bulk-update")
+        self.client.force_authenticate(self.user)
+
+    def _post(self, body, expected=status.HTTP_200_OK):
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(self.url, body, format="json")
+        self.assertEqual(resp.status_code, expected, resp.data)
+        return resp.data
+
+    def _values(self, field):
+        return list(Stall.objects.order_by("id").values_list(field, flat=True))
+
+    def test_ids_with_relative_price(self):
+        detail = reverse("stalls-detail", kwargs={"id": self.mine[1].id})
+        self.client.get(detail)  # warm the cache
+        ids = [self.mine[1].id, self.mine[2].id, self.theirs.id]
+        with self.assertNumQueries(4):  # savepoint, lock, update, release
+            data = self._post({"ids": ids, "patch": {"price_percent": 10, "quantity_delta": -7}})
+        self.assertEqual(data, {"ids": [self.mine[1].id, self.mine[2].id], "count": 2})
+        self.assertEqual(self._values("price_cents"), [1000, 1210, 1320, 1000])
+        self.assertEqual(self._values("quantity"), [5, 0, 0, 5])
+        self.assertEqual(self.client.get(detail).data["price_cents"], 1210)
+
+    def test_filter_with_absolute_values(self):
+        data = self._post(
+            {"filter": {"tags": ["vegan"]}, "patch": {"price_cents": 800, "special_requests_allowed": False}}
+        )
+        self.assertEqual(data["ids"], [self.mine[0].id])
+        self.assertEqual(self._values("price_cents"), [800, 1100, 1200, 1000])
+        self.assertEqual(self._values("special_requests_allowed"), [False, True, True, True])
+        data = self._post({"filter": {}, "patch": {"price_delta_cents": -5000}})
+        self.assertEqual(data["count"], 3)
+        self.assertEqual(self._values("price_cents"), [0, 0, 0, 1000])
+
+    def test_validation(self):
+        self._post({"ids": [self.mine[0].id], "patch": {"price_cents": 1, "price_percent": 5}}, 400)
+        self._post({"ids": [self.mine[0].id], "patch": {}}, 400)
+        self._post({"patch": {"quantity": 1}}, 400)
+        self._post({"ids": "all", "patch": {"quantity": 1}}, 400)
+        buyer = User.objects.create_user(username="eater14@example.com", password="x", role="buyer")
+        self.client.force_authenticate(buyer)
+        self._post({"ids": [self.mine[0].id], "patch": {"quantity": 1}}, 403)
+
+
+def _png(width, height):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 80, 40)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class ImageVariantTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name, IMAGE_VARIANTS_INLINE=True)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.media_root = media.name
+        user = User.objects.create_user(username="chef16@example.com", password="x", role="seller")
+        self.seller = SellerProfile.objects.create(user=user, location="Ferry Building")
+
+    def test_variants_rendered_after_upload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            stall = Stall.objects.create(owner_profile=self.seller, product="Salmon bowl", location="Ferry Building")
+            stall.image.save("bowl.png", ContentFile(_png(800, 600)))
+            StallImage.objects.create(stall=stall, image=ContentFile(_png(100, 50), name="side.png"))
+        stall.refresh_from_db()
+        self.assertEqual(stall.image_variants["source"], stall.image.name)
+        self.assertEqual(sorted(stall.image_variants["sizes"], key=int), ["160", "320", "640"])
+        webp = stall.image_variants["sizes"]["320"]["webp"]
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, webp)))
+
+        data = self.client.get(reverse("stalls-detail", kwargs={"id": stall.id})).data
+        self.assertEqual(set(data["image_variants"]), {"jpeg", "webp"})
+        self.assertEqual(list(data["image_variants"]["webp"]), ["160w", "320w", "640w"])
+        self.assertTrue(data["image_variants"]["webp"]["320w"].endswith(".webp"))
+        # Smaller than every width: one rendition at its own size
+        self.assertEqual(list(data["images"][0]["variants"]["webp"]), ["100w"])
+
+    def test_stale_variants_are_hidden(self):
+        stall = Stall.objects.create(
+            owner_profile=self.seller, product="Tofu", location="Ferry Building",
+            image_variants={"source": "stalls/main/old.png", "sizes": {"160": {"webp": "x.webp"}}},
+        )
+        self.assertIsNone(StallSerializer(stall).data["image_variants"])
+
+    def test_backfill_command(self):
+        stall = Stall.objects.create(owner_profile=self.seller, product="Oats", location="Ferry Building")
+        # Written around the signals, as media from before the pipeline existed
+        StallImage.objects.bulk_create(
+            [StallImage(stall=stall, image=default_storage.save("stalls/images/oats.png", ContentFile(_png(400, 300))))]
+        )
+        out = io.StringIO()
+        with mock.patch(
+            "store_app.management.commands.build_image_variants.get_pool",
+            return_value=ThreadPoolExecutor(max_workers=1),
+        ):
+            call_command("build_image_variants", stdout=out)
+        self.assertIn("Rendered variants for 1 images", out.getvalue())
+        image = StallImage.objects.get(stall=stall)
+        self.assertEqual(sorted(image.variants["sizes"], key=int), ["160", "320"])
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.media_root = media.name
+        user = User.objects.create_user(username="chef17@example.com", password="x", role="seller")
+        self.seller = SellerProfile.objects.create(user=user, location="Ferry Building")
+        self.stall = Stall.objects.create(owner_profile=self.seller, product="Ramen", location="Ferry Building")
+
+    def _refs(self, name):
+        return MediaBlob.objects.get(name=name).ref_count
+
+    def _upload(self, name, width):
+        return SimpleUploadedFile(name, _png(width, 10), content_type="image/png")
+
+    def _sync(self, *files):
+        serializer = StallWriteSerializer(self.stall, data={"images": list(files)}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return list(self.stall.images.order_by("position"))
+
+    def test_same_bytes_stored_once(self):
+        first = StallImage.objects.create(stall=self.stall, image=ContentFile(_png(30, 10), name="a.png"))
+        second = StallImage.objects.create(stall=self.stall, image=ContentFile(_png(30, 10), name="b.png"))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith("blobs/"))
+        self.assertEqual(self._refs(first.image.name), 2)
+        files = [f for _, _, names in os.walk(os.path.join(self.media_root, "blobs")) for f in names]
+        self.assertEqual(len(files), 1)
+
+    def test_references_follow_replace_and_delete(self):
+        self.stall.image.save("a.png", ContentFile(_png(30, 10)))
+        old = self.stall.image.name
+        self.stall.image.save("b.png", ContentFile(_png(40, 10)))
+        self.assertEqual(self._refs(old), 0)
+        self.assertEqual(self._refs(self.stall.image.name), 1)
+        new = self.stall.image.name
+        Stall.objects.get(pk=self.stall.pk).delete()
+        self.assertEqual(self._refs(new), 0)
+
+    def test_sync_keeps_unchanged_photos(self):
+        before = self._sync(self._upload("a.png", 30), self._upload("b.png", 40))
+        after = self._sync(self._upload("b-again.png", 40), self._upload("c.png", 50))
+        # The kept photo is the same row, moved to the front; only c.png is new
+        self.assertEqual(after[0].pk, before[1].pk)
+        self.assertEqual((after[0].position, after[0].is_primary), (0, True))
+        self.assertEqual((after[1].position, after[1].is_primary), (1, False))
+        self.assertFalse(StallImage.objects.filter(pk=before[0].pk).exists())
+        self.assertEqual(self._refs(before[0].image.name), 0)
+        self.assertEqual(self._refs(after[1].image.name), 1)
+
+    def test_collect_media_removes_unreferenced_blobs(self):
+        image = StallImage.objects.create(stall=self.stall, image=ContentFile(_png(30, 10), name="a.png"))
+        kept = StallImage.objects.create(stall=self.stall, image=ContentFile(_png(40, 10), name="b.png"))
+        name = image.image.name
+        image.delete()
+        path = os.path.join(self.media_root, name)
+
+        call_command("collect_media", stdout=io.StringIO())
+        self.assertTrue(os.path.exists(path))  # inside the grace period
+
+        out = io.StringIO()
+        call_command("collect_media", "--grace-hours", "0", stdout=out)
+        self.assertIn("Deleted 1 unreferenced blobs", out.getvalue())
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, kept.image.name)))
+
+    def test_recount(self):
+        image = StallImage.objects.create(stall=self.stall, image=ContentFile(_png(30, 10), name="a.png"))
+        MediaBlob.objects.filter(name=image.image.name).update(ref_count=7)
+        call_command("collect_media", "--recount", "--dry-run", stdout=io.StringIO())
+        self.assertEqual(self._refs(image.image.name), 1)
+
+
+class ImageUploadTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name, IMAGE_UPLOAD_TEMP_DIR=os.path.join(media.name, "partial"))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user(username="chef18@example.com", password="x", role="seller")
+        self.seller = SellerProfile.objects.create(user=self.user, location="Ferry Building")
+        self.stall = Stall.objects.create(owner_profile=self.seller, product="Pho", location="Ferry Building")
+        self.photo = _png(300, 200)
+        self.client.force_authenticate(self.user)
+
+    def _open(self, data=None, sha256=None):
+        data = self.photo if data is None else data
+        resp = self.client.post(
+            reverse("uploads-list"),
+            {"filename": "pho.png", "size": len(data), "sha256": sha256 or hashlib.sha256(data).hexdigest()},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED, resp.data)
+        return resp.data["id"]
+
+    def _put(self, upload_id, start, chunk, total=None):
+        return self.client.put(
+            reverse("uploads-detail", kwargs={"pk": upload_id}),
+            chunk,
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {start}-{start + len(chunk) - 1}/{total or len(self.photo)}",
+        )
+
+    def _complete(self, upload_id):
+        return self.client.post(reverse("uploads-complete", kwargs={"pk": upload_id}))
+
+    def test_chunks_then_attach_to_stall_and_profile(self):
+        upload_id = self._open()
+        half = len(self.photo) // 2
+        self.assertEqual(self._put(upload_id, 0, self.photo[:half]).data["offset"], half)
+        self.assertEqual(self._put(upload_id, half, self.photo[half:]).data["offset"], len(self.photo))
+        resp = self._complete(upload_id)
+        self.assertTrue(resp.data["complete"])
+        upload = ImageUpload.objects.get(pk=upload_id)
+        self.assertFalse(os.path.exists(partial_path(upload)))
+
+        resp = self.client.patch(
+            reverse("stalls-detail", kwargs={"id": self.stall.id}),
+            {"image_upload": upload_id, "image_uploads": [upload_id]},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK, resp.data)
+        self.stall.refresh_from_db()
+        self.assertEqual(self.stall.image.name, upload.name)
+        self.assertEqual([image.image.name for image in self.stall.images.all()], [upload.name])
+        self.assertEqual(MediaBlob.objects.get(name=upload.name).ref_count, 2)
+        with self.stall.image.open("rb") as stored:
+            self.assertEqual(stored.read(), self.photo)
+
+        resp = self.client.patch(reverse("me-seller-profile"), {"image_upload": upload_id}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK, resp.data)
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.image.name, upload.name)
+
+    def test_resume_from_reported_offset(self):
+        upload_id = self._open()
+        self._put(upload_id, 0, self.photo[:100])
+        resp = self._put(upload_id, 200, self.photo[200:])
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(resp.data["offset"], 100)
+        offset = self.client.get(reverse("uploads-detail", kwargs={"pk": upload_id})).data["offset"]
+        self._put(upload_id, offset, self.photo[offset:])
+        self.assertEqual(self._complete(upload_id).status_code, status.HTTP_200_OK)
+
+    def test_interrupted_chunk_keeps_received_bytes(self):
+        upload = ImageUpload.objects.get(pk=self._open())
+        with self.assertRaises(UploadError):
+            # The client promised 200 bytes but went away after 120
+            write_chunk(upload, io.BytesIO(self.photo[:120]), 0, 200)
+        self.assertEqual(ImageUpload.objects.get(pk=upload.pk).offset, 120)
+
+    def test_checksum_mismatch_restarts_session(self):
+        upload_id = self._open(sha256="0" * 64)
+        self._put(upload_id, 0, self.photo)
+        resp = self._complete(upload_id)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("checksum", resp.data["detail"])
+        self.assertEqual(ImageUpload.objects.get(pk=upload_id).offset, 0)
+
+    def test_incomplete_or_foreign_upload_cannot_be_attached(self):
+        upload_id = self._open()
+        self._put(upload_id, 0, self.photo[:50])
+        self.assertEqual(self._complete(upload_id).status_code, status.HTTP_400_BAD_REQUEST)
+        url = reverse("stalls-detail", kwargs={"id": self.stall.id})
+        resp = self.client.patch(url, {"image_uploads": [upload_id]}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self._put(upload_id, 50, self.photo[50:])
+        self._complete(upload_id)
+        other = User.objects.create_user(username="chef19@example.com", password="x", role="seller")
+        self.client.force_authenticate(other)
+        self.assertEqual(
+            self.client.get(reverse("uploads-detail", kwargs={"pk": upload_id})).status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+
+
+class MediaServingTests(SimpleTestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name, MEDIA_SENDFILE=None)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.data = bytes(range(256)) * 4
+        self.blob = f"blobs/ab/cd/{'abcd' * 16}.png"
+        for name in (self.blob, "stalls/legacy.png", "blobs/.upload-x"):
+            os.makedirs(os.path.join(media.name, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(media.name, name), "wb") as out:
+                out.write(self.data)
+
+    def _body(self, resp):
+        return b"".join(resp.streaming_content)
+
+    def test_full_file_with_cache_headers(self):
+        resp = self.client.get(f"/media/{self.blob}")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self._body(resp), self.data)
+        self.assertEqual(resp["Content-Type"], "image/png")
+        self.assertIn("immutable", resp["Cache-Control"])
+        self.assertEqual(resp["ETag"], f'"{"abcd" * 16}"')
+        self.assertNotIn("immutable", self.client.get("/media/stalls/legacy.png")["Cache-Control"])
+
+    def test_conditional_requests(self):
+        first = self.client.get(f"/media/{self.blob}")
+        resp = self.client.get(f"/media/{self.blob}", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(resp.status_code, 304)
+        resp = self.client.get("/media/stalls/legacy.png", HTTP_IF_NONE_MATCH=self.client.get("/media/stalls/legacy.png")["ETag"])
+        self.assertEqual(resp.status_code, 304)
+
+    def test_ranges(self):
+        resp = self.client.get(f"/media/{self.blob}", HTTP_RANGE="bytes=10-19")
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(resp["Content-Range"], f"bytes 10-19/{len(self.data)}")
+        self.assertEqual(self._body(resp), self.data[10:20])
+        resp = self.client.get(f"/media/{self.blob}", HTTP_RANGE="bytes=-16")
+        self.assertEqual(self._body(resp), self.data[-16:])
+        resp = self.client.get(f"/media/{self.blob}", HTTP_RANGE=f"bytes={len(self.data)}-")
+        self.assertEqual(resp.status_code, 416)
+        # A stale If-Range gets the whole file
+        resp = self.client.get(f"/media/{self.blob}", HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"other"')
+        self.assertEqual(resp.status_code, 200)
+
+    def test_proxy_handoff(self):
+        with override_settings(MEDIA_SENDFILE="x-accel-redirect", MEDIA_ACCEL_PREFIX="/protected-media/"):
+            resp = self.client.get(f"/media/{self.blob}")
+        self.assertEqual(resp["X-Accel-Redirect"], f"/protected-media/{self.blob}")
+        self.assertEqual(resp.content, b"")
+        with override_settings(MEDIA_SENDFILE="x-sendfile"):
+            resp = self.client.get(f"/media/{self.blob}")
+        self.assertTrue(resp["X-Sendfile"].endswith(self.blob))
+
+    def test_hidden_and_outside_paths(self):
+        self.assertEqual(self.client.get("/media/blobs/.upload-x").status_code, 404)
+        self.assertEqual(self.client.get("/media/../manage.py").status_code, 404)
+        self.assertEqual(self.client.get("/media/blobs/").status_code, 404)
+
+
+class StallQueryCountTests(APITestCase):
+    """List/detail/filter must cost the same number of queries for any result size."""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username="chef4@example.com", password="x", role="seller")
+        self.seller = SellerProfile.objects.create(user=user, location="Ferry Building")
+        self.buyer = User.objects.create_user(username="buyer4@example.com", password="x", role="buyer")
+        BuyerProfile.objects.create(user=self.buyer)
+        self.vegan = Tag.objects.create(name="vegan")
+        self.fish = Allergen.objects.create(name="fish")
+
+    def _make_stalls(self, n):
+        for i in range(n):
+            stall = Stall.objects.create(
+                owner_profile=self.seller,
+                product=f"Meal {i}",
+                location="Ferry Building",
+                latitude=FERRY_BUILDING[0],
+                longitude=FERRY_BUILDING[1],
+                radius_m=50000,
+            )
+            stall.tags.add(self.vegan)
+            stall.allergens.add(self.fish)
+            StallImage.objects.create(stall=stall, position=0, is_primary=True)
+        return stall
+
+    def _count(self, url, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url, params or {})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries)
+
+    def _assert_flat(self, url, params=None, expected=None):
+        self._make_stalls(2)
+        small = self._count(url, params)
+        self._make_stalls(15)
+        self.assertEqual(self._count(url, params), small)
+        if expected is not None:
+            self.assertEqual(small, expected)
+
+    def test_list(self):
+        # stalls+owner+user, tags, allergens, images
+        self._assert_flat(reverse("stalls-list"), expected=4)
+
+    def test_list_as_buyer(self):
+        url = reverse("stalls-list")
+        counts = []
+        for n in (2, 15):
+            self._make_stalls(n)
+            # Fresh user object so the buyer profile is not already cached on it
+            self.client.force_authenticate(User.objects.get(pk=self.buyer.pk))
+            counts.append(self._count(url))
+        # ... plus one buyer_profile lookup for is_favorited
+        self.assertEqual(counts, [5, 5])
+
+    def test_detail(self):
+        stall = self._make_stalls(1)
+        url = reverse("stalls-detail", kwargs={"id": stall.id})
+        # ETag validators, then stall+owner+user, tags, allergens, images
+        with self.assertNumQueries(5):
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        # Warm: validators and the object lookup only
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url).data, resp.data)
+
+    def test_warm_list_is_one_query(self):
+        url = reverse("stalls-list")
+        self._make_stalls(5)
+        cold = self.client.get(url).data
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).data, cold)
+
+    @mock.patch("store_app.views.geocode", return_value=FERRY_BUILDING)
+    def test_filter(self, geocode):
+        # candidate ids/coords, then the page's stalls+owner+user, tags, allergens, images
+        self._assert_flat(reverse("stalls-filter"), {"zipcode": "94111"}, expected=5)
+
+
+class StallCacheInvalidationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username="chef5@example.com", password="x", role="seller", first_name="Ann")
+        self.seller = SellerProfile.objects.create(user=user, location="Ferry Building")
+        self.stall = Stall.objects.create(owner_profile=self.seller, product="Salmon bowl", location="Ferry Building")
+        self.url = reverse("stalls-detail", kwargs={"id": self.stall.id})
+        self.client.get(self.url)  # warm the cache
+
+    def _get(self):
+        return self.client.get(self.url).data
+
+    def test_stall_save(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stall.product = "Tuna bowl"
+            self.stall.save()
+        self.assertEqual(self._get()["product"], "Tuna bowl")
+
+    def test_tags_and_allergens(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stall.tags.add(Tag.objects.create(name="vegan"))
+        self.assertEqual([t["name"] for t in self._get()["tags"]], ["vegan"])
+        with self.captureOnCommitCallbacks(execute=True):
+            Allergen.objects.create(name="fish").stalls.add(self.stall)
+        self.assertEqual([a["name"] for a in self._get()["allergens"]], ["fish"])
+        with self.captureOnCommitCallbacks(execute=True):
+            tag = Tag.objects.get(name="vegan")
+            tag.name = "plant-based"
+            tag.save()
+        self.assertEqual([t["name"] for t in self._get()["tags"]], ["plant-based"])
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.stalls.clear()
+        self.assertEqual(self._get()["tags"], [])
+
+    def test_images(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = StallImage.objects.create(stall=self.stall, alt_text="front")
+        self.assertEqual([i["alt_text"] for i in self._get()["images"]], ["front"])
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        self.assertEqual(self._get()["images"], [])
+
+    def test_seller_name(self):
+        user = self.seller.user
+        with self.captureOnCommitCallbacks(execute=True):
+            user.first_name = "Bea"
+            user.save()
+        self.assertEqual(self._get()["seller"]["first_name"], "Bea")
+
+    def test_is_favorited_is_per_request(self):
+        buyer = User.objects.create_user(username="fan@example.com", password="x", role="buyer")
+        BuyerProfile.objects.create(user=buyer, favorite_stall=self.stall)
+        self.client.force_authenticate(buyer)
+        self.assertTrue(self._get()["is_favorited"])
+        self.client.force_authenticate(None)
+        self.assertFalse(self._get()["is_favorited"])
+
+
+class FileCacheBackendTests(StallQueryCountTests):
+    """The same cache behaviour on the file-based backend (no external services)."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": tmp.name,
+                }
+            }
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        super().setUp()
+
+
+class StallConditionalGetTests(APITestCase):
+    def setUp(self):
+        user = User.objects.create_user(username="chef6@example.com", password="x", role="seller")
+        self.seller = SellerProfile.objects.create(user=user, location="Ferry Building")
+        self.stall = Stall.objects.create(owner_profile=self.seller, product="Salmon bowl", location="Ferry Building")
+        self.url = reverse("stalls-detail", kwargs={"id": self.stall.id})
+
+    def test_etag_round_trip(self):
+        resp = self.client.get(self.url)
+        etag = resp["ETag"]
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn("Last-Modified", resp)
+
+        with self.assertNumQueries(1):
+            resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(resp["ETag"], etag)
+
+    def test_etag_changes_with_related_rows(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.stall.tags.add(Tag.objects.create(name="vegan"))
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(resp["ETag"], etag)
+
+    def test_etag_varies_with_favorite(self):
+        anon_etag = self.client.get(self.url)["ETag"]
+        buyer = User.objects.create_user(username="fan6@example.com", password="x", role="buyer")
+        BuyerProfile.objects.create(user=buyer, favorite_stall=self.stall)
+        self.client.force_authenticate(buyer)
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=anon_etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertTrue(resp.data["is_favorited"])
+
+    def test_missing_stall_is_404(self):
+        resp = self.client.get(reverse("stalls-detail", kwargs={"id": 0}))
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProfileConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="chef7@example.com", password="x", role="seller")
+        self.profile = SellerProfile.objects.create(user=self.user, location="Ferry Building")
+        self.client.force_authenticate(self.user)
+        self.url = reverse("sellers-detail", kwargs={"pk": self.profile.pk})
+
+    def test_not_modified_until_user_changes(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.user.first_name = "Ann"
+        self.user.save()
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["user"]["first_name"], "Ann")
@@ -0,0 +1,172 @@
+"""
+Chunked, resumable photo uploads (`/api/uploads/`).
+
+A client opens a session with the file's name, size and SHA-256, then sends
+the bytes in any number of `PUT`s, each carrying a `Content-Range`. Chunks
+are streamed from the request straight into a partial file on disk, so
+memory use does not grow with the photo. After a dropped connection, the
+client reads the session's `offset` and carries on from there.
+
+Completing a session checks the size and checksum and verifies the image
+headers, then moves the file into content-addressed storage (see
+store_app.storage) without copying it. The resulting upload id can be given
+as `image_upload`/`image_uploads` when writing a stall or seller profile.
+Sessions left untouched are dropped by `manage.py collect_media`.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Now
+
+from .models import ImageUpload
+from .storage import HASH_CHUNK, get_image_storage
+
+STREAM_CHUNK = 64 * 1024
+DEFAULT_MAX_BYTES = 25 * 1024 * 1024
+CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+
+class UploadError(Exception):
+    """A chunk or completion request the session cannot accept."""
+
+
+class UploadConflict(UploadError):
+    """The chunk does not start at the session's offset."""
+
+    def __init__(self, offset):
+        super().__init__(f"Expected a chunk starting at byte {offset}.")
+        self.offset = offset
+
+
+def max_upload_bytes():
+    return getattr(settings, "IMAGE_UPLOAD_MAX_BYTES", DEFAULT_MAX_BYTES)
+
+
+def partial_path(upload):
+    directory = getattr(settings, "IMAGE_UPLOAD_TEMP_DIR", None) or os.path.join(
+        tempfile.gettempdir(), "image-uploads"
+    )
+    return os.path.join(str(directory), f"{upload.pk}.part")
+
+
+def parse_content_range(header):
+    """`"bytes 0-1023/5000"` -> `(0, 1024, 5000)` (start, length, total), or None."""
+    match = CONTENT_RANGE.match((header or "").strip())
+    if not match:
+        return None
+    first, last, total = (int(group) for group in match.groups())
+    if last < first:
+        return None
+    return first, last - first + 1, total
+
+
+def write_chunk(upload, stream, start, length):
+    """
+    Append `length` bytes read from `stream` at byte `start` of `upload`.
+
+    Whatever arrives before a dropped connection is kept and counted, so the
+    client can resume from the new `upload.offset`.
+    """
+    if upload.complete:
+        raise UploadError("This upload is already complete.")
+    if start != upload.offset:
+        raise UploadConflict(upload.offset)
+    if start + length > upload.size:
+        raise UploadError(f"The chunk runs past the declared size of {upload.size} bytes.")
+
+    path = partial_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written, failure = 0, None
+    with open(path, "r+b" if os.path.exists(path) else "wb") as out:
+        out.seek(start)
+        try:
+            while written < length:
+                data = stream.read(min(STREAM_CHUNK, length - written))
+                if not data:
+                    break
+                out.write(data)
+                written += len(data)
+        except OSError as exc:
+            # Includes UnreadablePostError when the client goes away
+            failure = exc
+
+    if written:
+        # Conditional, so of two concurrent writers at one offset only one counts
+        moved = ImageUpload.objects.filter(pk=upload.pk, offset=start).update(
+            offset=start + written, updated_at=Now()
+        )
+        if not moved:
+            upload.refresh_from_db(fields=["offset"])
+            raise UploadConflict(upload.offset)
+        upload.offset = start + written
+    if written < length:
+        reason = f": {failure}" if failure else ""
+        raise UploadError(
+            f"The chunk ended after {written} of {length} bytes{reason}. Resume at byte {upload.offset}."
+        )
+    return upload
+
+
+def _file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(HASH_CHUNK), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _verify_image(path):
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(path) as image:
+            # Structure only; pixels are decoded later, off the request, for variants
+            image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError) as exc:
+        raise UploadError("The upload is not a valid image.") from exc
+
+
+def finish_upload(upload_id):
+    """Check and store a fully received upload; returns the finished `ImageUpload`."""
+    with transaction.atomic():
+        # Locked, so a repeated completion request waits for the first one
+        upload = ImageUpload.objects.select_for_update().get(pk=upload_id)
+        if upload.complete:
+            return upload
+        if upload.offset != upload.size:
+            raise UploadError(f"Only {upload.offset} of {upload.size} bytes have been received.")
+        path = partial_path(upload)
+        digest = _file_digest(path)
+        if digest == upload.sha256:
+            _verify_image(path)
+            upload.name = get_image_storage().adopt(path, digest, upload.filename)
+            upload.save(update_fields=["name", "updated_at"])
+            return upload
+        # The bytes cannot be trusted; start the session over
+        os.unlink(path)
+        ImageUpload.objects.filter(pk=upload.pk).update(offset=0, updated_at=Now())
+    raise UploadError("The checksum does not match the uploaded bytes; upload the file again.")
+
+
+def discard_upload(upload):
+    """Delete a session and its partial file."""
+    path = partial_path(upload)
+    if os.path.exists(path):
+        os.unlink(path)
+    upload.delete()
+
+
+def expire_uploads(cutoff, dry_run=False):
+    """Drop sessions last touched before `cutoff`; returns how many."""
+    expired = ImageUpload.objects.filter(updated_at__lt=cutoff)
+    if dry_run:
+        return expired.count()
+    count = 0
+    for upload in expired.iterator():
+        discard_upload(upload)
+        count += 1
+    return count
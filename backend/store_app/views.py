@@ -1,32 +1,54 @@
-from rest_framework import viewsets, status
+import csv
+import io
+
+import numpy as np
+from django.db import transaction
+from django.db.models.functions import Now
+from rest_framework import mixins, viewsets, status
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
-from typing import Optional, Tuple
 
-from .models import Stall, SpecialRequest, Tag, Allergen
+from .models import ImageUpload, Review, Stall, SpecialRequest, Tag, Allergen
 from .serializers import (
+    ImageUploadSerializer,
+    ReviewSerializer,
+    StallBulkPatchSerializer,
     StallSerializer,
     StallWriteSerializer,
     SpecialRequestSerializer,
 )
 from .permissions import IsSellerOrReadOnly
-
-# Geo helpers
-try:
-    from geopy.geocoders import Nominatim
-    from geopy.distance import geodesic
-except Exception:  # Allow import even if geopy not yet installed
-    Nominatim = None
-    geodesic = None
+from .pagination import KeysetPagination, ReviewPagination
+from .reviews import delete_review, submit_review
+from .uploads import (
+    UploadConflict,
+    UploadError,
+    discard_upload,
+    finish_upload,
+    parse_content_range,
+    write_chunk,
+)
+from .imports import import_format, import_stalls, read_rows
+from .cache import bump_stall_versions, serialize_stalls
+from preppr.conditional import ConditionalRetrieveMixin
+from .geo import geocode
+from .distance import rank_by_distance
+from .facets import cached_facet_counts
+from .filters import MAX_RADIUS_M, CatalogFilter, range_lookups
+from .scoring import SCORE_FIELDS, macro_targets, price_cap, rows_to_columns, score_columns, scored_snapshot
+from .planner import plan_meals
+from .suggest import suggest as suggest_completions
+from cart_app.inventory import set_stock
 
 
-class StallViewSet(viewsets.ModelViewSet):
+class StallViewSet(ConditionalRetrieveMixin, viewsets.ModelViewSet):
     queryset = Stall.objects.all().order_by("id")
     permission_classes = [IsSellerOrReadOnly]
     parser_classes = [JSONParser, MultiPartParser, FormParser]
+    pagination_class = KeysetPagination
     # Enable detail routes addressed by `id`, e.g. /api/stalls/123/
     lookup_field = "id"
     lookup_url_kwarg = "id"
@@ -38,50 +60,247 @@ class StallViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         qs = super().get_queryset()
-        # Filter by tags: ?tags=gluten-free,vegan
-        tags = self.request.query_params.get("tags")
-        if tags:
-            names = [t.strip() for t in tags.split(",") if t.strip()]
-            qs = qs.filter(tags__name__in=names).distinct()
-
-        # Exclude stalls containing allergens: ?allergens_exclude=fish,nuts
-        ex = self.request.query_params.get("allergens_exclude")
-        if ex:
-            names = [a.strip() for a in ex.split(",") if a.strip()]
-            qs = qs.exclude(allergens__name__in=names).distinct()
-
-        # Single category alias: ?category=vegan (maps to tags__name)
-        category = self.request.query_params.get("category")
-        if category:
-            qs = qs.filter(tags__name__iexact=category.strip()).distinct()
-
-        # Filter by seller zipcode: ?zip=94107
-        zip_param = self.request.query_params.get("zip")
-        if zip_param:
-            try:
-                z = int(zip_param)
-                qs = qs.filter(owner_profile__zipcode=z)
-            except (TypeError, ValueError):
-                # ignore invalid zip
-                pass
-
-        # TODO: radius filtering requires coordinates (lat/lng). If you add
-        # coords to SellerProfile/Stall, compute distance with Haversine and filter.
-        # For now, `radius` parameter is accepted but ignored.
-
-        return qs
-
-    # Utilities
-    def _geocode(self, geolocator, query: str) -> Optional[Tuple[float, float]]:
-        if not query:
-            return None
+        if self.action in ("list", "retrieve"):
+            # Relations are prefetched only for cache misses (see serialize_stalls)
+            qs = qs.for_catalog(prefetch=False)
+        # ?tags, ?allergens_exclude, ?category, ?q, ?zip, ?lat/?lng/?radius,
+        # ranges, ?seller
+        self.catalog_filter = CatalogFilter(self.request.query_params, user=self.request.user)
+        return self.catalog_filter.apply(qs)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        # Searches default to best match first
+        default_sort = "relevance" if "rank" in queryset.query.annotations else "id"
+        if self.paginator.get_sort(request, queryset, default=default_sort) == "best":
+            fields = ("id", *SCORE_FIELDS)
+            if "distance_m" in queryset.query.annotations:
+                fields += ("distance_m",)
+            page = self._best_page(
+                lambda: rows_to_columns(queryset.order_by().values_list(*fields), fields),
+                self.catalog_filter.radius_m,
+            )
+        else:
+            page = self.paginator.paginate_queryset(
+                queryset, request, view=self, default_sort=default_sort
+            )
+        return self.get_paginated_response(serialize_stalls(page, self.get_serializer_context()))
+
+    def _best_page(self, load_columns, radius_m, *key_parts):
+        """
+        One `?sort=best` page of stalls (see store_app.scoring).
+
+        `load_columns()` reads the candidates' columns; it only runs for first
+        pages and expired snapshots, other pages reuse the first page's scores.
+        """
+        params = self.request.query_params
+        paginator = self.paginator
+
+        def build():
+            columns = load_columns()
+            snapshot = {
+                "id": columns["id"].astype(np.int64),
+                "score": score_columns(
+                    columns,
+                    radius_m=radius_m,
+                    targets=macro_targets(params),
+                    price_cap_cents=price_cap(params),
+                ),
+            }
+            if "distance_m" in columns:
+                snapshot["distance_m"] = columns["distance_m"]
+            return snapshot
+
+        # Everything but the page position and size decides the scores
+        scoring_params = sorted(
+            (name, values)
+            for name, values in params.lists()
+            if name not in (paginator.cursor_query_param, paginator.page_size_query_param)
+        )
+        snapshot = scored_snapshot(
+            [self.action, scoring_params, *key_parts],
+            build,
+            fresh=paginator.cursor_query_param not in params,
+        )
+        ids = snapshot["id"]
+        page_ids, _ = paginator.paginate_top(ids, snapshot["score"], self.request)
+        stalls = Stall.objects.for_catalog(prefetch=False).in_bulk(page_ids.tolist())
+        # Stalls deleted since the snapshot was taken drop out
+        results = [stalls[stall_id] for stall_id in page_ids.tolist() if stall_id in stalls]
+        if "distance_m" in snapshot:
+            sorter = np.argsort(ids)
+            rows = sorter[np.searchsorted(ids, page_ids, sorter=sorter)]
+            distance_by_id = dict(zip(page_ids.tolist(), snapshot["distance_m"][rows].tolist()))
+            for stall in results:
+                stall.distance_m = distance_by_id[stall.id]
+        return results
+
+    def get_retrieve_response(self, request, *args, **kwargs):
+        instance = self.get_object()
+        return Response(serialize_stalls([instance], self.get_serializer_context())[0])
+
+    def get_etag_extra(self, pk):
+        # `is_favorited` differs per buyer, so it is part of the representation
+        return StallSerializer(context=self.get_serializer_context()).get_is_favorited(
+            Stall(pk=pk)
+        )
+
+    @action(detail=False, methods=["get"], url_path="facets")
+    def facets(self, request):
+        """
+        Counts per tag, allergen, `price_level` and calorie band for the filter sidebar.
+
+        Takes the list route's filter params; cached briefly per filter set.
+        """
+        catalog_filter = CatalogFilter(request.query_params, user=request.user)
+        queryset = catalog_filter.apply(Stall.objects.all())
+        return Response(cached_facet_counts(queryset, catalog_filter))
+
+    @action(detail=False, methods=["get"], url_path="suggest")
+    def suggest(self, request):
+        """
+        Typeahead completions for the search box: `?prefix=sal&limit=10`.
+
+        Returns `{"prefix", "results": [{"type", "id", "text"}]}` where `type`
+        is `stall`, `tag` or `allergen`; `limit` defaults to 10 (max 25).
+        """
+        prefix = request.query_params.get("prefix", "")
+        try:
+            limit = min(max(int(request.query_params.get("limit", 10)), 1), 25)
+        except (TypeError, ValueError):
+            return Response({"detail": "limit must be an integer"}, status=400)
+        return Response({"prefix": prefix, "results": suggest_completions(prefix, limit)})
+
+    @action(detail=False, methods=["get"], url_path="plan")
+    def plan(self, request):
+        """
+        Picks up to `meals` stalls that together meet macro targets within a budget.
+
+        Query params:
+        - `calories`, `protein` (grams): daily targets; at least one is required
+        - `budget_cents`: most the plan may cost (required)
+        - `meals`: how many stalls at most (default 3, max 6)
+        - the list route's filter params: `lat`/`lng`/`radius` or `zip`/`radius`,
+          `allergens_exclude`, `tags`, `category`, ranges such as `fat_max`
+
+        Only stalls in stock are considered. See store_app.planner for the
+        objective; `complete` is false when the solver ran out of time.
+        """
+        params = request.query_params
+        try:
+            budget_cents = int(params["budget_cents"])
+            max_meals = int(params.get("meals", 3))
+            targets = {
+                name: float(params[name]) if params.get(name) else None
+                for name in ("calories", "protein")
+            }
+        except (KeyError, TypeError, ValueError):
+            return Response(
+                {"detail": "budget_cents and meals must be integers; calories and protein numbers"},
+                status=400,
+            )
+        # Non-positive targets are treated as not given
+        targets = {name: value if value and value > 0 else None for name, value in targets.items()}
+        if not any(targets.values()):
+            return Response({"detail": "calories or protein is required"}, status=400)
+        if budget_cents <= 0 or not 1 <= max_meals <= 6:
+            return Response(
+                {"detail": "budget_cents must be positive and meals between 1 and 6"}, status=400
+            )
+
+        catalog_filter = CatalogFilter(params)
+        queryset = catalog_filter.apply(
+            Stall.objects.filter(quantity__gt=0, price_cents__lte=budget_cents)
+        )
+        plan = plan_meals(
+            queryset.order_by().values_list("id", "price_cents", "calories", "protein_g"),
+            calories=targets["calories"],
+            protein_g=targets["protein"],
+            budget_cents=budget_cents,
+            max_meals=max_meals,
+        )
+        stalls = Stall.objects.for_catalog(prefetch=False).in_bulk(plan.stall_ids)
+        meals = [stalls[stall_id] for stall_id in plan.stall_ids]
+        return Response(
+            {
+                "meals": serialize_stalls(meals, self.get_serializer_context()),
+                "totals": {
+                    "calories": plan.calories,
+                    "protein_g": plan.protein_g,
+                    "price_cents": plan.price_cents,
+                },
+                "complete": plan.complete,
+            }
+        )
+
+    @action(detail=False, methods=["post"], url_path="import", parser_classes=[MultiPartParser])
+    def bulk_import(self, request):
+        """
+        Create or update many of the seller's stalls from an uploaded `file`.
+
+        CSV (header row, list cells `;`-separated) or NDJSON (one JSON object per
+        line), told apart by file name or content type. Rows are upserted on
+        `sku`; invalid rows are reported and skipped, the rest are saved.
+        Responds `{"created", "updated", "errors": [{"row", "errors"}]}`.
+        """
+        seller_profile = getattr(request.user, "seller_profile", None)
+        if not seller_profile or not (seller_profile.location and seller_profile.location.strip()):
+            return Response(
+                {"detail": "Seller profile must have a location set before importing meals."},
+                status=400,
+            )
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"detail": "file is required"}, status=400)
+        fmt = import_format(upload.name) or import_format(upload.content_type)
+        if not fmt:
+            return Response({"detail": "file must be .csv or .ndjson/.jsonl"}, status=400)
         try:
-            loc = geolocator.geocode(query)
-            if not loc:
-                return None
-            return (loc.latitude, loc.longitude)
-        except Exception:
-            return None
+            lines = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+            result = import_stalls(seller_profile, read_rows(lines, fmt))
+        except (UnicodeDecodeError, csv.Error) as exc:
+            return Response({"detail": f"Unreadable file: {exc}"}, status=400)
+        return Response(result.as_dict())
+
+    @action(detail=False, methods=["post"], url_path="bulk_update", parser_classes=[JSONParser])
+    def bulk_update(self, request):
+        """
+        Change price, stock or `special_requests_allowed` on many of the seller's stalls at once.
+
+        Body: `{"ids": [1, 2]}` or `{"filter": {...list route params...}}`, plus
+        `"patch"` (see StallBulkPatchSerializer), e.g.
+        `{"filter": {"tags": "vegan"}, "patch": {"price_percent": -10}}`.
+        Stalls of other sellers are never matched. Responds with the ids changed.
+        """
+        seller_profile = getattr(request.user, "seller_profile", None)
+        if seller_profile is None:
+            raise PermissionDenied("Only sellers can update stalls.")
+        patch = StallBulkPatchSerializer(data=request.data.get("patch") or {})
+        patch.is_valid(raise_exception=True)
+
+        # Ownership is part of the WHERE clause, not a per-row check
+        queryset = Stall.objects.filter(owner_profile=seller_profile)
+        ids, filters = request.data.get("ids"), request.data.get("filter")
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+                return Response({"detail": "ids must be a list of integers"}, status=400)
+            queryset = queryset.filter(pk__in=ids)
+        elif isinstance(filters, dict):
+            params = {
+                name: ",".join(map(str, value)) if isinstance(value, list) else str(value)
+                for name, value in filters.items()
+            }
+            queryset = CatalogFilter(params).apply(queryset)
+        else:
+            return Response({"detail": "ids or filter is required"}, status=400)
+
+        with transaction.atomic():
+            # Lock the selection so the ids returned are exactly the rows updated
+            changed = list(queryset.select_for_update().order_by("id").values_list("id", flat=True))
+            if changed:
+                Stall.objects.filter(pk__in=changed).update(**patch.update_expressions(), updated_at=Now())
+                bump_stall_versions(changed)
+        return Response({"ids": changed, "count": len(changed)})
 
     @action(detail=False, methods=["get"], url_path="filter")
     def filter(self, request):
@@ -89,71 +308,107 @@ class StallViewSet(viewsets.ModelViewSet):
         Filters stalls by proximity to a buyer zipcode and optional criteria.
 
         Query params:
-        - `zipcode`: buyer zipcode or address (required)
+        - `zipcode`: buyer zipcode or address (defaults to the signed-in buyer's profile zipcode)
         - `radius_m`: buyer search radius in meters (default 5000)
-        - `food`: free-text match on stall product name (optional)
+        - `food`: full-text prefix match on product, tags and description (optional)
         - `preferences`: comma-separated tag names to include (optional)
         - `allergens_exclude`: comma-separated allergens to exclude (optional)
+        - `<field>_min`/`<field>_max` for calories, protein, carbs, fat, price (cents)
+          and price_level: inclusive ranges, as on the list route (optional)
+        - `sort`: `distance` (default), `best` (see store_app.scoring), `rating`, `id` or a
+          nutrition/price sort such as `-protein`; paginated with `cursor`/`page_size`
+        - `target_calories`, `target_protein`, `target_carbs`, `target_fat`: macro goals for
+          `sort=best` (optional)
         """
-        if Nominatim is None or geodesic is None:
-            return Response(
-                {"detail": "geopy is required for distance filtering. Please install geopy."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            )
-
         zipcode = request.query_params.get("zipcode")
         if not zipcode:
+            profile = getattr(request.user, "buyer_profile", None)
+            zipcode = getattr(profile, "zipcode", None)
+        if zipcode in (None, ""):
             return Response({"detail": "zipcode is required"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
             radius_m = int(request.query_params.get("radius_m", 5000))
         except (TypeError, ValueError):
             return Response({"detail": "radius_m must be an integer (meters)"}, status=400)
+        if radius_m <= 0:
+            return Response({"detail": "radius_m must be positive"}, status=400)
+        radius_m = min(radius_m, int(MAX_RADIUS_M))
 
         food = request.query_params.get("food")
         preferences = request.query_params.get("preferences")  # comma-separated tag names
         allergens_exclude = request.query_params.get("allergens_exclude")
 
-        geolocator = Nominatim(user_agent="preppr_api")
-        buyer_coords = self._geocode(geolocator, zipcode)
+        buyer_coords = geocode(zipcode)
         if not buyer_coords:
             return Response({"detail": "Unable to geocode buyer zipcode/address"}, status=400)
 
-        qs = Stall.objects.all()
+        # Index-backed bounding-box prefilter; only candidate rows leave the DB
+        qs = Stall.objects.in_bounding_box(buyer_coords[0], buyer_coords[1], radius_m)
+        qs = qs.filter(**range_lookups(request.query_params))
         if food:
-            qs = qs.filter(product__icontains=food)
+            qs = qs.search(food, prefix=True)
         if preferences:
             tag_names = [t.strip() for t in preferences.split(",") if t.strip()]
             if tag_names:
-                qs = qs.filter(tags__name__in=tag_names).distinct()
+                qs = qs.with_tag_names(tag_names)
         if allergens_exclude:
             names = [a.strip() for a in allergens_exclude.split(",") if a.strip()]
             if names:
-                qs = qs.exclude(allergens__name__in=names).distinct()
-
-        # In-request geocode cache for stall locations
-        cache = {}
-        results = []
-        for stall in qs:
-            loc_str = stall.location or ""
-            if not loc_str:
-                continue
-            if loc_str not in cache:
-                cache[loc_str] = self._geocode(geolocator, loc_str)
-            stall_coords = cache[loc_str]
-            if not stall_coords:
-                continue
-            try:
-                distance_m = geodesic(buyer_coords, stall_coords).meters
-            except Exception:
-                continue
-            # Satisfy both buyer radius and seller's allowed radius
-            seller_radius = max(getattr(stall, "radius_m", 0), 0)
-            if distance_m <= min(max(radius_m, 0), seller_radius):
-                results.append(stall)
-
-        serializer = StallSerializer(results, many=True, context={"request": request})
-        return Response(serializer.data)
+                qs = qs.without_allergen_names(names)
+
+        paginator = self.paginator
+        sort = paginator.get_sort(request, default="distance")
+        fields = ("id", "latitude", "longitude", "radius_m")
+        if sort == "best":
+            fields += SCORE_FIELDS
+
+        def in_range():
+            candidates = rows_to_columns(qs.values_list(*fields), fields)
+            # Exact distances, radius masks and ordering in one vectorized pass
+            ids, distances = rank_by_distance(
+                buyer_coords[0],
+                buyer_coords[1],
+                zip(*(candidates[field] for field in fields[:4])),
+                radius_m,
+            )
+            return candidates, ids, distances
+
+        if sort == "best":
+
+            def load_columns():
+                # Score only the stalls in range; rank_by_distance sorted them by distance
+                candidates, ids, distances = in_range()
+                sorter = np.argsort(candidates["id"])
+                rows = sorter[np.searchsorted(candidates["id"], ids, sorter=sorter)]
+                columns = {field: candidates[field][rows] for field in fields}
+                columns["distance_m"] = distances
+                return columns
+
+            results = self._best_page(load_columns, radius_m, zipcode)
+            return paginator.get_paginated_response(
+                serialize_stalls(results, self.get_serializer_context())
+            )
+        _, ids, distances = in_range()
+        if sort == "distance":
+            # Keyset over the in-memory ranking; only the page's rows are loaded
+            page_ids, page_distances = paginator.paginate_ranked(ids, distances, request)
+            stalls = Stall.objects.for_catalog(prefetch=False).in_bulk(page_ids.tolist())
+            results = [stalls[stall_id] for stall_id in page_ids.tolist()]
+        else:
+            results = paginator.paginate_queryset(
+                Stall.objects.for_catalog(prefetch=False).filter(id__in=ids.tolist()),
+                request,
+                view=self,
+                default_sort="distance",
+            )
+        distance_by_id = dict(zip(ids.tolist(), distances.tolist()))
+        for stall in results:
+            stall.distance_m = distance_by_id[stall.id]
+
+        return paginator.get_paginated_response(
+            serialize_stalls(results, self.get_serializer_context())
+        )
 
     def perform_destroy(self, instance):
         """Only allow deletion by the owning seller profile."""
@@ -169,14 +424,24 @@ class StallViewSet(viewsets.ModelViewSet):
     
 
     @action(detail=True, methods=["post"])
-    def set_quantity(self, request, pk=None):
+    def set_quantity(self, request, id=None):
+        """
+        Set stock with `{"quantity": n}` or restock/adjust with `{"delta": n}`.
+
+        One UPDATE of `quantity` alone (cart_app.inventory.set_stock), so it
+        neither overwrites other fields nor loses concurrent checkouts' decrements.
+        """
         stall = self.get_object()
+        seller_profile = getattr(request.user, "seller_profile", None)
+        if stall.owner_profile_id != getattr(seller_profile, "id", None):
+            raise PermissionDenied("You can only change stock of your own stalls.")
+        field = "delta" if "delta" in request.data else "quantity"
         try:
-            qty = int(request.data.get("quantity"))
+            value = int(request.data.get(field))
         except (TypeError, ValueError):
-            return Response({"detail": "quantity must be int"}, status=400)
-        stall.quantity = max(0, qty)
-        stall.save()
+            return Response({"detail": f"{field} must be int"}, status=400)
+        set_stock(stall.pk, **{field: value})
+        stall.refresh_from_db(fields=["quantity", "updated_at"])
         return Response(StallSerializer(stall, context={"request": request}).data)
 
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
@@ -209,3 +474,109 @@ class StallViewSet(viewsets.ModelViewSet):
         return Response(
             SpecialRequestSerializer(sr).data, status=status.HTTP_201_CREATED
         )
+
+    @action(
+        detail=True,
+        methods=["get", "post", "delete"],
+        permission_classes=[IsAuthenticatedOrReadOnly],
+    )
+    def reviews(self, request, id=None):
+        """
+        GET: the stall's reviews, newest first (`?sort=oldest`, `cursor`, `page_size`).
+        POST (buyer): `{ "rating": 1-5, "comment": "..." }`; replaces the buyer's earlier review.
+        DELETE (buyer): removes the buyer's review.
+
+        The stall's `average_rating`/`rating_count` are updated in the same
+        transaction (see store_app.reviews).
+        """
+        stall = self.get_object()
+        if request.method == "GET":
+            paginator = ReviewPagination()
+            page = paginator.paginate_queryset(
+                Review.objects.filter(stall=stall).select_related("buyer_profile__user"),
+                request,
+                view=self,
+                default_sort="newest",
+            )
+            return paginator.get_paginated_response(ReviewSerializer(page, many=True).data)
+
+        if getattr(request.user, "role", None) != "buyer":
+            return Response({"detail": "Only buyers can review stalls."}, status=403)
+        profile = request.user.buyer_profile
+        if request.method == "DELETE":
+            if not delete_review(stall.id, profile):
+                return Response({"detail": "No review to delete."}, status=404)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        serializer = ReviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        review, created = submit_review(
+            stall.id,
+            profile,
+            serializer.validated_data["rating"],
+            serializer.validated_data.get("comment", ""),
+        )
+        return Response(
+            ReviewSerializer(review).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+
+class ImageUploadViewSet(
+    mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
+):
+    """
+    Chunked, resumable photo uploads (see store_app.uploads).
+
+    - POST `/api/uploads/` `{"filename", "size", "sha256"}` opens a session
+    - PUT `/api/uploads/{id}/` with the raw bytes and `Content-Range: bytes
+      <first>-<last>/<size>` stores one chunk; `409` carries the `offset` to
+      resume from when the chunk does not start there
+    - GET `/api/uploads/{id}/` reports the `offset` received so far
+    - POST `/api/uploads/{id}/complete/` checks and stores the file; its id
+      then goes in `image_upload`/`image_uploads` of a stall or seller profile
+    - DELETE `/api/uploads/{id}/` abandons the session
+    """
+
+    serializer_class = ImageUploadSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return ImageUpload.objects.filter(owner=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+
+    def update(self, request, *args, **kwargs):
+        upload = self.get_object()
+        content_range = parse_content_range(request.headers.get("Content-Range"))
+        if content_range is None:
+            return Response(
+                {"detail": "Content-Range: bytes <first>-<last>/<size> is required."}, status=400
+            )
+        start, length, total = content_range
+        if total != upload.size:
+            return Response({"detail": f"The upload is {upload.size} bytes, not {total}."}, status=400)
+        if int(request.META.get("CONTENT_LENGTH") or 0) != length:
+            return Response({"detail": "Content-Length must match Content-Range."}, status=400)
+        try:
+            # Read from the request stream; request.data would buffer the whole body
+            write_chunk(upload, request.stream, start, length)
+        except UploadConflict as exc:
+            return Response({"detail": str(exc), "offset": exc.offset}, status=409)
+        except UploadError as exc:
+            return Response({"detail": str(exc), "offset": upload.offset}, status=400)
+        return Response(self.get_serializer(upload).data)
+
+    def destroy(self, request, *args, **kwargs):
+        discard_upload(self.get_object())
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=["post"])
+    def complete(self, request, pk=None):
+        upload = self.get_object()
+        try:
+            upload = finish_upload(upload.pk)
+        except UploadError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        return Response(self.get_serializer(upload).data)
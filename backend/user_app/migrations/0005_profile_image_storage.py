@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:39
+
+import store_app.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0004_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sellerprofile',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=store_app.storage.get_image_storage, upload_to='profiles/sellers/'),
+        ),
+    ]
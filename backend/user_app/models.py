@@ -21,6 +21,8 @@ class User(AbstractUser):
 from django.db import models
 from django.conf import settings
 
+from store_app.storage import get_image_storage
+
 class BuyerProfile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="buyer_profile")
     allergies = models.TextField(blank=True, default="")
@@ -36,13 +38,22 @@ class BuyerProfile(models.Model):
         on_delete=models.SET_NULL,
         related_name="fans",
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
 class SellerProfile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="seller_profile")
     location = models.CharField(max_length=255, blank=True, default="")
+    # Coordinates resolved from `location` whenever it changes
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
     address= models.CharField(max_length=255, blank=True, default="")
     zipcode = models.IntegerField(
         null=True, blank=True, default=None,
         validators=[MinValueValidator(0), MaxValueValidator(99999)])
-    image = models.ImageField(upload_to="profiles/sellers/", blank=True, null=True)
+    image = models.ImageField(
+        upload_to="profiles/sellers/", storage=get_image_storage, blank=True, null=True
+    )
+    # Resized JPEG/WebP renditions of `image` (see store_app.images)
+    image_variants = models.JSONField(blank=True, default=dict, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
@@ -4,6 +4,8 @@ from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from .models import User, BuyerProfile, SellerProfile
 from store_app.models import Stall
+from store_app.geo import locate
+from store_app.serializers import ImageUploadField
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -108,6 +110,8 @@ class SellerProfileSerializer(serializers.ModelSerializer):
     stall = serializers.PrimaryKeyRelatedField(
         queryset=Stall.objects.all(), required=False, allow_null=True
     )
+    # Alternative to `image` for a photo sent through /api/uploads/
+    image_upload = ImageUploadField(required=False, write_only=True)
 
     class Meta:
         model = SellerProfile
@@ -115,11 +119,30 @@ class SellerProfileSerializer(serializers.ModelSerializer):
             "id",
             "user",
             "location",
+            "latitude",
+            "longitude",
             "address",
             "zipcode",
             "stall",
             "image",
+            "image_upload",
         ]
+        read_only_fields = ["latitude", "longitude"]
+
+    def validate(self, attrs):
+        if "image_upload" in attrs:
+            if "image" in attrs:
+                raise serializers.ValidationError({"image_upload": "Give either image or image_upload."})
+            attrs["image"] = attrs.pop("image_upload")
+        return attrs
+
+    def update(self, instance, validated_data):
+        # Resolve coordinates only when the location or zipcode actually changes
+        location = validated_data.get("location", instance.location)
+        zipcode = validated_data.get("zipcode", instance.zipcode)
+        if location != instance.location or zipcode != instance.zipcode:
+            validated_data["latitude"], validated_data["longitude"] = locate(location, zipcode)
+        return super().update(instance, validated_data)
 
     def validate_zipcode(self, value):
         if value in ("", None):
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.db.models.functions import Now
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import BuyerProfile, SellerProfile
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, created=False, update_fields=None, **kwargs):
+    """Profiles embed the user, so their `updated_at` (and ETag) must move with it."""
+    if created:
+        return
+    # Logins only touch last_login, which profiles do not show
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    BuyerProfile.objects.filter(user=instance).update(updated_at=Now())
+    SellerProfile.objects.filter(user=instance).update(updated_at=Now())
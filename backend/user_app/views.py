@@ -18,6 +18,8 @@ from .serializers import (
     SellerProfileSerializer,
 )
 from .tokens import email_verification_token
+from store_app.geo import locate
+from preppr.conditional import ConditionalRetrieveMixin
 from .email_utils import send_verification_email
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
@@ -139,7 +141,7 @@ class MeViewSet(viewsets.ViewSet):
             return Response({"detail": "Not a seller."}, status=403)
         profile, _ = SellerProfile.objects.get_or_create(user=request.user)
         if request.method in ["PUT", "PATCH"]:
-            ser = SellerProfileSerializer(profile, data=request.data, partial=True)
+            ser = SellerProfileSerializer(profile, data=request.data, partial=True, context={"request": request})
             ser.is_valid(raise_exception=True)
             ser.save()
             return Response(ser.data)
@@ -167,6 +169,13 @@ class MeViewSet(viewsets.ViewSet):
             # Copy overlapping fields from BuyerProfile → SellerProfile
             buyer_profile = getattr(user, "buyer_profile", None)
             if buyer_profile:
+                if (buyer_profile.location, buyer_profile.zipcode) != (
+                    seller_profile.location,
+                    seller_profile.zipcode,
+                ):
+                    seller_profile.latitude, seller_profile.longitude = locate(
+                        buyer_profile.location, buyer_profile.zipcode
+                    )
                 seller_profile.location = buyer_profile.location
                 seller_profile.address = buyer_profile.address
                 seller_profile.zipcode = buyer_profile.zipcode
@@ -178,7 +187,10 @@ class MeViewSet(viewsets.ViewSet):
 
 
 class BuyerProfileViewSet(
-    mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet
+    ConditionalRetrieveMixin,
+    mixins.RetrieveModelMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet,
 ):
     queryset = BuyerProfile.objects.select_related("user", "favorite_stall").all()
     serializer_class = BuyerProfileSerializer
@@ -186,9 +198,12 @@ class BuyerProfileViewSet(
 
 
 class SellerProfileViewSet(
-    mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet
+    ConditionalRetrieveMixin,
+    mixins.RetrieveModelMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet,
 ):
-    queryset = SellerProfile.objects.select_related("user", "stall").all()
+    queryset = SellerProfile.objects.select_related("user").all()
     serializer_class = SellerProfileSerializer
     permission_classes = [IsAuthenticated]
 
@@ -7,17 +7,9 @@ import { AuthContext } from "@/context/AuthContext";
 import MealsGrid from "@/components/MealsGrid";
 import ReviewStats from "@/components/ReviewStats";
 
-function slugifyName(first = "", last = "") {
-  const base = `${(first || "").trim()} ${(last || "").trim()}`.trim();
-  return base
-    .toLowerCase()
-    .replace(/[^a-z0-9]+/g, "-")
-    .replace(/(^-|-$)+/g, "");
-}
-
 export default function PublicAccountPage() {
   const { slug } = useParams();
-  const { allStalls } = useContext(AuthContext);
+  const { sellerStalls } = useContext(AuthContext);
   const [loading, setLoading] = useState(true);
   const [items, setItems] = useState([]);
 
@@ -26,36 +18,16 @@ export default function PublicAccountPage() {
     (async () => {
       setLoading(true);
       try {
-        const data = await allStalls();
-        if (!active) return;
-
-        const all = Array.isArray(data) ? data : [];
-
-        // Accept either numeric id in slug or name-based slug
-        let targetId = null;
-        if (/^\d+$/.test(slug)) {
-          targetId = slug;
-        } else {
-          const maybeId = slug.match(/-(\d+)$/)?.[1];
-          if (maybeId) targetId = maybeId;
-        }
-
-        let filtered = [];
-        if (targetId) {
-          filtered = all.filter((m) => {
-            const sid = m?.seller?.id ?? m?.seller?.user?.id ?? m?.seller?.user_id ?? null;
-            return sid != null && String(sid) === String(targetId);
-          });
-        } else {
-          // Fallback: match by slugified name
-          filtered = all.filter((m) => {
-            const s = m?.seller || {};
-            const nm = slugifyName(s.first_name, s.last_name);
-            return nm === slug;
-          });
+        // Slugs are the seller's user id, optionally after a name ("jane-doe-12")
+        const targetId = /^\d+$/.test(slug) ? slug : slug.match(/-(\d+)$/)?.[1];
+        if (!targetId) {
+          setItems([]);
+          return;
         }
 
-        setItems(filtered);
+        const data = await sellerStalls(targetId);
+        if (!active) return;
+        setItems(Array.isArray(data) ? data : []);
       } catch (e) {
         setItems([]);
       } finally {
@@ -65,7 +37,7 @@ export default function PublicAccountPage() {
     return () => {
       active = false;
     };
-  }, [slug, allStalls]);
+  }, [slug, sellerStalls]);
 
   const sellerInfo = useMemo(() => {
     if (!items.length) return null;
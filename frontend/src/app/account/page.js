@@ -14,7 +14,7 @@ export default function Account() {
   const {
     user,
     loading,
-    allStalls,
+    sellerStalls,
     deleteMeal: ctxDeleteMeal,
   } = useContext(AuthContext);
   const [open, setOpen] = useState(false);
@@ -48,27 +48,10 @@ export default function Account() {
       if (selectedTab !== "My Store") return;
       setLoadingStalls(true);
       try {
-        const data = await allStalls();
+        // Only this seller's stalls, filtered server-side
+        const data = await sellerStalls("me");
         if (!active) return;
-
-        // helper to resolve seller id and user id robustly
-        const getSellerId = (seller) =>
-          seller?.id ??
-          seller?.user?.id ??
-          seller?.pk ??
-          seller?.user_id ??
-          null;
-        const getUserId = () => user?.user?.id ?? user?.id ?? null;
-
-        const uid = getUserId();
-        const filtered = Array.isArray(data)
-          ? data.filter((meal) => {
-              const sid = getSellerId(meal?.seller ?? meal?.stall ?? null);
-              return sid !== null && String(sid) === String(uid);
-            })
-          : [];
-
-        setMyStalls(filtered);
+        setMyStalls(Array.isArray(data) ? data : []);
       } catch (e) {
         console.error("Failed to fetch stalls:", e);
         setMyStalls([]);
@@ -81,7 +64,7 @@ export default function Account() {
     return () => {
       active = false;
     };
-  }, [selectedTab, allStalls, user]);
+  }, [selectedTab, sellerStalls, user]);
 
   const handleDelete = async (id) => {
     try {
@@ -8,17 +8,24 @@ import MealGrid from "@/components/MealsGrid";
 import MarketToolbar from "@/components/MarketToolBar";
 
 export default function MarketPage() {
-  const { user, loading, createMeal, allStalls, filterStalls } = useContext(AuthContext);
+  const { user, loading, createMeal, allStalls, moreStalls, filterStalls } = useContext(AuthContext);
   const [stalls, setStalls] = useState(null);
+  const [next, setNext] = useState(null);
   const [loadingStalls, setLoadingStalls] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  const showPage = (page) => {
+    setStalls(page.results);
+    setNext(page.next);
+  };
 
   // fetch Meals(Stalls)
   useEffect(() => {
     let active = true;
     (async () => {
       try {
-        const data = await allStalls();
-        if (active) setStalls(data);
+        const page = await allStalls();
+        if (active) showPage(page);
       } finally {
         if (active) setLoadingStalls(false);
       }
@@ -33,16 +40,15 @@ export default function MarketPage() {
     setLoadingStalls(true);
     try {
       if (!values?.zip) {
-        const data = await allStalls();
-        setStalls(data);
+        showPage(await allStalls());
         return;
       }
-      const data = await filterStalls({
+      const page = await filterStalls({
         zip: values.zip,
         category: values.category,
         radius: values.radius,
       });
-      setStalls(data);
+      showPage(page);
     } catch (e) {
       console.error("Filter failed:", e?.response?.data || e);
     } finally {
@@ -50,6 +56,21 @@ export default function MarketPage() {
     }
   };
 
+  // Next page of the current list (search or not)
+  const handleLoadMore = async () => {
+    if (!next) return;
+    setLoadingMore(true);
+    try {
+      const page = await moreStalls(next);
+      setStalls((prev) => [...(prev || []), ...page.results]);
+      setNext(page.next);
+    } catch (e) {
+      console.error("Loading more stalls failed:", e?.response?.data || e);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   // Adding meal
   const handleAddMeal = async (form) => {
     const role = user?.user?.role ?? user?.role;
@@ -57,8 +78,7 @@ export default function MarketPage() {
 
     try {
       const created = await createMeal(form);
-      const data = await allStalls();
-      setStalls(data);
+      showPage(await allStalls());
       console.log("Meal created:", created);
     } catch (e) {
       console.error("Create meal failed:", e?.response?.data || e);
@@ -76,7 +96,21 @@ export default function MarketPage() {
 
       {/* Cards */}
       {stalls && stalls.length ? (
-        <MealGrid data={stalls} />
+        <>
+          <MealGrid data={stalls} />
+          {next && (
+            <div className="flex justify-center my-8">
+              <button
+                type="button"
+                onClick={handleLoadMore}
+                disabled={loadingMore}
+                className="px-4 py-2 rounded-xl bg-gray-900 text-white text-sm hover:opacity-90 disabled:opacity-50"
+              >
+                {loadingMore ? "Loading..." : "Load more"}
+              </button>
+            </div>
+          )}
+        </>
       ) : (
         <h1 className="text-gray-600 text-xl text-center">
           Sorry, we couldnt locate any options in your area.
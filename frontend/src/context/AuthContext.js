@@ -23,6 +23,8 @@ import {
   setTokens,
   apiCreateMeal,
   apiGetAllStalls,
+  apiGetStallsPage,
+  apiGetSellerStalls,
   clearTokens,
   getAccess,
   getRefresh,
@@ -263,6 +265,8 @@ export function AuthProvider({ children }) {
       toSeller: handleBecomeSeller,
       createMeal: apiCreateMeal,
       allStalls: apiGetAllStalls,
+      moreStalls: apiGetStallsPage,
+      sellerStalls: apiGetSellerStalls,
       aStall: apiGetAStall,
       deleteMeal: apiDeleteMeal,
       filterStalls: apiFilterStalls,
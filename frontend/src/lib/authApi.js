@@ -173,9 +173,33 @@ export async function apiUpdateSeller(payload) {
   return data;
 }
 
+// Stall lists are cursor-paginated: { next, results }. `next` is the full URL
+// of the following page (or null); pass it to apiGetStallsPage.
+function toStallPage(data) {
+  if (Array.isArray(data)) return { results: data, next: null };
+  return { results: data?.results ?? [], next: data?.next ?? null };
+}
+
 export async function apiGetAllStalls(params) {
   const { data } = await api.get("stalls/", { params });
-  return data;
+  return toStallPage(data);
+}
+
+export async function apiGetStallsPage(next) {
+  const { data } = await api.get(next);
+  return toStallPage(data);
+}
+
+// Every page of one seller's stalls; `seller` is the seller's user id (as in
+// each stall's `seller.id`) or "me" for the logged-in seller
+export async function apiGetSellerStalls(seller) {
+  let page = await apiGetAllStalls({ seller });
+  const all = [...page.results];
+  while (page.next) {
+    page = await apiGetStallsPage(page.next);
+    all.push(...page.results);
+  }
+  return all;
 }
 export async function apiGetAStall(id) {
   const { data } = await api.get(`stalls/${id}`);
@@ -185,13 +209,13 @@ export async function apiGetAStall(id) {
 // Filter stalls using backend proximity + tags endpoint
 // params: { zip, category, radius } where radius is in miles
 export async function apiFilterStalls({ zip, category, radius }) {
-  // Backend supports tags via `category` and zip via `zip`. `radius` is currently a hint.
+  // Backend supports tags via `category`; with `radius` (miles) it returns stalls near `zip`.
   const params = {};
   if (zip) params.zip = zip;
   if (category) params.category = category;
-  if (radius) params.radius = radius; // Not enforced server-side yet
+  if (radius) params.radius = radius;
   const { data } = await api.get("stalls/", { params });
-  return data;
+  return toStallPage(data);
 }
 
 export async function apiCreateMeal({